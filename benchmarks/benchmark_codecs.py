@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+#
+#  benchmark_codecs.py
+"""
+Compare the write time, read time and size of the compression codecs in :mod:`libgunshotmatch.gzip_util`.
+
+Usage::
+
+	python benchmarks/benchmark_codecs.py [CODEC ...]
+
+Each of the ``ELEY_*_SUBTRACT.gsmd`` test datafiles is exported with each codec and read back again.
+By default a selection of codecs and compression levels is compared.
+Codecs whose optional dependencies are not installed are skipped.
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import os
+import sys
+import tempfile
+import time
+from typing import List, Sequence
+
+# 3rd party
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from libgunshotmatch.datafile import Datafile
+from libgunshotmatch.gzip_util import get_codec
+
+tests_dir = PathPlus(__file__).parent.parent / "tests"
+
+default_codecs = [
+		"gzip",
+		"gzip:1",
+		"gzip:6",
+		"bz2",
+		"lzma",
+		"lzma:1",
+		"none",
+		"zstd",
+		"zstd:19",
+		"lz4",
+		]
+
+
+def _available(codec: str) -> bool:
+	try:
+		with tempfile.TemporaryDirectory() as tmpdir:
+			get_codec(codec)[0].open(os.path.join(tmpdir, "test"), "wb", None, 0).close()
+	except (ImportError, ValueError):
+		return False
+	return True
+
+
+def main(codecs: Sequence[str]) -> None:
+	datafiles = [Datafile.from_file(filename) for filename in sorted(tests_dir.glob("ELEY_*_SUBTRACT.gsmd"))]
+	print(f"{len(datafiles)} datafiles")
+	print(f"{'codec':<10} {'write (s)':>10} {'read (s)':>10} {'size (MB)':>10}")
+
+	for codec in codecs:
+		if not _available(codec):
+			print(f"{codec:<10} {'unavailable':>10}")
+			continue
+
+		with tempfile.TemporaryDirectory() as tmpdir:
+			filenames: List[str] = []
+
+			start = time.perf_counter()
+			for datafile in datafiles:
+				filenames.append(datafile.export(tmpdir, codec=codec))
+			write_time = time.perf_counter() - start
+
+			start = time.perf_counter()
+			for filename in filenames:
+				Datafile.from_file(filename)
+			read_time = time.perf_counter() - start
+
+			size = sum(os.path.getsize(filename) for filename in filenames) / 1e6
+
+		print(f"{codec:<10} {write_time:>10.2f} {read_time:>10.2f} {size:>10.2f}")
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:] or default_codecs)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+#
+#  benchmark_readers.py
+"""
+Compare the time taken to read the ``ELEY_*_SUBTRACT.JDX`` test files
+with :func:`pyms.GCMS.IO.JCAMP.JCAMP_reader` and :func:`libgunshotmatch.readers.jcamp_reader`.
+
+Usage::
+
+	python benchmarks/benchmark_readers.py [REPEATS]
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import contextlib
+import io
+import sys
+import time
+from typing import Callable, Dict
+
+# 3rd party
+from domdf_python_tools.paths import PathPlus
+from domdf_python_tools.typing import PathLike
+from pyms.GCMS.Class import GCMS_data
+from pyms.GCMS.IO.JCAMP import JCAMP_reader
+
+# this package
+from libgunshotmatch.readers import jcamp_reader
+
+tests_dir = PathPlus(__file__).parent.parent / "tests"
+
+readers: Dict[str, Callable[[PathLike], GCMS_data]] = {
+		"pyms": JCAMP_reader,
+		"numpy": jcamp_reader,
+		}
+
+
+def main(repeats: int = 3) -> None:
+	filenames = sorted(tests_dir.glob("ELEY_*_SUBTRACT.JDX"))
+	print(f"{len(filenames)} files, best of {repeats}")
+	print(f"{'reader':<10} {'time (s)':>10}")
+
+	for name, reader in readers.items():
+		times = []
+		for _ in range(repeats):
+			start = time.perf_counter()
+			with contextlib.redirect_stdout(io.StringIO()):
+				for filename in filenames:
+					reader(filename)
+			times.append(time.perf_counter() - start)
+
+		print(f"{name:<10} {min(times):>10.2f}")
+
+
+if __name__ == "__main__":
+	main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+#  benchmark_single_precision.py
+"""
+Compare the time and memory taken to prepare and detect peaks in the ``ELEY_*_SUBTRACT.JDX`` test files,
+and the size of the exported datafiles, with double- and single-precision intensity matrices.
+
+Usage::
+
+	python benchmarks/benchmark_single_precision.py [REPEATS]
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 3rd party
+from domdf_python_tools.paths import PathPlus
+from pyms.BillerBiemann import BillerBiemann
+
+# this package
+from libgunshotmatch.datafile import Datafile
+from libgunshotmatch.method import Method
+
+tests_dir = PathPlus(__file__).parent.parent / "tests"
+
+
+def main(repeats: int = 3) -> None:
+	method = Method()
+	filenames = sorted(tests_dir.glob("ELEY_*_SUBTRACT.JDX"))
+
+	gcms_data = {}
+	with contextlib.redirect_stdout(io.StringIO()):
+		for filename in filenames:
+			gcms_data[filename] = Datafile.new(filename.stem, filename).load_gcms_data()
+
+	print(f"{len(filenames)} files, best of {repeats}")
+	print(
+			f"{'precision':<10} {'prepare (s)':>12} {'peaks (s)':>10} {'prepare memory (MB)':>20}",
+			f"{'gsmd (MB)':>10} {'binary gsmd (MB)':>17}",
+			)
+
+	for single_precision in (False, True):
+		prepare_times, peak_times, peak_memory = [], [], []
+		for _ in range(repeats):
+			prepare_time = peak_time = 0.0
+			memory = 0
+			with contextlib.redirect_stdout(io.StringIO()):
+				for filename in filenames:
+					datafile = Datafile.new(filename.stem, filename)
+
+					# tracemalloc makes peak detection much slower, so only traces the preparation.
+					tracemalloc.start()
+					start = time.perf_counter()
+					intensity_matrix = datafile.prepare_intensity_matrix(
+							gcms_data[filename],
+							savitzky_golay=method.intensity_matrix.savitzky_golay,
+							tophat=method.intensity_matrix.tophat,
+							tophat_structure_size=method.intensity_matrix.tophat_structure_size,
+							crop_mass_range=method.intensity_matrix.crop_mass_range,
+							single_precision=single_precision,
+							)
+					prepare_time += time.perf_counter() - start
+					memory = max(memory, tracemalloc.get_traced_memory()[1])
+					tracemalloc.stop()
+
+					start = time.perf_counter()
+					BillerBiemann(
+							intensity_matrix,
+							points=method.peak_detection.points,
+							scans=method.peak_detection.scans,
+							)
+					peak_time += time.perf_counter() - start
+
+			prepare_times.append(prepare_time)
+			peak_times.append(peak_time)
+			peak_memory.append(memory)
+
+		# The file sizes are for the last datafile.
+		with tempfile.TemporaryDirectory() as tmpdir:
+			gsmd_size = os.path.getsize(datafile.export(tmpdir))
+			binary_size = os.path.getsize(datafile.export(tmpdir, binary=True))
+
+		name = "single" if single_precision else "double"
+		print(
+				f"{name:<10} {min(prepare_times):>12.2f} {min(peak_times):>10.2f} {min(peak_memory) / 1e6:>20.1f}",
+				f"{gsmd_size / 1e6:>10.2f} {binary_size / 1e6:>17.2f}",
+				)
+
+
+if __name__ == "__main__":
+	main(*map(int, sys.argv[1:2]))
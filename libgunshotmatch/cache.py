@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+#
+#  cache.py
+"""
+On-disk cache of parsed raw GC-MS data files.
+
+Parsing the original JDX, mzML or CDF file is often the slowest step of creating a :class:`~.Datafile`,
+and the same files are parsed again each time a method is re-run.
+A :class:`~.GCMSDataCache` stores the parsed :class:`~pyms.GCMS.Class.GCMS_data` in a binary container
+(see :mod:`libgunshotmatch.container`), keyed by a hash of the raw file's content,
+so unchanged files are only parsed once.
+
+:meth:`Datafile.load_gcms_data() <.Datafile.load_gcms_data>` uses the cache set with :func:`~.set_default_cache`:
+
+.. code-block:: python
+
+	set_default_cache(GCMSDataCache("~/.cache/gunshotmatch", max_size=2 * 1024**3))
+
+When the cache grows larger than its maximum size the least recently used entries are removed.
+
+.. versionadded:: 0.14.0
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import hashlib
+import os
+import zipfile
+from typing import Any, Callable, List, Mapping, Optional
+
+# 3rd party
+import numpy
+import pyms
+from domdf_python_tools.paths import PathPlus
+from domdf_python_tools.typing import PathLike
+from pyms.GCMS.Class import GCMS_data
+from pyms.IonChromatogram import IonChromatogram
+from pyms.Spectrum import Scan
+
+# this package
+from libgunshotmatch import container
+
+__all__ = ("GCMSDataCache", "get_default_cache", "set_default_cache")
+
+# Incremented when the format of the cache entries changes.
+_CACHE_VERSION = 3
+
+_SUFFIX = ".gcms"
+
+
+class GCMSDataCache:
+	"""
+	On-disk cache of parsed raw GC-MS data files, keyed by a hash of the file's content.
+
+	:param directory: The directory to store the cache in, which is created if it doesn't exist.
+	:param max_size: The maximum total size of the cache, in bytes.
+		If :py:obj:`None` the size of the cache is not limited.
+	"""
+
+	#: The directory the cache is stored in.
+	directory: PathPlus
+
+	#: The maximum total size of the cache, in bytes.
+	max_size: Optional[int]
+
+	def __init__(self, directory: PathLike, max_size: Optional[int] = 1024**3):
+		self.directory = PathPlus(directory).expanduser()
+		self.directory.maybe_make(parents=True)
+		self.max_size = max_size
+
+	def __repr__(self) -> str:
+		return f"{self.__class__.__name__}({str(self.directory)!r}, max_size={self.max_size})"
+
+	def key(self, filename: PathLike, reader: Callable[[PathPlus], GCMS_data]) -> str:
+		"""
+		Returns the key for the given raw data file when parsed with the given reader.
+
+		The key is a hash of the file's content, the reader, and the version of PyMassSpec.
+
+		:param filename:
+		:param reader: The function used to parse the file, such as :func:`pyms.GCMS.IO.JCAMP.JCAMP_reader`.
+		"""
+
+		digest = hashlib.sha256()
+		# Not all callables (e.g. functools.partial objects) have a name.
+		reader_module = getattr(reader, "__module__", type(reader).__module__)
+		reader_name = f"{reader_module}.{getattr(reader, '__qualname__', repr(reader))}"
+		digest.update(f"{_CACHE_VERSION}\0{reader_name}\0{pyms.__version__}\0".encode("UTF-8"))
+
+		with open(filename, "rb") as fp:
+			while True:
+				chunk = fp.read(1024 * 1024)
+				if not chunk:
+					break
+				digest.update(chunk)
+
+		return digest.hexdigest()
+
+	def _path(self, key: str) -> PathPlus:
+		return self.directory / f"{key}{_SUFFIX}"
+
+	def load(self, filename: PathLike, reader: Callable[[PathPlus], GCMS_data]) -> GCMS_data:
+		"""
+		Load a raw data file from the cache, or parse it with ``reader`` and add it to the cache.
+
+		:param filename:
+		:param reader: The function used to parse the file, such as :func:`pyms.GCMS.IO.JCAMP.JCAMP_reader`.
+		"""
+
+		key = self.key(filename, reader)
+
+		gcms_data = self.get(key)
+		if gcms_data is None:
+			gcms_data = reader(PathPlus(filename))
+			self.put(key, gcms_data)
+
+		return gcms_data
+
+	def get(self, key: str) -> Optional[GCMS_data]:
+		"""
+		Returns the data with the given key, or :py:obj:`None` if it is not in the cache.
+
+		:param key: See :meth:`~.GCMSDataCache.key`.
+		"""
+
+		path = self._path(key)
+
+		try:
+			as_dict = container.read_container(path)
+		except FileNotFoundError:
+			return None
+		except (zipfile.BadZipFile, KeyError, ValueError):
+			# Incomplete or corrupt; replaced when the file is next parsed.
+			path.unlink(missing_ok=True)
+			return None
+
+		# Most recently used entries are kept when the cache is trimmed.
+		os.utime(path)
+
+		return _gcms_data_from_arrays(as_dict)  # type: ignore[arg-type]
+
+	def put(self, key: str, gcms_data: GCMS_data) -> None:
+		"""
+		Add data to the cache, and remove the least recently used entries if the cache is larger than :attr:`~.max_size`.
+
+		:param key: See :meth:`~.GCMSDataCache.key`.
+		:param gcms_data:
+		"""
+
+		# The container is written to a temporary file first, so other processes never see a partial entry.
+		container.write_container(self._path(key), _gcms_data_to_arrays(gcms_data), compression=zipfile.ZIP_STORED)
+
+		if self.max_size is not None:
+			self.trim(self.max_size)
+
+	def _entries(self) -> List[os.DirEntry]:
+		with os.scandir(self.directory) as it:
+			return [entry for entry in it if entry.name.endswith(_SUFFIX) and entry.is_file()]
+
+	@property
+	def size(self) -> int:
+		"""
+		The total size of the cache, in bytes.
+		"""
+
+		return sum(entry.stat().st_size for entry in self._entries())
+
+	def __len__(self) -> int:
+		return len(self._entries())
+
+	def trim(self, max_size: int) -> None:
+		"""
+		Remove the least recently used entries until the cache is no larger than ``max_size`` bytes.
+
+		:param max_size:
+		"""
+
+		entries = [(entry.stat(), entry.path) for entry in self._entries()]
+		size = sum(stat.st_size for stat, path in entries)
+
+		for stat, path in sorted(entries, key=lambda e: e[0].st_mtime_ns):
+			if size <= max_size:
+				break
+
+			try:
+				os.unlink(path)
+			except FileNotFoundError:
+				# Removed by another process.
+				pass
+			size -= stat.st_size
+
+	def clear(self) -> None:
+		"""
+		Remove all entries from the cache.
+		"""
+
+		self.trim(0)
+
+
+def _gcms_data_to_arrays(gcms_data: GCMS_data) -> container.JSONInput:
+	# The internal list, as the property returns a deep copy.
+	scan_list = gcms_data._scan_list
+	lengths = [len(scan) for scan in scan_list]
+
+	# The internal lists, as the properties return copies.
+	masses = [mass for scan in scan_list for mass in scan._mass_list]
+	intensities = [intensity for scan in scan_list for intensity in scan._intensity_list]
+
+	return {
+			"time_list": numpy.asarray(gcms_data.time_list, dtype=numpy.float64),
+			"offsets": numpy.cumsum([0, *lengths], dtype=numpy.int64),
+			"mass_list": numpy.asarray(masses, dtype=numpy.float64),
+			"intensity_list": numpy.asarray(intensities, dtype=numpy.float64),
+			# As calculated by PyMassSpec, so it needn't be calculated again (possibly with different rounding).
+			"tic": gcms_data.tic.intensity_array,
+			}
+
+
+def _gcms_data_from_arrays(as_dict: Mapping[str, Any]) -> GCMS_data:
+	offsets_array: numpy.ndarray = as_dict["offsets"]
+	masses_array: numpy.ndarray = as_dict["mass_list"]
+
+	# The smallest and largest mass in each scan which isn't empty.
+	# Scans in neither ascending nor descending order were stored as they are, so the masses can't just be indexed.
+	starts = offsets_array[:-1][numpy.diff(offsets_array) > 0]
+	if len(starts):
+		min_masses = iter(numpy.minimum.reduceat(masses_array, starts).tolist())
+		max_masses = iter(numpy.maximum.reduceat(masses_array, starts).tolist())
+
+	offsets = offsets_array.tolist()
+	masses = masses_array.tolist()
+	intensities = as_dict["intensity_list"].tolist()
+
+	scan_list = []
+	for start, end in zip(offsets, offsets[1:]):
+		# Constructed directly rather than through Scan.__init__, as with readers._scans_from_arrays.
+		# The scans were checked (and put into ascending order) when the file was first parsed.
+		scan = Scan.__new__(Scan)
+		scan._mass_list = masses[start:end]
+		scan._intensity_list = intensities[start:end]
+		if start == end:
+			scan._min_mass = scan._max_mass = None
+		else:
+			scan._min_mass = next(min_masses)
+			scan._max_mass = next(max_masses)
+		scan_list.append(scan)
+
+	# Also constructed directly, as GCMS_data.__init__ checks the type of every scan and calculates the TIC.
+	gcms_data = GCMS_data.__new__(GCMS_data)
+	gcms_data._time_list = as_dict["time_list"].tolist()
+	gcms_data._scan_list = scan_list
+	gcms_data._set_time()
+	gcms_data._min_mass = float(masses_array.min()) if len(masses_array) else None
+	gcms_data._max_mass = float(masses_array.max()) if len(masses_array) else None
+	gcms_data._tic = IonChromatogram(as_dict["tic"].copy(), gcms_data._time_list[:])
+
+	return gcms_data
+
+
+_default_cache: Optional[GCMSDataCache] = None
+
+
+def get_default_cache() -> Optional[GCMSDataCache]:
+	"""
+	Returns the cache used by :meth:`Datafile.load_gcms_data() <.Datafile.load_gcms_data>`,
+	or :py:obj:`None` if parsed files are not cached.
+	"""
+
+	return _default_cache
+
+
+def set_default_cache(cache: Optional[GCMSDataCache]) -> Optional[GCMSDataCache]:
+	"""
+	Set the cache used by :meth:`Datafile.load_gcms_data() <.Datafile.load_gcms_data>`.
+
+	:param cache: The cache, or :py:obj:`None` to stop caching parsed files.
+
+	:returns: The previous cache.
+	"""
+
+	global _default_cache
+
+	previous, _default_cache = _default_cache, cache
+	return previous
@@ -52,7 +52,7 @@ from libgunshotmatch.consolidate._fields import (
 from libgunshotmatch.consolidate._spectra import PermsListType, _map_func
 from libgunshotmatch.method import ConsolidateMethod
 from libgunshotmatch.method._fields import Integer
-from libgunshotmatch.peak import QualifiedPeak
+from libgunshotmatch.peak import QualifiedPeak, _mass_spectrum_from_dict, _mass_spectrum_to_dict
 from libgunshotmatch.utils import _fix_init_annotations, _to_list
 
 __all__ = (
@@ -206,18 +206,19 @@ class ConsolidatedSearchResult:
 		Construct a :class:`~.ConsolidatedSearchResult` from a dictionary.
 
 		:param d:
-		"""
 
-		hit_numbers = [float("nan") if hn == -65535 else hn for hn in d["hit_numbers"]]
-		mf_list = [float("nan") if mf == -65535 else mf for mf in d["mf_list"]]
-		rmf_list = [float("nan") if mf == -65535 else mf for mf in d["rmf_list"]]
+		.. versionchanged:: 0.14.0
+
+			Values of ``-65535`` are no longer converted to ``NaN``,
+			as :func:`~.read_gzip_json` now returns ``NaN`` values as they are.
+		"""
 
 		return cls(
 				name=d["name"],
 				cas=d["cas"],
-				mf_list=mf_list,
-				rmf_list=rmf_list,
-				hit_numbers=hit_numbers,
+				mf_list=list(d["mf_list"]),
+				rmf_list=list(d["rmf_list"]),
+				hit_numbers=list(d["hit_numbers"]),
 				reference_data=d["reference_data"],
 				)
 
@@ -440,19 +441,29 @@ class ConsolidatedPeak:
 	# 	else:
 	# 		return NotImplemented
 
-	def to_dict(self) -> Dict[str, Any]:
+	def to_dict(self, compact: Union[bool, str] = False) -> Dict[str, Any]:
 		"""
 		Returns a dictionary representation of this :class:`~.ConsolidatedPeak`.
 
 		All keys are native, JSON-serializable, Python objects.
+
+		:param compact: Whether to use the compact encoding for the mass spectra.
+			See :meth:`PeakList.to_list() <libgunshotmatch.peak.PeakList.to_list>` for details.
+
+		.. versionchanged:: 0.14.0  Added the ``compact`` argument.
 		"""
 
+		if compact:
+			ms_list = [_mass_spectrum_to_dict(ms, compact=compact) if ms else None for ms in self.ms_list]
+		else:
+			ms_list = [dict(ms) if ms else None for ms in self.ms_list]
+
 		return {
 				"rt_list": self.rt_list,
 				"area_list": self.area_list,
 				"meta": self.meta,
 				"hits": [hit.to_dict() for hit in self.hits],
-				"ms_list": [dict(ms) if ms else None for ms in self.ms_list],
+				"ms_list": ms_list,
 				"ms_comparison": self.ms_comparison.to_dict(),
 				}
 
@@ -472,6 +483,10 @@ class ConsolidatedPeak:
 		Construct a :class:`~.ConsolidatedPeak` from a dictionary.
 
 		:param d:
+
+		.. versionchanged:: 0.14.0
+
+			``-65535`` in the ``rt_list`` and ``area_list`` is no longer treated as ``NaN``.
 		"""
 
 		hits = []
@@ -483,14 +498,13 @@ class ConsolidatedPeak:
 			if msd is None:
 				ms_list.append(None)
 			else:
-				ms_list.append(MassSpectrum.from_dict(msd))
-
-		rt_list = [float("nan") if hn == -65535 else hn for hn in d["rt_list"]]
-		area_list = [float("nan") if hn == -65535 else hn for hn in d["area_list"]]
+				# Also handles spectra already constructed from a project's spectrum table,
+				# and the compact encoding.
+				ms_list.append(_mass_spectrum_from_dict(msd))
 
 		return cls(
-				rt_list=rt_list,
-				area_list=area_list,
+				rt_list=list(d["rt_list"]),
+				area_list=list(d["area_list"]),
 				ms_list=ms_list,
 				meta=d["meta"],
 				ms_comparison=d["ms_comparison"],
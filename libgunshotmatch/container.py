@@ -0,0 +1,906 @@
+#!/usr/bin/env python3
+#
+#  container.py
+"""
+Binary container format for ``.gsmd``, ``.gsmr`` and ``.gsmp`` files.
+
+The container is a zip archive. Metadata is stored as JSON,
+while numeric arrays (retention times, masses, intensities, peak spectra)
+are stored as raw little-endian blocks in a separate member,
+so they can be loaded with :func:`numpy.frombuffer` without being parsed from text.
+
+Within the JSON document each array is replaced by a reference of the form
+
+.. code-block:: json
+
+	{"__ndarray__": {"dtype": "<f8", "shape": [2000, 450], "offset": 0}}
+
+where ``offset`` is the position of the array's data within the arrays member.
+Arrays are aligned to 64 bytes.
+References may instead contain the array's data inline, encoded as base64 under the ``base64`` key
+(in place of ``offset``), as in the compact encoding of mass spectra in JSON documents
+(see :meth:`PeakList.to_list <libgunshotmatch.peak.PeakList.to_list>`).
+
+If the arrays member is stored without compression its data is also aligned within the file,
+so the arrays can be memory-mapped directly (see the ``mmap`` argument to :func:`~.read_container`).
+
+Large members of the document (e.g. each repeat in a project) may be stored as separate sections,
+each with their own JSON and arrays members, so they can be read individually with :func:`~.read_section`.
+In the root document each section is replaced by a reference of the form
+
+.. code-block:: json
+
+	{"__section__": "datafile_data/ELEY_1_SUBTRACT"}
+
+The sections, and the names of their members, are listed in the ``index.json`` member.
+A small summary of the document (see :func:`~.read_metadata`) may also be stored in the index,
+so it can be read without reading any of the sections.
+
+The index also gives a SHA-256 hash of each section's members, which :func:`~.update_container` uses to
+skip writing the file if none of the sections have changed.
+Sections which haven't changed are copied from the existing file as they are stored,
+without being decoded or decompressed.
+
+.. versionadded:: 0.14.0
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import base64
+import contextlib
+import hashlib
+import os
+import secrets
+import shutil
+import struct
+import tempfile
+import zipfile
+from concurrent.futures import Executor, Future
+from typing import IO, Any, Collection, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+# 3rd party
+import numpy
+import sdjson
+from domdf_python_tools.paths import PathPlus
+from domdf_python_tools.typing import PathLike
+
+# this package
+from libgunshotmatch import gzip_util
+from libgunshotmatch.gzip_util import JSONInput, JSONOutput
+
+__all__ = (
+		"UNCHANGED",
+		"decode_array",
+		"encode_array",
+		"get_section_name",
+		"is_array_reference",
+		"is_container",
+		"read_container",
+		"read_document",
+		"read_metadata",
+		"read_section",
+		"read_section_hashes",
+		"update_container",
+		"write_container",
+		)
+
+#: The format identifier written to the container's index.
+FORMAT_NAME = "gunshotmatch-container"
+
+#: The container format version.
+FORMAT_VERSION = 1
+
+_ZIP_MAGIC = b"PK\x03\x04"
+_ALIGNMENT = 64
+_NDARRAY_KEY = "__ndarray__"
+_SECTION_KEY = "__section__"
+_METADATA_KEY = "metadata"
+_READ_BLOCK_SIZE = 1024 * 1024
+_METADATA_CHUNK_SIZE = 16 * 1024
+
+# Fixed timestamp for zip members, so the output is reproducible (c.f. ``mtime=0`` for gzip).
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Extra field header ID used for alignment padding (the same as Android's zipalign).
+_PADDING_EXTRA_ID = 0xd935
+
+# Size of the fixed part of a zip local file header, and the zip64 extra field zipfile adds to it.
+_LOCAL_HEADER_SIZE = 30
+_ZIP64_EXTRA_SIZE = 20
+
+
+class _Unchanged:
+
+	def __repr__(self) -> str:
+		return "UNCHANGED"
+
+
+#: Placeholder for sections of a document which :func:`~.update_container` should leave as they are.
+UNCHANGED = _Unchanged()
+
+
+def _zip_info(name: str, compression: int) -> zipfile.ZipInfo:
+	info = zipfile.ZipInfo(name, date_time=_DATE_TIME)
+	info.compress_type = compression
+	return info
+
+
+def _pack_arrays(obj: Any, arrays: List[numpy.ndarray], offset: List[int]) -> Any:
+	"""
+	Replace :class:`numpy.ndarray` objects in ``obj`` with references into the arrays member.
+
+	:param obj:
+	:param arrays: List to append the (little-endian, C-contiguous) arrays to.
+	:param offset: Single-element list giving the offset of the next array in the arrays member.
+	"""
+
+	if isinstance(obj, numpy.ndarray):
+		array = numpy.ascontiguousarray(obj, dtype=obj.dtype.newbyteorder('<'))
+		array_offset = offset[0]
+		arrays.append(array)
+		offset[0] += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+		return {_NDARRAY_KEY: {"dtype": array.dtype.str, "shape": list(array.shape), "offset": array_offset}}
+	elif isinstance(obj, dict):
+		return {k: _pack_arrays(v, arrays, offset) for k, v in obj.items()}
+	elif isinstance(obj, (list, tuple)):
+		return [_pack_arrays(v, arrays, offset) for v in obj]
+	else:
+		return obj
+
+
+def encode_array(array: numpy.ndarray) -> Dict[str, Any]:
+	"""
+	Returns a reference to an array with the (little-endian) data inline, encoded as base64.
+
+	Unlike the arrays in a binary container, the reference can be written to JSON.
+	It is converted back to an array by :func:`~.decode_array`, or when the container is read.
+
+	:param array:
+	"""
+
+	array = numpy.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+	return {
+			_NDARRAY_KEY: {
+					"dtype": array.dtype.str,
+					"shape": list(array.shape),
+					"base64": base64.b64encode(array.data.cast('B')).decode("ascii"),
+					},
+			}
+
+
+def decode_array(obj: Mapping[str, Any]) -> numpy.ndarray:
+	"""
+	Construct an array from a reference created by :func:`~.encode_array`.
+
+	The array is read-only, as it shares memory with the decoded data.
+
+	:param obj:
+	"""
+
+	ref = obj[_NDARRAY_KEY]
+	return numpy.frombuffer(base64.b64decode(ref["base64"]), dtype=ref["dtype"]).reshape(ref["shape"])
+
+
+def is_array_reference(obj: Any) -> bool:
+	"""
+	Returns whether ``obj`` is a reference to an array, such as one created by :func:`~.encode_array`.
+
+	:param obj:
+	"""
+
+	return isinstance(obj, dict) and _NDARRAY_KEY in obj and len(obj) == 1
+
+
+def _unpack_arrays(obj: Any, buffer: Union[bytearray, numpy.memmap]) -> Any:
+	"""
+	Replace array references in ``obj`` with :class:`numpy.ndarray` objects backed by ``buffer``.
+
+	:param obj:
+	:param buffer: The contents of the arrays member, either in memory or as a
+		memory-mapped array of bytes (in which case the returned arrays are also :class:`numpy.memmap` objects).
+	"""
+
+	if isinstance(obj, dict):
+		if is_array_reference(obj):
+			ref = obj[_NDARRAY_KEY]
+			if "base64" in ref:
+				return decode_array(obj)
+
+			dtype = numpy.dtype(ref["dtype"])
+			shape: Tuple[int, ...] = tuple(ref["shape"])
+			count = int(numpy.prod(shape, dtype=numpy.int64))
+			offset = ref["offset"]
+
+			if isinstance(buffer, numpy.ndarray):
+				# Slicing keeps the memmap subclass, unlike numpy.frombuffer
+				array = buffer[offset:offset + count * dtype.itemsize].view(dtype)
+			else:
+				array = numpy.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+			return array.reshape(shape)
+		return {k: _unpack_arrays(v, buffer) for k, v in obj.items()}
+	elif isinstance(obj, list):
+		return [_unpack_arrays(v, buffer) for v in obj]
+	else:
+		return obj
+
+
+def _read_member(zf: zipfile.ZipFile, name: str) -> bytearray:
+	"""
+	Read a member of the zip file into a writable buffer.
+
+	:param zf:
+	:param name:
+	"""
+
+	info = zf.getinfo(name)
+	buffer = bytearray(info.file_size)
+	view = memoryview(buffer)
+	position = 0
+
+	with zf.open(info) as f:
+		while position < info.file_size:
+			# Read in blocks, as ZipExtFile.readinto makes a temporary copy of the data read.
+			n_read = f.readinto(view[position:position + _READ_BLOCK_SIZE])  # type: ignore[attr-defined]
+			if not n_read:
+				raise zipfile.BadZipFile(f"Unexpected end of data in member {name!r}")
+			position += n_read
+
+	return buffer
+
+
+def _member_data_offset(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> int:
+	"""
+	Returns the position of a member's data within the zip file.
+
+	:param zf:
+	:param info:
+	"""
+
+	# Use a separate handle, as other threads may be reading from the zip file.
+	assert zf.filename is not None
+	with open(zf.filename, "rb") as fp:
+		fp.seek(info.header_offset)
+		header = fp.read(_LOCAL_HEADER_SIZE)
+
+	if header[:4] != _ZIP_MAGIC:
+		raise zipfile.BadZipFile(f"Bad local file header for member {info.filename!r}")
+
+	filename_length, extra_length = struct.unpack("<HH", header[26:30])
+	return info.header_offset + _LOCAL_HEADER_SIZE + filename_length + extra_length
+
+
+def _memmap_member(zf: zipfile.ZipFile, name: str) -> Union[bytearray, numpy.memmap]:
+	"""
+	Memory-map a member of the zip file as a read-only array of bytes.
+
+	Members stored without compression are mapped in place.
+	Compressed members are first extracted to an anonymous temporary file.
+
+	:param zf:
+	:param name:
+	"""
+
+	info = zf.getinfo(name)
+	if not info.file_size:
+		# Zero-length files can't be mapped.
+		return bytearray()
+
+	if info.compress_type == zipfile.ZIP_STORED:
+		assert zf.filename is not None
+		offset = _member_data_offset(zf, info)
+		return numpy.memmap(zf.filename, dtype=numpy.uint8, mode='r', offset=offset, shape=(info.file_size, ))
+
+	# The mmap holds its own handle to the file, so it remains valid (and is deleted) once closed.
+	with tempfile.TemporaryFile() as sidecar:
+		with zf.open(info) as f:
+			shutil.copyfileobj(f, sidecar, _READ_BLOCK_SIZE)
+		sidecar.flush()
+		return numpy.memmap(sidecar, dtype=numpy.uint8, mode='r', shape=(info.file_size, ))
+
+
+def _alignment_padding(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+	"""
+	Returns an extra field which pads the local header of a (zip64) member so its data is aligned.
+
+	:param zf:
+	:param info:
+	"""
+
+	assert zf.fp is not None
+	header_size = _LOCAL_HEADER_SIZE + len(info.filename.encode("utf-8")) + _ZIP64_EXTRA_SIZE + 4
+	padding = -(zf.fp.tell() + header_size) % _ALIGNMENT
+	return struct.pack("<HH", _PADDING_EXTRA_ID, padding) + b"\x00" * padding
+
+
+def _write_arrays(f: IO[bytes], arrays: List[numpy.ndarray]) -> None:
+	for array in arrays:
+		if array.nbytes:
+			f.write(array.data.cast('B'))
+		padding = -array.nbytes % _ALIGNMENT
+		if padding:
+			f.write(b"\x00" * padding)
+
+
+@contextlib.contextmanager
+def _replace_file(path: PathLike) -> Iterator[PathPlus]:
+	"""
+	Context manager giving a temporary filename to write to, which then replaces ``path``.
+
+	Writing to a new file means arrays memory-mapped from the existing file remain valid,
+	as the file's data is only freed once they are closed.
+	If an exception is raised the temporary file is removed and ``path`` is left as it was.
+
+	:param path:
+	"""
+
+	path = PathPlus(path)
+	temp_path = path.with_name(f".{path.name}.{secrets.token_hex(8)}.tmp")
+
+	# Created with the same permissions as a new file (i.e. respecting the umask).
+	with temp_path.open("xb"):
+		pass
+
+	try:
+		if path.is_file():
+			shutil.copymode(path, temp_path)
+		yield temp_path
+		os.replace(temp_path, path)
+	except BaseException:
+		temp_path.unlink(missing_ok=True)
+		raise
+
+
+def is_container(path: PathLike) -> bool:
+	"""
+	Returns whether the given file is a binary container (rather than gzipped JSON).
+
+	:param path:
+	"""
+
+	with PathPlus(path).open("rb") as fp:
+		return fp.read(len(_ZIP_MAGIC)) == _ZIP_MAGIC
+
+
+def _split_sections(
+		data: JSONInput,
+		sections: Collection[str],
+		expand: Collection[str],
+		) -> Tuple[Any, Dict[str, Any]]:
+	"""
+	Split the members of the document to be stored as separate sections from the root document.
+
+	:param data:
+	:param sections: Keys of top-level members of ``data`` to store as separate sections.
+	:param expand: Keys of top-level members of ``data`` whose members should each be stored as a separate section.
+
+	:returns: The root document, with references in place of the sections,
+		and a mapping of section names to their content.
+	"""
+
+	section_data: Dict[str, Any] = {}
+
+	if not ((sections or expand) and isinstance(data, dict)):
+		return data, section_data
+
+	root = dict(data)
+
+	for key in sections:
+		if key in root:
+			section_data[key] = root[key]
+			root[key] = {_SECTION_KEY: key}
+
+	for key in expand:
+		value = root.get(key)
+		if isinstance(value, dict):
+			root[key] = {}
+			for member_key, member in value.items():
+				name = f"{key}/{member_key}"
+				section_data[name] = member
+				root[key][member_key] = {_SECTION_KEY: name}
+		elif isinstance(value, (list, tuple)):
+			root[key] = []
+			for idx, member in enumerate(value):
+				name = f"{key}/{idx}"
+				section_data[name] = member
+				root[key].append({_SECTION_KEY: name})
+
+	return root, section_data
+
+
+def _pack_section(name: str, value: Any) -> Tuple[Dict[str, Optional[str]], str, List[numpy.ndarray]]:
+	"""
+	Prepare a section of the document for writing.
+
+	:param name: The name of the section.
+	:param value: The section's content.
+
+	:returns: The section's entry in the index, its content (with arrays replaced by references) as JSON,
+		and the arrays.
+	"""
+
+	arrays: List[numpy.ndarray] = []
+	document = sdjson.dumps(_pack_arrays(value, arrays, [0]))
+
+	# The hash covers exactly what is written, so unchanged sections can be recognised without reading them.
+	sha256 = hashlib.sha256(document.encode("utf-8"))
+	for array in arrays:
+		if array.nbytes:
+			sha256.update(array.data.cast('B'))
+
+	# Sections other than the root only have an arrays member if they contain any arrays.
+	has_arrays = bool(arrays) or name == "root"
+	entry = {
+			"document": f"{name}.json",
+			"arrays": f"{name}.bin" if has_arrays else None,
+			"sha256": sha256.hexdigest(),
+			}
+	return entry, document, arrays
+
+
+def _open_arrays_member(zf: zipfile.ZipFile, name: str, compression: int) -> IO[bytes]:
+	"""
+	Open a new arrays member in the zip file for writing, aligning its data if it is stored without compression.
+
+	:param zf:
+	:param name:
+	:param compression:
+	"""
+
+	arrays_info = _zip_info(name, compression)
+	if compression == zipfile.ZIP_STORED:
+		arrays_info.extra = _alignment_padding(zf, arrays_info)
+	return zf.open(arrays_info, 'w', force_zip64=True)
+
+
+def _write_section(
+		zf: zipfile.ZipFile,
+		entry: Dict[str, Optional[str]],
+		document: str,
+		arrays: List[numpy.ndarray],
+		compression: int,
+		) -> None:
+	"""
+	Write a section of the document to the zip file.
+
+	:param zf:
+	:param entry: The section's entry in the index, giving the names of its members.
+	:param document: The section's content as JSON, with arrays replaced by references.
+	:param arrays: The arrays referenced by ``document``.
+	:param compression:
+	"""
+
+	assert entry["document"] is not None
+	zf.writestr(_zip_info(entry["document"], compression), document)
+
+	if entry["arrays"] is not None:
+		with _open_arrays_member(zf, entry["arrays"], compression) as f:
+			_write_arrays(f, arrays)
+
+
+def _copy_member(source: zipfile.ZipFile, name: str, zf: zipfile.ZipFile, new_name: str, arrays: bool) -> None:
+	"""
+	Copy a member from another zip file as it is stored, without decompressing and recompressing it.
+
+	:param source:
+	:param name: The name of the member in ``source``.
+	:param zf:
+	:param new_name: The name of the member in ``zf``.
+	:param arrays: Whether the member is an arrays member, which is written as zip64 and aligned
+		if it is stored without compression (as for :func:`~._open_arrays_member`).
+	"""
+
+	source_info = source.getinfo(name)
+	info = _zip_info(new_name, source_info.compress_type)
+	info.CRC = source_info.CRC
+	info.compress_size = source_info.compress_size
+	info.file_size = source_info.file_size
+	info.external_attr = source_info.external_attr
+	if arrays and info.compress_type == zipfile.ZIP_STORED:
+		info.extra = _alignment_padding(zf, info)
+
+	assert zf.fp is not None and source.filename is not None
+	info.header_offset = zf.fp.tell()
+	zf.fp.write(info.FileHeader(True if arrays else None))
+
+	with open(source.filename, "rb") as src:
+		src.seek(_member_data_offset(source, source_info))
+		remaining = source_info.compress_size
+		while remaining:
+			block = src.read(min(remaining, _READ_BLOCK_SIZE))
+			if not block:
+				raise zipfile.BadZipFile(f"Unexpected end of data in member {name!r}")
+			zf.fp.write(block)
+			remaining -= len(block)
+
+	# As done by zipfile once a member has been written.
+	zf.start_dir = zf.fp.tell()
+	zf.filelist.append(info)
+	zf.NameToInfo[info.filename] = info
+
+
+def _copy_section(
+		source: zipfile.ZipFile,
+		source_entry: Dict[str, Optional[str]],
+		zf: zipfile.ZipFile,
+		entry: Dict[str, Optional[str]],
+		compression: int,
+		) -> None:
+	"""
+	Copy a section of the document from another zip file, without decoding it.
+
+	Members already stored with the given compression method are copied as they are,
+	otherwise they are decompressed and recompressed.
+
+	:param source:
+	:param source_entry: The section's entry in the index of ``source``.
+	:param zf:
+	:param entry: The section's entry in the new index, giving the names of its members.
+	:param compression:
+	"""
+
+	assert source_entry["document"] is not None and entry["document"] is not None
+	if source.getinfo(source_entry["document"]).compress_type == compression:
+		_copy_member(source, source_entry["document"], zf, entry["document"], arrays=False)
+	else:
+		zf.writestr(_zip_info(entry["document"], compression), source.read(source_entry["document"]))
+
+	if source_entry["arrays"] is None or entry["arrays"] is None:
+		return
+
+	if source.getinfo(source_entry["arrays"]).compress_type == compression:
+		_copy_member(source, source_entry["arrays"], zf, entry["arrays"], arrays=True)
+	else:
+		with source.open(source_entry["arrays"]) as src, _open_arrays_member(zf, entry["arrays"], compression) as dst:
+			while True:
+				block = src.read(_READ_BLOCK_SIZE)
+				if not block:
+					break
+				dst.write(block)
+
+
+def write_container(
+		path: PathLike,
+		data: JSONInput,
+		compression: int = zipfile.ZIP_DEFLATED,
+		sections: Collection[str] = (),
+		expand: Collection[str] = (),
+		metadata: Optional[Dict[str, Any]] = None,
+		) -> None:
+	"""
+	Write a document to a binary container file.
+
+	Any :class:`numpy.ndarray` objects within ``data`` are stored as raw little-endian blocks;
+	everything else must be JSON-serializable.
+
+	:param path: The filename to write to.
+	:param data: The document to write.
+	:param compression: The compression method for the members of the zip file.
+		Use :py:data:`zipfile.ZIP_STORED` for files which will be memory-mapped.
+	:param sections: Keys of top-level members of ``data`` to store as separate sections.
+	:param expand: Keys of top-level members of ``data`` whose members should each be stored as a separate section,
+		named ``'<key>/<member key or index>'``.
+	:param metadata: A small, JSON-serializable summary of the document to store in the index,
+		to be read with :func:`~.read_metadata`.
+
+	The file is written to a temporary file alongside ``path``, which then replaces it,
+	so any arrays memory-mapped from an existing file at ``path`` remain valid.
+	"""
+
+	root, section_data = _split_sections(data, sections, expand)
+
+	index: Dict[str, Any] = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "sections": {}}
+	if metadata is not None:
+		index[_METADATA_KEY] = metadata
+
+	packed_sections = []
+	for name, value in [("root", root), *section_data.items()]:
+		entry, document, arrays = _pack_section(name, value)
+		index["sections"][name] = entry
+		packed_sections.append((entry, document, arrays))
+
+	with _replace_file(path) as temp_path, zipfile.ZipFile(temp_path, 'w') as zf:
+		zf.writestr(_zip_info("index.json", compression), sdjson.dumps(index))
+		for entry, document, arrays in packed_sections:
+			_write_section(zf, entry, document, arrays, compression)
+
+
+def update_container(
+		path: PathLike,
+		data: JSONInput,
+		sections: Collection[str] = (),
+		expand: Collection[str] = (),
+		metadata: Optional[Dict[str, Any]] = None,
+		compression: int = zipfile.ZIP_DEFLATED,
+		) -> bool:
+	"""
+	Update a binary container, re-encoding only the sections of the document which may have changed.
+
+	The arguments are as for :func:`~.write_container`, except that sections known not to have changed
+	may be given as :py:data:`~.UNCHANGED`, in which case they are copied from the existing file
+	without being decoded.
+
+	The other sections are compared with the existing file by their content (a SHA-256 hash of their members),
+	and the file is only written if any section, the metadata or the compression method has changed.
+	It is then rewritten in full (as for :func:`~.write_container`), so superseded members don't accumulate,
+	but the members of the unchanged sections are copied as they are stored, without being decompressed
+	(unless the compression method has changed).
+
+	:param path: The filename to update.
+	:param data: The document to write.
+	:param sections: Keys of top-level members of ``data`` which are stored as separate sections.
+	:param expand: Keys of top-level members of ``data`` whose members are each stored as a separate section.
+	:param metadata: A small, JSON-serializable summary of the document to store in the index.
+	:param compression: The compression method for the members of the zip file.
+
+	:raises KeyError: If a section given as :py:data:`~.UNCHANGED` is not present in the container.
+
+	:returns: Whether the file was written.
+	"""
+
+	root, section_data = _split_sections(data, sections, expand)
+
+	with zipfile.ZipFile(PathPlus(path), 'r') as zf:
+		old_index = _read_index(zf, path)
+		old_compression = zf.getinfo("index.json").compress_type
+
+	index: Dict[str, Any] = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "sections": {}}
+	if metadata is not None:
+		index[_METADATA_KEY] = metadata
+
+	# Check all the unchanged sections are present before anything is written.
+	packed_sections: List[Tuple[str, Dict[str, Optional[str]], Optional[str], List[numpy.ndarray]]] = []
+	# Compared as JSON, as tuples are read back as lists.
+	changed = compression != old_compression or sdjson.dumps(metadata) != sdjson.dumps(old_index.get(_METADATA_KEY))
+	for name, value in [("root", root), *section_data.items()]:
+		old_entry = old_index["sections"].get(name)
+
+		if value is UNCHANGED:
+			if old_entry is None:
+				raise KeyError(name)
+			entry = {
+					"document": f"{name}.json",
+					"arrays": None if old_entry["arrays"] is None else f"{name}.bin",
+					"sha256": old_entry.get("sha256"),
+					}
+			packed_sections.append((name, entry, None, []))
+		else:
+			entry, document, arrays = _pack_section(name, value)
+			if old_entry is not None and old_entry.get("sha256") == entry["sha256"]:
+				# Copied as it is stored, rather than compressed again.
+				packed_sections.append((name, entry, None, []))
+			else:
+				packed_sections.append((name, entry, document, arrays))
+				changed = True
+
+		index["sections"][name] = entry
+
+	if not (changed or old_index["sections"].keys() - index["sections"].keys()):
+		return False
+
+	# Write to a new file, so the unchanged sections can be copied from the existing one.
+	with zipfile.ZipFile(PathPlus(path), 'r') as source:
+		with _replace_file(path) as temp_path, zipfile.ZipFile(temp_path, 'w') as zf:
+			zf.writestr(_zip_info("index.json", compression), sdjson.dumps(index))
+			for name, entry, section_document, section_arrays in packed_sections:
+				if section_document is None:
+					_copy_section(source, old_index["sections"][name], zf, entry, compression)
+				else:
+					_write_section(zf, entry, section_document, section_arrays, compression)
+
+	return True
+
+
+def _read_index(zf: zipfile.ZipFile, path: PathLike) -> Dict[str, Any]:
+	"""
+	Read and validate the index of a container.
+
+	:param zf:
+	:param path: The filename, for error messages.
+	"""
+
+	index: Dict[str, Any] = sdjson.loads(zf.read("index.json"))
+
+	if index.get("format") != FORMAT_NAME:
+		raise ValueError(f"{path!s} is not a GunShotMatch container file.")
+	if index["version"] > FORMAT_VERSION:
+		raise ValueError(f"Unsupported container version {index['version']}")
+
+	return index
+
+
+def _read_section(zf: zipfile.ZipFile, entry: Dict[str, Optional[str]], mmap: bool) -> JSONOutput:
+	"""
+	Read a section of the document from the zip file.
+
+	:param zf:
+	:param entry: The section's entry in the index.
+	:param mmap: Whether to memory-map the arrays.
+	"""
+
+	assert entry["document"] is not None
+	document = sdjson.loads(zf.read(entry["document"]))
+
+	buffer: Union[bytearray, numpy.memmap]
+	if entry["arrays"] is None:
+		buffer = bytearray()
+	elif mmap:
+		buffer = _memmap_member(zf, entry["arrays"])
+	else:
+		buffer = _read_member(zf, entry["arrays"])
+
+	return _unpack_arrays(document, buffer)
+
+
+def _resolve_sections(obj: Any, sections: Dict[str, Any]) -> Any:
+	"""
+	Replace section references in ``obj`` with the sections' content.
+
+	:param obj:
+	:param sections: Mapping of section names to their content, or to futures giving their content.
+	"""
+
+	if isinstance(obj, dict):
+		name = get_section_name(obj)
+		if name is not None:
+			section = sections[name]
+			return section.result() if isinstance(section, Future) else section
+		return {k: _resolve_sections(v, sections) for k, v in obj.items()}
+	elif isinstance(obj, list):
+		return [_resolve_sections(v, sections) for v in obj]
+	else:
+		return obj
+
+
+def read_container(path: PathLike, mmap: bool = False, executor: Optional[Executor] = None) -> JSONOutput:
+	"""
+	Read a document from a binary container file.
+
+	Arrays are returned as :class:`numpy.ndarray` objects sharing a single buffer (per section),
+	without any parsing or conversion.
+
+	:param path: The filename to read from.
+	:param mmap: If :py:obj:`True` the arrays are returned as read-only :class:`numpy.memmap` objects,
+		which are only read from disk when accessed. If the arrays are compressed within the container
+		they are first extracted to a temporary file.
+	:param executor: Optional executor (e.g. a :class:`~concurrent.futures.ThreadPoolExecutor`)
+		to decompress and decode the document's sections in parallel.
+	"""
+
+	with zipfile.ZipFile(PathPlus(path), 'r') as zf:
+		index = _read_index(zf, path)
+
+		sections: Dict[str, Any] = {}
+		for name, entry in index["sections"].items():
+			if name == "root":
+				continue
+			if executor is None:
+				sections[name] = _read_section(zf, entry, mmap)
+			else:
+				sections[name] = executor.submit(_read_section, zf, entry, mmap)
+
+		root = _read_section(zf, index["sections"]["root"], mmap)
+
+		# Wait for all the sections before the zip file is closed.
+		return _resolve_sections(root, sections)
+
+
+def read_section(path: PathLike, name: str, mmap: bool = False, sha256: Optional[str] = None) -> JSONOutput:
+	"""
+	Read a single section of the document from a binary container file.
+
+	:param path: The filename to read from.
+	:param name: The name of the section, e.g. ``'alignment'`` or ``'datafile_data/ELEY_1_SUBTRACT'``.
+		The ``'root'`` section is the document with references in place of the other sections
+		(see :func:`~.get_section_name`).
+	:param mmap: If :py:obj:`True` the arrays are returned as read-only :class:`numpy.memmap` objects.
+	:param sha256: The expected hash of the section (see :func:`~.read_section_hashes`),
+		to check it hasn't changed since it was last read.
+
+	:raises KeyError: If the container has no such section.
+	:raises ValueError: If the section's hash doesn't match ``sha256``.
+	"""
+
+	with zipfile.ZipFile(PathPlus(path), 'r') as zf:
+		index = _read_index(zf, path)
+
+		if name not in index["sections"]:
+			raise KeyError(name)
+
+		entry = index["sections"][name]
+		if sha256 is not None and entry.get("sha256") != sha256:
+			raise ValueError(f"Section {name!r} of {path!s} has changed.")
+
+		return _read_section(zf, entry, mmap)
+
+
+def read_section_hashes(path: PathLike) -> Dict[str, Optional[str]]:
+	"""
+	Returns a mapping of the names of the sections in a binary container file
+	to the SHA-256 hashes of their content.
+
+	:param path: The filename to read from.
+	"""
+
+	with zipfile.ZipFile(PathPlus(path), 'r') as zf:
+		index = _read_index(zf, path)
+
+	return {name: entry.get("sha256") for name, entry in index["sections"].items()}
+
+
+def get_section_name(obj: Any) -> Optional[str]:
+	"""
+	Returns the name of the section ``obj`` refers to, if it is a reference to a separate section
+	in the root section of a binary container file, or :py:obj:`None` otherwise.
+
+	:param obj: A value from the root section (see :func:`~.read_section`).
+	"""
+
+	if isinstance(obj, dict) and _SECTION_KEY in obj and len(obj) == 1:
+		return obj[_SECTION_KEY]
+	return None
+
+
+def read_document(path: PathLike, mmap: bool = False, executor: Optional[Executor] = None) -> JSONOutput:
+	"""
+	Load a ``.gsmd``, ``.gsmr`` or ``.gsmp`` file, which may either be compressed JSON or a binary container.
+
+	The format (and, for JSON, the compression codec) is detected from the first bytes of the file.
+
+	:param path: The filename to read from.
+	:param mmap: If :py:obj:`True` arrays in binary containers are memory-mapped rather than read into memory.
+		Has no effect for JSON files.
+	:param executor: Optional executor to decode the sections of binary containers in parallel.
+		Has no effect for JSON files.
+	"""
+
+	if is_container(path):
+		return read_container(path, mmap=mmap, executor=executor)
+	else:
+		return gzip_util.read_gzip_json(path)
+
+
+def read_metadata(path: PathLike) -> Optional[Dict[str, Any]]:
+	"""
+	Read the summary of the document stored at the start of a ``.gsmd``, ``.gsmr`` or ``.gsmp`` file,
+	without reading the rest of the file.
+
+	For binary containers the summary is stored in the index.
+	For compressed JSON it is the ``'metadata'`` member, which must be the first member of the document.
+
+	:param path: The filename to read from.
+
+	:returns: The summary, or :py:obj:`None` if the file was written without one.
+	"""
+
+	if is_container(path):
+		with zipfile.ZipFile(PathPlus(path), 'r') as zf:
+			return _read_index(zf, path).get(_METADATA_KEY)
+
+	# Only the first few kilobytes are decompressed before the generator is closed.
+	for key_path, value in gzip_util.iter_gzip_json(path, chunk_size=_METADATA_CHUNK_SIZE):
+		if key_path == (_METADATA_KEY, ) and isinstance(value, dict):
+			return value
+		break
+
+	return None
@@ -27,25 +27,39 @@ Represents a parsed datafile.
 #
 
 # stdlib
+import functools
 import getpass
 import os
 import socket
+import zipfile
+from concurrent.futures import Executor
 from datetime import datetime
 from statistics import mean, median
-from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple, Type, Union
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Type, Union
 
 # 3rd party
 import attr
-import pyms.Noise.SavitzkyGolay
-import pyms.TopHat
+import numpy
 from domdf_python_tools.paths import PathPlus
 from domdf_python_tools.typing import PathLike
 from enum_tools import IntEnum
 from pyms.GCMS.Class import GCMS_data
-from pyms.IntensityMatrix import IntensityMatrix, build_intensity_matrix_i
+from pyms.IntensityMatrix import IntensityMatrix
 
 # this package
-from libgunshotmatch import gzip_util
+from libgunshotmatch import container, gzip_util
+from libgunshotmatch.cache import GCMSDataCache, get_default_cache
+from libgunshotmatch.container import decode_array, encode_array, is_array_reference
+from libgunshotmatch.intensity_matrix import (
+		SparseIntensityMatrix,
+		_build_intensity_matrix,
+		_filter_array,
+		_filter_padding,
+		_filter_parameters,
+		_mass_bins,
+		_new_intensity_matrix,
+		_rt_crop_indices
+		)
 from libgunshotmatch.method import SavitzkyGolayMethod
 from libgunshotmatch.peak import PeakList, QualifiedPeak, _to_peak_list, peak_from_dict
 
@@ -74,6 +88,53 @@ class FileType(IntEnum):
 		raise ValueError(f"Unrecognised file format {value}")
 
 
+def _as_list(values: Union[Sequence[float], numpy.ndarray]) -> List[float]:
+	if isinstance(values, numpy.ndarray):
+		return values.tolist()
+	return list(values)
+
+
+def _as_array(values: Any) -> Any:
+	# Arrays encoded as base64 (see _intensities_to_dict) are copied, as the decoded arrays are read-only.
+	if is_array_reference(values):
+		return decode_array(values).copy()
+	return values
+
+
+def _intensities_to_dict(intensity_matrix: IntensityMatrix, numpy_arrays: bool = False, lazy: bool = False) -> Any:
+	"""
+	Returns the intensities of an intensity matrix, for :meth:`Datafile.to_dict() <.Datafile.to_dict>`.
+
+	The intensities of a :class:`~.SparseIntensityMatrix` are given as a dictionary
+	of its ``data``, ``indices`` and ``indptr`` arrays.
+
+	:param intensity_matrix:
+	:param numpy_arrays: If :py:obj:`True` arrays are given as :class:`numpy.ndarray` objects rather than lists.
+	:param lazy: If :py:obj:`True` arrays are given as :class:`numpy.ndarray` objects,
+		to be encoded directly by :func:`~.write_gzip_json` as it is written.
+	"""
+
+	def encode(array: numpy.ndarray) -> Any:
+		if numpy_arrays:
+			return array
+		elif array.dtype == numpy.float32:
+			# Single-precision intensities are stored exactly, rather than as the nearest 64-bit floats.
+			return encode_array(array)
+		elif lazy:
+			return array
+		else:
+			return array.tolist()
+
+	if isinstance(intensity_matrix, SparseIntensityMatrix):
+		return {
+				"data": encode(intensity_matrix.data),
+				"indices": encode(intensity_matrix.indices),
+				"indptr": encode(intensity_matrix.indptr),
+				}
+
+	return encode(intensity_matrix._intensity_array)
+
+
 @attr.define
 class Datafile:
 	"""
@@ -139,64 +200,148 @@ class Datafile:
 				original_filetype=original_filetype,
 				)
 
-	def load_gcms_data(self, filename: Optional[PathLike] = None) -> GCMS_data:
+	def load_gcms_data(
+			self,
+			filename: Optional[PathLike] = None,
+			cache: Optional[GCMSDataCache] = None,
+			reader: Optional[Callable[[PathPlus], GCMS_data]] = None,
+			) -> GCMS_data:
 		"""
 		Load GC-MS data from the datafile.
 
 		:param filename: Alternative filename to load the data from. Useful if the file has moved since the :class:`~.Datafile` was created.
+		:param cache: A cache of parsed files to consult before parsing the file, and to add the parsed data to.
+			Defaults to the cache set with :func:`libgunshotmatch.cache.set_default_cache`, if any.
+		:param reader: The function used to parse the file.
+			Defaults to :func:`libgunshotmatch.readers.jcamp_reader` for JCAMP-DX files,
+			:func:`pyms.GCMS.IO.MZML.mzML_reader` for mzML files, and :func:`pyms.GCMS.IO.ANDI.ANDI_reader` for ANDI files.
 
 		.. versionchanged:: 0.4.0  Added the ``filename`` attribute.
+		.. versionchanged:: 0.14.0
+
+			* Added the ``cache`` argument.
+			* Added the ``reader`` argument.
+			* JCAMP-DX files are read with :func:`libgunshotmatch.readers.jcamp_reader`
+			  rather than :func:`pyms.GCMS.IO.JCAMP.JCAMP_reader`.
 		"""
 
 		filename = PathPlus(filename or self.original_filename)
 
+		if reader is None:
+			reader = self._default_reader()
+
+		if cache is None:
+			cache = get_default_cache()
+
+		if cache is None:
+			return reader(filename)
+		else:
+			return cache.load(filename, reader)
+
+	def _default_reader(self) -> Callable[[PathPlus], GCMS_data]:
+		"""
+		Returns the function used to parse the original file by default, based on its type.
+		"""
+
 		if self.original_filetype == FileType.JDX:
-			# 3rd party
-			from pyms.GCMS.IO.JCAMP import JCAMP_reader
-			gcms_data = JCAMP_reader(filename)
+			# this package
+			from libgunshotmatch.readers import jcamp_reader
+			return jcamp_reader
 
 		elif self.original_filetype == FileType.MZML:
 			# 3rd party
 			from pyms.GCMS.IO.MZML import mzML_reader
-			gcms_data = mzML_reader(filename)
+			return mzML_reader
 
 		elif self.original_filetype == FileType.ANDI:
 			# 3rd party
 			from pyms.GCMS.IO.ANDI import ANDI_reader
-			gcms_data = ANDI_reader(filename)
+			return ANDI_reader
 
 		else:
 			# Shouldn't get here due to filetype validation at attrs' end
 			raise ValueError(f"Unrecognised file format {self.original_filetype._name_}")
 
-		return gcms_data
+	def load_intensity_matrix(
+			self,
+			filename: Optional[PathLike] = None,
+			crop_mass_range: Optional[Tuple[float, float]] = None,
+			) -> Tuple[IntensityMatrix, "GCMSDataInfo"]:
+		"""
+		Load GC-MS data from the datafile directly into an intensity matrix.
+
+		Unlike :meth:`~.Datafile.load_gcms_data` followed by :meth:`~.Datafile.prepare_intensity_matrix`,
+		no :class:`~pyms.Spectrum.Scan` objects are created, which is faster and uses much less memory.
+		The intensity matrix can be passed to :meth:`~.Datafile.prepare_intensity_matrix` in place of the GC-MS data.
+
+		See :func:`libgunshotmatch.readers.jcamp_intensity_matrix`,
+		:func:`libgunshotmatch.readers.mzml_intensity_matrix`,
+		and :func:`libgunshotmatch.readers.andi_intensity_matrix`.
+
+		:param filename: Alternative filename to load the data from. Useful if the file has moved since the :class:`~.Datafile` was created.
+		:param crop_mass_range: The range of masses to which the intensity matrix should be limited to.
+
+		:returns: The intensity matrix, and the same information about the data as :func:`~.get_info_from_gcms_data`.
+
+		.. versionadded:: 0.14.0
+		"""
+
+		# this package
+		from libgunshotmatch import readers
+
+		filename = PathPlus(filename or self.original_filename)
+
+		if self.original_filetype == FileType.JDX:
+			return readers.jcamp_intensity_matrix(filename, crop_mass_range)
+		elif self.original_filetype == FileType.MZML:
+			return readers.mzml_intensity_matrix(filename, crop_mass_range)
+		elif self.original_filetype == FileType.ANDI:
+			return readers.andi_intensity_matrix(filename, crop_mass_range)
+		else:
+			# Shouldn't get here due to filetype validation at attrs' end
+			raise ValueError(f"Unrecognised file format {self.original_filetype._name_}")
 
 	def prepare_intensity_matrix(
 			self,
-			gcms_data: GCMS_data,
+			gcms_data: Union[GCMS_data, IntensityMatrix],
 			savitzky_golay: Union[bool, SavitzkyGolayMethod] = True,
 			tophat: bool = True,
 			tophat_structure_size: str = "1.5m",  # Ignored if tophat=False
 			crop_mass_range: Optional[Tuple[float, float]] = None,
+			executor: Optional[Executor] = None,
+			chunk_size: int = 32,
+			crop_rt_range: Optional[Tuple[float, float]] = None,
+			single_precision: bool = False,
+			sparse: bool = False,
 			) -> IntensityMatrix:
 		"""
 		Build an :class:`~pyms.IntensityMatrix.IntensityMatrix` for the datafile.
 
-		:param gcms_data:
+		:param gcms_data: The GC-MS data, or an intensity matrix already built from it
+			(such as from :meth:`~.Datafile.load_intensity_matrix`),
+			which is smoothed and baseline-corrected in place unless ``crop_rt_range`` or ``single_precision`` is given
+			(or it is a :class:`~.SparseIntensityMatrix`).
 		:param savitzky_golay: Whether to perform Savitzky-Golay smoothing.
 		:param tophat: Whether to perform Tophat baseline correction.
 		:param tophat_structure_size: The structure size for Tophat baseline correction.
 		:param crop_mass_range: The range of masses to which the GC-MS data should be limited to.
-
+		:param executor: Optional :class:`concurrent.futures.Executor` to smooth and baseline-correct
+			chunks of *m/z* channels in parallel.
+		:param chunk_size: The number of *m/z* channels in each chunk. Ignored if ``executor`` is :py:obj:`None`.
+		:param crop_rt_range: Optional retention time range (in minutes)
+			to which the intensity matrix should be limited to.
+			Scans outside of the range (plus enough scans either side that smoothing and baseline correction
+			within the range are unaffected) are discarded before the intensity matrix is filtered.
+		:param single_precision: Whether to store the intensity matrix as 32-bit rather than 64-bit floats.
+		:param sparse: Whether to return (and store) the smoothed and baseline-corrected intensity matrix
+			as a :class:`~.SparseIntensityMatrix`.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``executor``, ``chunk_size``, ``crop_rt_range``, ``single_precision`` and ``sparse`` arguments.
+			* ``gcms_data`` may be an :class:`~pyms.IntensityMatrix.IntensityMatrix`.
 		"""
 
-		intensity_matrix = build_intensity_matrix_i(gcms_data)
-
-		# Show the m/z of the maximum and minimum bins
-		print(f" Minimum m/z bin: {intensity_matrix.min_mass}")
-		print(f" Maximum m/z bin: {intensity_matrix.max_mass}")
-
-		# Crop masses
 		if crop_mass_range is not None:
 			# None means don't crop
 
@@ -212,60 +357,136 @@ class Datafile:
 								])
 						)
 
-			if intensity_matrix.min_mass is not None and min_mass < intensity_matrix.min_mass:
-				min_mass = intensity_matrix.min_mass
-			if intensity_matrix.max_mass is not None and max_mass > intensity_matrix.max_mass:
-				max_mass = intensity_matrix.max_mass
+		# The window sizes are determined from all scans, so they are the same whether or not the scans are cropped.
+		time_list = gcms_data._time_list
+		coeff, struct_pts = _filter_parameters(time_list, savitzky_golay, tophat, tophat_structure_size)
+
+		dtype = numpy.float32 if single_precision else numpy.float64
+
+		if crop_rt_range is not None:
+			start, stop = _rt_crop_indices(time_list, crop_rt_range)
+			padding = _filter_padding(coeff, struct_pts)
+			padded_start, padded_stop = max(start - padding, 0), min(stop + padding, len(time_list))
+		else:
+			padded_start, padded_stop = 0, len(time_list)
+
+		if isinstance(gcms_data, IntensityMatrix):
+			intensity_matrix = gcms_data
+			if isinstance(intensity_matrix, SparseIntensityMatrix):
+				intensity_matrix = intensity_matrix.to_intensity_matrix()
+
+			# Show the m/z of the maximum and minimum bins
+			print(f" Minimum m/z bin: {intensity_matrix.min_mass}")
+			print(f" Maximum m/z bin: {intensity_matrix.max_mass}")
+
+			if crop_rt_range is not None:
+				intensity_matrix = _new_intensity_matrix(
+						time_list[padded_start:padded_stop],
+						intensity_matrix._mass_list,
+						intensity_matrix._intensity_array[padded_start:padded_stop].copy(),
+						)
 
-			intensity_matrix.crop_mass(min_mass, max_mass)
+			# Crop masses
+			if crop_mass_range is not None:
+				if intensity_matrix.min_mass is not None and min_mass < intensity_matrix.min_mass:
+					min_mass = intensity_matrix.min_mass
+				if intensity_matrix.max_mass is not None and max_mass > intensity_matrix.max_mass:
+					max_mass = intensity_matrix.max_mass
+
+				# Nothing to crop if the intensity matrix was built with the same mass range.
+				if min_mass != intensity_matrix.min_mass or max_mass != intensity_matrix.max_mass:
+					intensity_matrix.crop_mass(min_mass, max_mass)
+
+			if intensity_matrix._intensity_array.dtype != dtype:
+				intensity_matrix = _new_intensity_matrix(
+						intensity_matrix._time_list,
+						intensity_matrix._mass_list,
+						intensity_matrix._intensity_array.astype(dtype),
+						)
+
+		else:
+			if gcms_data.min_mass is not None and gcms_data.max_mass is not None:
+				# Show the m/z of the maximum and minimum bins, before cropping
+				first_bin, last_bin = _mass_bins(gcms_data.min_mass, gcms_data.max_mass)
+				print(f" Minimum m/z bin: {first_bin}")
+				print(f" Maximum m/z bin: {last_bin}")
+
+			# Masses outside of crop_mass_range, and scans outside of crop_rt_range, are discarded
+			# while the matrix is built.
+			intensity_matrix = _build_intensity_matrix(
+					gcms_data,
+					crop_mass_range,
+					padded_start,
+					padded_stop,
+					dtype=dtype,
+					)
 
 		# Perform Data filtering
-		n_mz = intensity_matrix.size[1]
-
-		# Iterate over each IC in the intensity matrix
-		for index in range(n_mz):
-			# print("\rWorking on IC#", index+1, '  ',end='')
-			ic = intensity_matrix.get_ic_at_index(index)
-
-			if savitzky_golay:
-				# Perform Savitzky-Golay smoothing.
-				# Note that Turbomass does not use smoothing for qualitative method.
-				if isinstance(savitzky_golay, SavitzkyGolayMethod):
-					ic = pyms.Noise.SavitzkyGolay.savitzky_golay(
-							ic,
-							window=savitzky_golay.window,
-							degree=savitzky_golay.degree,
-							)
-				else:
-					ic = pyms.Noise.SavitzkyGolay.savitzky_golay(ic)
-
-			if tophat:
-				# Perform Tophat baseline correction
-				# Top-hat baseline Correction seems to bring down noise,
-				#  		retaining shapes, but keeps points on actual peaks
-				# ic = tophat(ic, struct=method.tophat_struct)
-				ic = pyms.TopHat.tophat(ic, struct=tophat_structure_size)
-
-			# Set the IC in the intensity matrix to the filtered one
-			intensity_matrix.set_ic_at_index(index, ic)
+		# Savitzky-Golay smoothing (note that Turbomass does not use smoothing for qualitative method),
+		# then Tophat baseline correction (seems to bring down noise, retaining shapes, but keeps points on actual peaks).
+		# The whole matrix is processed at once (or in chunks of m/z channels if an executor is given),
+		# rather than one IC at a time.
+		_filter_array(intensity_matrix._intensity_array, coeff, struct_pts, executor=executor, chunk_size=chunk_size)
+
+		if crop_rt_range is not None:
+			# Discard the padding, which was only needed for filtering the scans within the range.
+			intensity_matrix = _new_intensity_matrix(
+					time_list[start:stop],
+					intensity_matrix._mass_list,
+					intensity_matrix._intensity_array[start - padded_start:stop - padded_start].copy(),
+					)
+
+		if sparse:
+			intensity_matrix = SparseIntensityMatrix.from_intensity_matrix(intensity_matrix)
 
 		self.intensity_matrix = intensity_matrix
 		return intensity_matrix
 
-	def to_dict(self) -> Dict[str, Any]:
+	def to_dict(self, numpy_arrays: bool = False) -> Dict[str, Any]:
 		"""
 		Returns a dictionary representation of this :class:`~.Datafile`.
 
 		All keys are native, JSON-serializable, Python objects.
+
+		:param numpy_arrays: If :py:obj:`True` the retention times, masses and intensities
+			are given as :class:`numpy.ndarray` objects rather than lists, for writing to a binary container.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``numpy_arrays`` argument.
+			* Single-precision intensities
+			  (see :attr:`IntensityMatrixMethod.single_precision <.IntensityMatrixMethod.single_precision>`)
+			  are given as a base64-encoded array, so they are reloaded exactly by :meth:`~.Datafile.from_dict`.
+			* The intensities of a :class:`~.SparseIntensityMatrix` are given as a dictionary
+			  of its ``data``, ``indices`` and ``indptr`` arrays,
+			  and are reloaded as a :class:`~.SparseIntensityMatrix`.
+		"""
+
+		return self._to_dict(numpy_arrays=numpy_arrays)
+
+	def _to_dict(self, numpy_arrays: bool = False, lazy: bool = False) -> Dict[str, Any]:
+		"""
+		Returns a dictionary representation of this :class:`~.Datafile`.
+
+		:param numpy_arrays: If :py:obj:`True` arrays are given as :class:`numpy.ndarray` objects rather than lists.
+		:param lazy: If :py:obj:`True` the intensities are given as the :class:`numpy.ndarray`,
+			to be encoded directly by :func:`~.write_gzip_json` as it is written.
 		"""
 
+		im_as_dict: Optional[Dict[str, Any]]
 		if self.intensity_matrix is None:
 			im_as_dict = None
+		elif numpy_arrays:
+			im_as_dict = {
+					"times": numpy.asarray(self.intensity_matrix._time_list),
+					"masses": numpy.asarray(self.intensity_matrix._mass_list),
+					"intensities": _intensities_to_dict(self.intensity_matrix, numpy_arrays=True),
+					}
 		else:
 			im_as_dict = {
 					"times": self.intensity_matrix.time_list,
 					"masses": self.intensity_matrix.mass_list,
-					"intensities": self.intensity_matrix.intensity_array.tolist(),
+					"intensities": _intensities_to_dict(self.intensity_matrix, lazy=lazy),
 					}
 
 		return {
@@ -289,15 +510,26 @@ class Datafile:
 		:param d:
 		"""
 
+		intensity_matrix: Optional[IntensityMatrix]
 		im_as_dict = d["intensity_matrix"]
 		if im_as_dict is None:
 			intensity_matrix = None
 		else:
-			intensity_matrix = IntensityMatrix(
-					time_list=im_as_dict["times"],
-					mass_list=im_as_dict["masses"],
-					intensity_array=im_as_dict["intensities"],
-					)
+			time_list = _as_list(im_as_dict["times"])
+			mass_list = _as_list(im_as_dict["masses"])
+			intensities = im_as_dict["intensities"]
+
+			if isinstance(intensities, Mapping) and not is_array_reference(intensities):
+				# Sparse intensity matrix (see Datafile.to_dict).
+				intensity_matrix = SparseIntensityMatrix(
+						time_list,
+						mass_list,
+						data=_as_array(intensities["data"]),
+						indices=_as_array(intensities["indices"]),
+						indptr=_as_array(intensities["indptr"]),
+						)
+			else:
+				intensity_matrix = _new_intensity_matrix(time_list, mass_list, _as_array(intensities))
 
 		optional_keys = {}
 		if "user" in d:
@@ -320,26 +552,133 @@ class Datafile:
 				**optional_keys,
 				)
 
-	def export(self, output_dir: PathLike) -> str:
+	def export(
+			self,
+			output_dir: PathLike,
+			binary: bool = False,
+			executor: Optional[Executor] = None,
+			codec: str = "gzip",
+			compression: int = zipfile.ZIP_DEFLATED,
+			) -> str:
 		"""
 		Export as a ``.gsmd`` file and return the output filename.
+
+		:param output_dir:
+		:param binary: If :py:obj:`True` the file is written as a binary container
+			(see :mod:`libgunshotmatch.container`) rather than gzipped JSON.
+		:param executor: Optional executor to compress the gzipped JSON in parallel.
+			See :func:`~.write_gzip_json` for details. Ignored if ``binary`` is :py:obj:`True`.
+		:param codec: The compression codec for the JSON, e.g. ``'gzip'`` or ``'lzma:9'``.
+			See :func:`~.write_gzip_json` for details. Ignored if ``binary`` is :py:obj:`True`.
+		:param compression: The compression method for the members of the binary container.
+			Use :py:data:`zipfile.ZIP_STORED` for files which will be loaded with ``mmap=True``,
+			so the arrays are mapped in place rather than first being extracted.
+			Ignored if ``binary`` is :py:obj:`False`.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``binary``, ``executor``, ``codec`` and ``compression`` arguments.
+			* A summary of the datafile is written at the start of the file (see :meth:`~.Datafile.read_metadata`).
 		"""
 
 		export_filename = os.path.join(output_dir, f"{self.name}.gsmd")
-		gzip_util.write_gzip_json(export_filename, self.to_dict(), indent=None)
+		if binary:
+			container.write_container(
+					export_filename,
+					self.to_dict(numpy_arrays=True),
+					compression=compression,
+					metadata=self._get_metadata(),
+					)
+		else:
+			gzip_util.write_gzip_json(
+					export_filename,
+					{"metadata": self._get_metadata(), **self._to_dict(lazy=True)},
+					indent=None,
+					executor=executor,
+					codec=codec,
+					)
 		return export_filename
 
 	@classmethod
-	def from_file(cls: Type["Datafile"], filename: PathLike) -> "Datafile":
+	def from_file(cls: Type["Datafile"], filename: PathLike, mmap: bool = False) -> "Datafile":
 		"""
 		Parse a ``gsmd`` file.
 
 		:param filename: The input filename.
+		:param mmap: If :py:obj:`True`, and the file is a binary container, the intensity matrix is backed by
+			a read-only :class:`numpy.memmap` which is only read from disk when accessed.
+
+		.. versionchanged:: 0.14.0
+
+			* Binary container files are detected and loaded automatically.
+			* Added the ``mmap`` argument.
 		"""
 
-		as_dict: Dict[str, Any] = gzip_util.read_gzip_json(filename)  # type: ignore[assignment]
+		as_dict: Dict[str, Any] = container.read_document(filename, mmap=mmap)  # type: ignore[assignment]
 		return Datafile.from_dict(as_dict)
 
+	def _get_metadata(self) -> Dict[str, Any]:
+		"""
+		Returns a summary of this :class:`~.Datafile`, for writing at the start of exported files.
+		"""
+
+		metadata: Dict[str, Any] = {
+				"name": self.name,
+				"original_filename": self.original_filename,
+				"original_filetype": int(self.original_filetype),
+				"description": self.description,
+				"user": self.user,
+				"device": self.device,
+				"date_created": self.date_created.isoformat(),
+				"date_modified": self.date_modified.isoformat(),
+				"version": self.version,
+				"n_scans": None,
+				"n_masses": None,
+				"rt_range": None,
+				"mass_range": None,
+				}
+
+		intensity_matrix = self.intensity_matrix
+		if intensity_matrix is not None:
+			time_list = intensity_matrix.time_list
+			metadata["n_scans"] = len(time_list)
+			metadata["n_masses"] = len(intensity_matrix.mass_list)
+			if time_list:
+				metadata["rt_range"] = [float(time_list[0]), float(time_list[-1])]
+			min_mass, max_mass = intensity_matrix.min_mass, intensity_matrix.max_mass
+			if intensity_matrix.mass_list and min_mass is not None and max_mass is not None:
+				metadata["mass_range"] = [float(min_mass), float(max_mass)]
+
+		return metadata
+
+	@classmethod
+	def read_metadata(cls: Type["Datafile"], filename: PathLike) -> Dict[str, Any]:
+		"""
+		Read a summary of a ``gsmd`` file, without loading the intensity matrix.
+
+		The summary is a dictionary with the following keys:
+
+		* ``'name'``, ``'original_filename'``, ``'original_filetype'``, ``'description'``,
+		  ``'user'``, ``'device'``, ``'date_created'``, ``'date_modified'`` and ``'version'``,
+		  as given by :meth:`~.Datafile.to_dict`.
+		* ``'n_scans'`` and ``'n_masses'`` -- the dimensions of the intensity matrix.
+		* ``'rt_range'`` and ``'mass_range'`` -- the minimum and maximum retention times and masses.
+
+		The sizes are :py:obj:`None` if the datafile has no intensity matrix.
+
+		Files written before libgunshotmatch 0.14.0 do not contain a summary,
+		in which case the whole file is loaded to create it.
+
+		:param filename: The input filename.
+
+		.. versionadded:: 0.14.0
+		"""
+
+		metadata = container.read_metadata(filename)
+		if metadata is None:
+			metadata = cls.from_file(filename, mmap=True)._get_metadata()
+		return metadata
+
 
 class GCMSDataInfo(NamedTuple):
 	"""
@@ -439,22 +778,58 @@ class Repeat:
 
 		return self.datafile.name
 
-	def to_dict(self) -> Dict[str, Any]:
+	def to_dict(self, numpy_arrays: bool = False, compact: Union[bool, str] = False) -> Dict[str, Any]:
 		"""
 		Returns a dictionary representation of this :class:`~.Repeat`.
 
 		All keys are native, JSON-serializable, Python objects.
+
+		:param numpy_arrays: If :py:obj:`True` the intensity matrix and peak mass spectra
+			are given as :class:`numpy.ndarray` objects rather than lists, for writing to a binary container.
+		:param compact: Whether to use the compact encoding for the peak mass spectra.
+			See :meth:`PeakList.to_list() <libgunshotmatch.peak.PeakList.to_list>` for details.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``numpy_arrays`` argument.
+			* Added the ``compact`` argument.
 		"""
 
+		return self._to_dict(numpy_arrays=numpy_arrays, compact=compact)
+
+	def _qualified_peaks_to_list(
+			self,
+			numpy_arrays: bool = False,
+			compact: Union[bool, str] = False,
+			) -> Optional[List[Dict[str, Any]]]:
 		if self.qualified_peaks is None:
-			qualified_peaks_as_list = None
+			return None
 		else:
-			qualified_peaks_as_list = [qp.to_dict() for qp in self.qualified_peaks]
+			return [qp.to_dict(numpy_arrays=numpy_arrays, compact=compact) for qp in self.qualified_peaks]
+
+	def _to_dict(
+			self,
+			numpy_arrays: bool = False,
+			lazy: bool = False,
+			compact: Union[bool, str] = False,
+			) -> Dict[str, Any]:
+		"""
+		Returns a dictionary representation of this :class:`~.Repeat`.
+
+		:param numpy_arrays: If :py:obj:`True` arrays are given as :class:`numpy.ndarray` objects rather than lists.
+		:param lazy: If :py:obj:`True` the peaks and qualified peaks are given as callables
+			returning their dictionary representations, and the intensities as a :class:`numpy.ndarray`,
+			to be evaluated by :func:`~.write_gzip_json` as it is written.
+		:param compact: Whether to use the compact encoding for the peak mass spectra.
+		"""
+
+		peaks = functools.partial(self.peaks.to_list, numpy_arrays=numpy_arrays, compact=compact)
+		qualified_peaks = functools.partial(self._qualified_peaks_to_list, numpy_arrays=numpy_arrays, compact=compact)
 
 		return {
-				"datafile": self.datafile.to_dict(),
-				"peaks": self.peaks.to_list(),
-				"qualified_peaks": qualified_peaks_as_list,
+				"datafile": self.datafile._to_dict(numpy_arrays=numpy_arrays, lazy=lazy),
+				"peaks": peaks if lazy else peaks(),
+				"qualified_peaks": qualified_peaks if lazy else qualified_peaks(),
 				"user": self.user,
 				"device": self.device,
 				"date_created": self.date_created.isoformat(),
@@ -500,28 +875,117 @@ class Repeat:
 				**optional_keys,
 				)
 
-	def export(self, output_dir: PathLike) -> str:
+	def export(
+			self,
+			output_dir: PathLike,
+			binary: bool = False,
+			executor: Optional[Executor] = None,
+			codec: str = "gzip",
+			compact: Union[bool, str] = False,
+			compression: int = zipfile.ZIP_DEFLATED,
+			) -> str:
 		"""
 		Export as a ``.gsmr`` file and return the output filename.
 
+		:param output_dir:
+		:param binary: If :py:obj:`True` the file is written as a binary container
+			(see :mod:`libgunshotmatch.container`) rather than gzipped JSON.
+		:param executor: Optional executor to compress the gzipped JSON in parallel.
+			See :func:`~.write_gzip_json` for details. Ignored if ``binary`` is :py:obj:`True`.
+		:param codec: The compression codec for the JSON, e.g. ``'gzip'`` or ``'lzma:9'``.
+			See :func:`~.write_gzip_json` for details. Ignored if ``binary`` is :py:obj:`True`.
+		:param compact: Whether to use the compact encoding for the peak mass spectra.
+			See :meth:`PeakList.to_list() <libgunshotmatch.peak.PeakList.to_list>` for details.
+		:param compression: The compression method for the members of the binary container.
+			Use :py:data:`zipfile.ZIP_STORED` for files which will be loaded with ``mmap=True``,
+			so the arrays are mapped in place rather than first being extracted.
+			Ignored if ``binary`` is :py:obj:`False`.
+
 		.. versionadded:: 0.4.0
+		.. versionchanged:: 0.14.0
+
+			* Added the ``binary``, ``executor``, ``codec``, ``compact`` and ``compression`` arguments.
+			* A summary of the repeat is written at the start of the file (see :meth:`~.Repeat.read_metadata`).
 		"""
 
 		export_filename = os.path.join(output_dir, f"{self.name}.gsmr")
-		gzip_util.write_gzip_json(export_filename, self.to_dict(), indent=None)
+		if binary:
+			container.write_container(
+					export_filename,
+					self.to_dict(numpy_arrays=True, compact=compact),
+					compression=compression,
+					metadata=self._get_metadata(),
+					)
+		else:
+			gzip_util.write_gzip_json(
+					export_filename,
+					{"metadata": self._get_metadata(), **self._to_dict(lazy=True, compact=compact)},
+					indent=None,
+					executor=executor,
+					codec=codec,
+					)
 		return export_filename
 
 	@classmethod
-	def from_file(cls: Type["Repeat"], filename: PathLike) -> "Repeat":
+	def from_file(cls: Type["Repeat"], filename: PathLike, mmap: bool = False) -> "Repeat":
 		"""
 		Parse a ``gsmr`` file.
 
 		:param filename: The input filename.
+		:param mmap: If :py:obj:`True`, and the file is a binary container, the intensity matrix is backed by
+			a read-only :class:`numpy.memmap` which is only read from disk when accessed.
 
 		:rtype:
 
 		.. versionadded:: 0.4.0
+		.. versionchanged:: 0.14.0
+
+			* Binary container files are detected and loaded automatically.
+			* Added the ``mmap`` argument.
 		"""
 
-		as_dict: Dict[str, Any] = gzip_util.read_gzip_json(filename)  # type: ignore[assignment]
+		as_dict: Dict[str, Any] = container.read_document(filename, mmap=mmap)  # type: ignore[assignment]
 		return cls.from_dict(as_dict)
+
+	def _get_metadata(self) -> Dict[str, Any]:
+		"""
+		Returns a summary of this :class:`~.Repeat`, for writing at the start of exported files.
+		"""
+
+		return {
+				"name": self.name,
+				"user": self.user,
+				"device": self.device,
+				"date_created": self.date_created.isoformat(),
+				"date_modified": self.date_modified.isoformat(),
+				"version": self.version,
+				"n_peaks": len(self.peaks),
+				"n_qualified_peaks": None if self.qualified_peaks is None else len(self.qualified_peaks),
+				"datafile": self.datafile._get_metadata(),
+				}
+
+	@classmethod
+	def read_metadata(cls: Type["Repeat"], filename: PathLike) -> Dict[str, Any]:
+		"""
+		Read a summary of a ``gsmr`` file, without loading the intensity matrix or peaks.
+
+		The summary is a dictionary with the following keys:
+
+		* ``'name'``, ``'user'``, ``'device'``, ``'date_created'``, ``'date_modified'`` and ``'version'``,
+		  as given by :meth:`~.Repeat.to_dict`.
+		* ``'n_peaks'`` and ``'n_qualified_peaks'`` -- the number of peaks and qualified peaks
+		  (:py:obj:`None` if there are no qualified peaks).
+		* ``'datafile'`` -- a summary of the repeat's datafile (see :meth:`~.Datafile.read_metadata`).
+
+		Files written before libgunshotmatch 0.14.0 do not contain a summary,
+		in which case the whole file is loaded to create it.
+
+		:param filename: The input filename.
+
+		.. versionadded:: 0.14.0
+		"""
+
+		metadata = container.read_metadata(filename)
+		if metadata is None:
+			metadata = cls.from_file(filename, mmap=True)._get_metadata()
+		return metadata
@@ -3,6 +3,11 @@
 #  gzip_util.py
 """
 Read and write gzipped JSON.
+
+.. versionchanged:: 0.14.0
+
+	Other compression formats are supported through a registry of :class:`~.Codec` objects.
+	The format of a file being read is detected from its first few bytes.
 """
 #
 #  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
@@ -27,19 +32,571 @@ Read and write gzipped JSON.
 #
 
 # stdlib
+import bz2
+import codecs
 import gzip
-from typing import Any, Dict, List, Optional, OrderedDict, Tuple, Union
+import io
+import lzma
+import os
+import re
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import (
+		IO,
+		Any,
+		Callable,
+		Collection,
+		Deque,
+		Dict,
+		Iterable,
+		Iterator,
+		List,
+		Match,
+		NamedTuple,
+		Optional,
+		OrderedDict,
+		Tuple,
+		Union
+		)
 
 # 3rd party
+import numpy
 import sdjson
 from domdf_python_tools.paths import PathPlus
 from domdf_python_tools.typing import PathLike
 
-__all__ = ("read_gzip_json", "write_gzip_json")
+__all__ = (
+		"Codec",
+		"detect_codec",
+		"get_codec",
+		"iter_gzip_json",
+		"read_gzip_json",
+		"register_codec",
+		"write_gzip_json",
+		)
 
 JSONOutput = Union[str, int, float, bool, None, Dict[str, Any], List[Any]]
 JSONInput = Union[JSONOutput, Tuple[Any, ...], OrderedDict]
 
+_BLOCK_SIZE = 4 * 1024 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_SCALAR_END = re.compile(r"[,}\]\s]")
+
+# orjson writes floats between 1e-5 and 1e-4 in positional notation, where Python uses an exponent.
+_ORJSON_SMALL_FLOAT = re.compile(r"0\.0000\d+")
+# orjson writes single-digit negative exponents (e.g. ``1e-7``) where Python pads them (``1e-07``).
+_ORJSON_SHORT_EXPONENT = re.compile(r"e-(\d)(?!\d)")
+
+
+class Codec(NamedTuple):
+	"""
+	A compression format for JSON documents.
+
+	.. versionadded:: 0.14.0
+	"""
+
+	#: The name of the codec, e.g. ``'gzip'``.
+	name: str
+
+	#: The bytes at the start of a file written with this codec. Empty for uncompressed files.
+	magic: bytes
+
+	#: Function taking a filename, mode (``'rb'`` or ``'wb'``), compression level (or :py:obj:`None`
+	#: for the codec's default) and modification time, and returning a binary file object.
+	#: The modification time is only used by formats which record one.
+	open: Callable[[str, str, Optional[int], int], IO[bytes]]
+
+	#: Function taking a block of data, compression level and modification time, and returning the compressed data.
+	#: The concatenated output for several blocks must be readable with :attr:`~.Codec.open`.
+	compress: Callable[[bytes, Optional[int], int], bytes]
+
+
+def _open_gzip(filename: str, mode: str, level: Optional[int], mtime: int) -> IO[bytes]:
+	return gzip.GzipFile(filename, mode, compresslevel=9 if level is None else level, mtime=mtime)  # type: ignore[return-value]
+
+
+def _compress_gzip(data: bytes, level: Optional[int], mtime: int) -> bytes:
+	return gzip.compress(data, 9 if level is None else level, mtime=mtime)
+
+
+def _open_bz2(filename: str, mode: str, level: Optional[int], mtime: int) -> IO[bytes]:
+	return bz2.BZ2File(filename, mode, compresslevel=9 if level is None else level)  # type: ignore[call-overload]
+
+
+def _compress_bz2(data: bytes, level: Optional[int], mtime: int) -> bytes:
+	return bz2.compress(data, 9 if level is None else level)
+
+
+def _open_lzma(filename: str, mode: str, level: Optional[int], mtime: int) -> IO[bytes]:
+	if mode == "rb":
+		return lzma.LZMAFile(filename, mode)
+	return lzma.LZMAFile(filename, mode, preset=level)
+
+
+def _compress_lzma(data: bytes, level: Optional[int], mtime: int) -> bytes:
+	return lzma.compress(data, preset=level)
+
+
+def _open_none(filename: str, mode: str, level: Optional[int], mtime: int) -> IO[bytes]:
+	return open(filename, mode)  # noqa: SIM115
+
+
+def _compress_none(data: bytes, level: Optional[int], mtime: int) -> bytes:
+	return data
+
+
+def _open_zstd(filename: str, mode: str, level: Optional[int], mtime: int) -> IO[bytes]:
+	# 3rd party
+	import zstandard
+
+	if mode == "rb":
+		# Read across frame boundaries, so blocks written in parallel are read as one stream.
+		dctx = zstandard.ZstdDecompressor()
+		return dctx.stream_reader(open(filename, "rb"), read_across_frames=True, closefd=True)  # noqa: SIM115
+
+	cctx = zstandard.ZstdCompressor(level=3 if level is None else level)
+	return zstandard.open(filename, mode, cctx=cctx)
+
+
+def _compress_zstd(data: bytes, level: Optional[int], mtime: int) -> bytes:
+	# 3rd party
+	import zstandard
+
+	return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def _open_lz4(filename: str, mode: str, level: Optional[int], mtime: int) -> IO[bytes]:
+	# 3rd party
+	import lz4.frame
+
+	if mode == "rb":
+		return lz4.frame.open(filename, mode)
+	return lz4.frame.open(filename, mode, compression_level=0 if level is None else level)
+
+
+def _compress_lz4(data: bytes, level: Optional[int], mtime: int) -> bytes:
+	# 3rd party
+	import lz4.frame
+
+	return lz4.frame.compress(data, compression_level=0 if level is None else level)
+
+
+_CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+	"""
+	Register a compression codec, replacing any existing codec with the same name.
+
+	:param codec:
+
+	.. versionadded:: 0.14.0
+	"""
+
+	_CODECS[codec.name] = codec
+
+
+def get_codec(name: str) -> Tuple[Codec, Optional[int]]:
+	"""
+	Returns the codec and compression level for the given codec specifier.
+
+	:param name: The name of the codec (e.g. ``'gzip'``), optionally followed by a colon and
+		the compression level (e.g. ``'gzip:1'`` or ``'lzma:9'``).
+
+	:returns: The codec, and the compression level (or :py:obj:`None` for the codec's default).
+
+	.. versionadded:: 0.14.0
+	"""
+
+	codec_name, _, level = name.partition(':')
+
+	if codec_name not in _CODECS:
+		raise ValueError(f"Unknown compression codec {codec_name!r}")
+
+	if level:
+		try:
+			return _CODECS[codec_name], int(level)
+		except ValueError:
+			raise ValueError(f"Invalid compression level {level!r}") from None
+
+	return _CODECS[codec_name], None
+
+
+def detect_codec(path: PathLike) -> Codec:
+	"""
+	Determine the compression codec of a file from its first few bytes.
+
+	Files not matching any registered codec are assumed to be uncompressed.
+
+	:param path:
+
+	.. versionadded:: 0.14.0
+	"""
+
+	with open(PathPlus(path), "rb") as fp:
+		header = fp.read(16)
+
+	for codec in _CODECS.values():
+		if codec.magic and header.startswith(codec.magic):
+			return codec
+
+	return _CODECS["none"]
+
+
+register_codec(Codec("gzip", b"\x1f\x8b", _open_gzip, _compress_gzip))
+register_codec(Codec("bz2", b"BZh", _open_bz2, _compress_bz2))
+register_codec(Codec("lzma", b"\xfd7zXZ\x00", _open_lzma, _compress_lzma))
+register_codec(Codec("none", b'', _open_none, _compress_none))
+register_codec(Codec("zstd", b"\x28\xb5\x2f\xfd", _open_zstd, _compress_zstd))
+register_codec(Codec("lz4", b"\x04\x22\x4d\x18", _open_lz4, _compress_lz4))
+
+
+def _loads(text: str) -> JSONOutput:
+	"""
+	Decode a JSON document, using :mod:`orjson` if it is available.
+
+	:mod:`orjson` does not support the ``NaN`` and ``Infinity`` tokens,
+	so text which it fails to decode is decoded by the standard library instead.
+	Text which only contains them within strings is still decoded by :mod:`orjson`.
+
+	:param text:
+	"""
+
+	try:
+		# 3rd party
+		import orjson
+	except ImportError:
+		return sdjson.loads(text)
+
+	try:
+		return orjson.loads(text)
+	except orjson.JSONDecodeError:
+		# Either NaN or Infinity, which the standard library supports, or invalid JSON, for which it raises the error.
+		return sdjson.loads(text)
+
+
+def _scan(
+		segment: str,
+		position: int,
+		depth: int,
+		in_string: bool,
+		escaped: bool,
+		) -> Tuple[int, int, bool, bool]:
+	"""
+	Scan part of a JSON array, object or string for the position where it ends.
+
+	The position of the next occurrence of each significant character is found with :meth:`str.find`
+	(which is much faster than a regular expression for runs of numbers), and only updated once it has been passed.
+
+	:param segment: The text to scan.
+	:param position: The position in ``segment`` to start scanning from.
+	:param depth: The nesting depth at ``position``.
+	:param in_string: Whether ``position`` is within a string.
+	:param escaped: Whether the character at ``position`` is escaped by a backslash at the end of the previous segment.
+
+	:returns: The position just after the end of the value (or ``-1`` if it does not end within ``segment``),
+		and the values of ``depth``, ``in_string`` and ``escaped`` to continue scanning the next segment with.
+	"""
+
+	length = len(segment)
+
+	def find(char: str, start: int) -> int:
+		found = segment.find(char, start)
+		return length if found < 0 else found
+
+	if escaped:
+		position += 1
+
+	quote, backslash = find('"', position), find('\\', position)
+	open_square, close_square = find('[', position), find(']', position)
+	open_curly, close_curly = find('{', position), find('}', position)
+
+	while True:
+		if in_string:
+			if backslash < quote:
+				# Skip the escaped character, which may be at the start of the next segment.
+				position = backslash + 2
+				if position > length:
+					return -1, depth, True, True
+				backslash = find('\\', position)
+				if quote < position:
+					quote = find('"', position)
+				continue
+
+			if quote >= length:
+				return -1, depth, True, False
+
+			in_string = False
+			position = quote + 1
+			quote = find('"', position)
+			if not depth:
+				return position, depth, False, False
+
+			# Brackets within the string are not significant.
+			if open_square < position:
+				open_square = find('[', position)
+			if close_square < position:
+				close_square = find(']', position)
+			if open_curly < position:
+				open_curly = find('{', position)
+			if close_curly < position:
+				close_curly = find('}', position)
+
+		else:
+			next_position = min(quote, open_square, close_square, open_curly, close_curly)
+			if next_position >= length:
+				return -1, depth, False, False
+
+			char = segment[next_position]
+			position = next_position + 1
+
+			if char == '"':
+				in_string = True
+				quote = find('"', position)
+				if backslash < position:
+					backslash = find('\\', position)
+			elif char == '[':
+				depth += 1
+				open_square = find('[', position)
+			elif char == '{':
+				depth += 1
+				open_curly = find('{', position)
+			else:
+				depth -= 1
+				if char == ']':
+					close_square = find(']', position)
+				else:
+					close_curly = find('}', position)
+				if not depth:
+					return position, depth, False, False
+
+
+class _StreamDecoder:
+	"""
+	Incrementally decompress and scan a JSON document, decoding one value at a time.
+
+	:param fp: Binary file object to read the (decompressed) document from.
+	:param chunk_size: The number of bytes to read at once.
+	"""
+
+	def __init__(self, fp: IO[bytes], chunk_size: int):
+		self.fp = fp
+		self.chunk_size = chunk_size
+		self.decoder = codecs.getincrementaldecoder("utf-8")()
+		self.buffer = ''
+		self.pos = 0
+		self.eof = False
+
+	def read_chunk(self) -> Optional[str]:
+		"""
+		Read and decode the next chunk of the document.
+
+		:returns: :py:obj:`None` if the end of the document has been reached.
+		"""
+
+		if self.eof:
+			return None
+
+		data = self.fp.read(self.chunk_size)
+		if not data:
+			self.eof = True
+			return self.decoder.decode(b'', final=True) or None
+
+		return self.decoder.decode(data)
+
+	def fill(self) -> bool:
+		"""
+		Read the next chunk of the document into the buffer, discarding the part of the buffer already consumed.
+
+		:returns: :py:obj:`False` if the end of the document has been reached.
+		"""
+
+		chunk = self.read_chunk()
+		if chunk is None:
+			return False
+
+		self.buffer = self.buffer[self.pos:] + chunk
+		self.pos = 0
+		return True
+
+	def peek(self) -> str:
+		"""
+		Skip whitespace and return the next character, or an empty string at the end of the document.
+		"""
+
+		while True:
+			self.pos = _WHITESPACE.match(self.buffer, self.pos).end()  # type: ignore[union-attr]
+			if self.pos < len(self.buffer) or not self.fill():
+				return self.buffer[self.pos:self.pos + 1]
+
+	def expect(self, char: str) -> None:
+		"""
+		Consume the given character, raising an error if the next character is something else.
+
+		:param char:
+		"""
+
+		next_char = self.peek()
+		if next_char != char:
+			raise ValueError(f"Expected {char!r} but got {next_char or 'end of file'!r}")
+		self.pos += 1
+
+	def read_raw_value(self) -> str:
+		"""
+		Returns the text of the next value in the document.
+		"""
+
+		if not self.peek():
+			raise ValueError("Unexpected end of file")
+
+		if self.buffer[self.pos] not in "[{\"":
+			# Number, true, false, null etc.
+			position = self.pos
+			while True:
+				match = _SCALAR_END.search(self.buffer, position)
+				if match is not None:
+					end = match.start()
+					break
+
+				offset, position = self.pos, len(self.buffer)
+				if not self.fill():
+					end = len(self.buffer)
+					break
+				position -= offset
+
+			text = self.buffer[self.pos:end]
+			self.pos = end
+			return text
+
+		# Arrays, objects and strings are accumulated a chunk at a time and joined once the end is found.
+		pieces: List[str] = []
+		segment, start = self.buffer, self.pos
+		depth, in_string, escaped = 0, False, False
+		self.buffer, self.pos = '', 0
+
+		while True:
+			end, depth, in_string, escaped = _scan(segment, start, depth, in_string, escaped)
+			if end >= 0:
+				pieces.append(segment[start:end])
+				self.buffer, self.pos = segment, end
+				return ''.join(pieces)
+
+			pieces.append(segment[start:])
+			chunk = self.read_chunk()
+			if chunk is None:
+				raise ValueError("Unexpected end of file")
+			segment, start = chunk, 0
+
+	def read_value(self) -> JSONOutput:
+		"""
+		Decode the next value in the document.
+		"""
+
+		return _loads(self.read_raw_value())
+
+	def skip_value(self) -> None:
+		"""
+		Skip over the next value in the document without decoding it.
+		"""
+
+		self.read_raw_value()
+
+	def iter_container(self) -> Iterator[Union[str, int]]:
+		"""
+		Iterate over the members of the object or array starting at :attr:`~.pos`.
+
+		Yields the key (for objects) or index (for arrays) of each member,
+		with :attr:`~.pos` at the start of the member's value.
+		The caller must consume the value (e.g. with :meth:`~.read_value`) before advancing the iterator.
+		"""
+
+		opening = self.peek()
+		closing = '}' if opening == '{' else ']'
+		self.pos += 1
+
+		index = 0
+		while True:
+			if self.peek() == closing:
+				self.pos += 1
+				return
+
+			if index:
+				self.expect(',')
+
+			key: Union[str, int]
+			if closing == '}':
+				key = self.read_value()  # type: ignore[assignment]
+				if not isinstance(key, str):
+					raise ValueError(f"Expected a string key but got {key!r}")
+				self.expect(':')
+			else:
+				key = index
+
+			self.peek()
+			yield key
+			index += 1
+
+
+def iter_gzip_json(
+		path: PathLike,
+		expand: Collection[str] = (),
+		chunk_size: int = 1024 * 1024,
+		select: Optional[Collection[Tuple[Union[str, int], ...]]] = None,
+		) -> Iterator[Tuple[Tuple[Union[str, int], ...], JSONOutput]]:
+	"""
+	Incrementally decode a gzipped JSON object, yielding its top-level members one at a time.
+
+	The file is decompressed and scanned in chunks, and only one member is decoded at once,
+	so large documents can be processed with memory bounded by the largest member.
+
+	If the document is not a JSON object the whole document is yielded with an empty key path.
+
+	:param path: The filename to read from.
+	:param expand: Keys of top-level members (e.g. ``'datafile_data'`` in a ``.gsmp`` file) whose members
+		should themselves be yielded one at a time, rather than all at once.
+		Members of objects are keyed by their name and members of arrays by their index.
+	:param chunk_size: The number of bytes to decompress at once.
+	:param select: The key paths of the members to yield. Other members are skipped without being decoded,
+		and the rest of the file isn't read once all the selected members have been found.
+		By default all members are yielded.
+
+	:returns: An iterator of key paths (e.g. ``('name', )`` or ``('datafile_data', 'repeat_1')``) and values.
+
+	The compression format is detected with :func:`~.detect_codec`, so files written with any registered codec can be read.
+
+	.. versionadded:: 0.14.0
+	"""
+
+	remaining = None if select is None else set(select)
+
+	with detect_codec(path).open(os.fspath(path), "rb", None, 0) as f:
+		decoder = _StreamDecoder(f, chunk_size)
+
+		if decoder.peek() != '{':
+			yield (), decoder.read_value()
+		else:
+			for key in decoder.iter_container():
+				key_paths: Iterator[Tuple[Union[str, int], ...]]
+				if key in expand and decoder.peek() in "[{":
+					key_paths = ((key, subkey) for subkey in decoder.iter_container())
+				else:
+					key_paths = iter([(key, )])
+
+				for key_path in key_paths:
+					if remaining is None:
+						yield key_path, decoder.read_value()
+					elif key_path in remaining:
+						yield key_path, decoder.read_value()
+						remaining.discard(key_path)
+						if not remaining:
+							return
+					else:
+						decoder.skip_value()
+
+		if decoder.peek():
+			raise ValueError("Extra data after end of JSON document")
+
 
 def read_gzip_json(path: PathLike) -> JSONOutput:
 	"""
@@ -48,33 +605,275 @@ def read_gzip_json(path: PathLike) -> JSONOutput:
 	:param path: The filename to read from.
 
 	:returns: The loaded JSON content.
+
+	.. versionchanged:: 0.14.0
+
+		* The file is now decompressed and decoded incrementally (see :func:`~.iter_gzip_json`).
+		* ``NaN`` values are returned as :py:obj:`float('nan') <float>` rather than ``-65535``.
+		* Files compressed with any registered :class:`~.Codec` can be read.
 	"""
 
-	with gzip.open(PathPlus(path), 'r') as f:
-		try:
-			# 3rd party
-			import orjson
-			data = f.read().decode().replace("NaN", "-65535")
-			return orjson.loads(data)
-		except ImportError:
-			return sdjson.load(f)
+	result: Dict[str, Any] = {}
+
+	for key_path, value in iter_gzip_json(path):
+		if not key_path:
+			return value
+		result[key_path[0]] = value  # type: ignore[index]
+
+	return result
+
+
+def _encode_key(key: Any) -> str:
+	# Same conversion of non-string keys as the json module.
+	if not isinstance(key, str):
+		key = sdjson.dumps(key)
+	return sdjson.dumps(key)
+
+
+@sdjson.register_encoder(numpy.ndarray)
+def _encode_numpy_array(obj: numpy.ndarray) -> List[Any]:
+	return obj.tolist()
 
 
-def write_gzip_json(path: PathLike, data: JSONInput, indent: Optional[int] = 2, mtime: int = 0) -> None:
+@sdjson.register_encoder(numpy.floating)
+def _encode_numpy_float(obj: numpy.floating) -> float:
+	return float(obj)
+
+
+@sdjson.register_encoder(numpy.integer)
+def _encode_numpy_integer(obj: numpy.integer) -> int:
+	return int(obj)
+
+
+@sdjson.register_encoder(numpy.bool_)
+def _encode_numpy_bool(obj: numpy.bool_) -> bool:
+	return bool(obj)
+
+
+def _dumps_array(array: numpy.ndarray) -> Optional[str]:
+	"""
+	Encode a numeric array with :mod:`orjson`, if it is available.
+
+	The output is identical to that of :func:`sdjson.dumps` for ``array.tolist()``.
+	:py:obj:`None` is returned if :mod:`orjson` is unavailable or the output might differ,
+	such as for arrays containing ``NaN`` (which :mod:`orjson` writes as ``null``).
+
+	:param array:
+	"""
+
+	if array.dtype.kind not in "biuf" or not array.size:
+		return None
+
+	try:
+		# 3rd party
+		import orjson
+	except ImportError:
+		return None
+
+	if array.dtype.kind == 'f':
+		if not numpy.isfinite(array).all():
+			return None
+		if array.dtype != numpy.float64:
+			# tolist() gives Python floats, which are written with the shortest float64 representation.
+			array = array.astype(numpy.float64)
+
+	if array.dtype.byteorder == '>' or not array.flags.c_contiguous:
+		array = numpy.ascontiguousarray(array, dtype=array.dtype.newbyteorder('='))
+
+	try:
+		text = orjson.dumps(array, option=orjson.OPT_SERIALIZE_NUMPY).decode("UTF-8").replace(',', ", ")
+	except orjson.JSONEncodeError:
+		return None
+
+	if array.dtype.kind == 'f':
+		def fix_small_float(match: Match[str]) -> str:
+			# A lookbehind would make the search much slower; check the preceding character here instead.
+			if match.start() and text[match.start() - 1] in "0123456789.":
+				return match.group()
+			return repr(float(match.group()))
+
+		text = _ORJSON_SMALL_FLOAT.sub(fix_small_float, text)
+		text = _ORJSON_SHORT_EXPONENT.sub(r"e-0\1", text)
+
+	return text
+
+
+def _is_thunk(obj: Any) -> bool:
+	return callable(obj) and not isinstance(obj, type)
+
+
+def _iterencode(obj: Any, indent: Optional[int], level: int = 0) -> Iterator[str]:
+	"""
+	Encode ``obj`` as JSON a section at a time.
+
+	Callables are called and their return values encoded in their place, only once they are reached.
+	Dictionaries (and lists containing callables) are written one member at a time; anything else is encoded in one go.
+	Numeric :class:`numpy.ndarray` objects are encoded with :mod:`orjson` where possible.
+	The output is the same as :func:`sdjson.dumps` would give for the evaluated document.
+
+	:param obj:
+	:param indent: Number of spaces used to indent JSON.
+	:param level: The nesting level of ``obj``, for indentation.
+	"""
+
+	if _is_thunk(obj):
+		obj = obj()
+
+	if isinstance(obj, dict):
+		members: Iterable[Tuple[Optional[str], Any]] = ((_encode_key(k), v) for k, v in obj.items())
+		opening, closing = '{', '}'
+	elif isinstance(obj, (list, tuple)) and any(map(_is_thunk, obj)):
+		members = ((None, v) for v in obj)
+		opening, closing = '[', ']'
+	else:
+		text = None
+		if indent is None and isinstance(obj, numpy.ndarray):
+			text = _dumps_array(obj)
+		if text is None:
+			text = sdjson.dumps(obj, indent=indent)
+		if indent is not None and level:
+			# Only whitespace between tokens is unescaped; newlines in strings are escaped.
+			text = text.replace('\n', '\n' + ' ' * (indent * level))
+		yield text
+		return
+
+	if not obj:
+		yield opening + closing
+		return
+
+	if indent is None:
+		separator = ", "
+		yield opening
+	else:
+		separator = ",\n" + ' ' * (indent * (level + 1))
+		yield opening + separator[1:]
+
+	first = True
+	for key, value in members:
+		if not first:
+			yield separator
+		first = False
+
+		if key is not None:
+			yield key + ": "
+		yield from _iterencode(value, indent, level + 1)
+
+	if indent is not None:
+		yield '\n' + ' ' * (indent * level)
+	yield closing
+
+
+def _write_blocks(
+		fp: IO[bytes],
+		chunks: Iterable[str],
+		executor: Executor,
+		block_size: int,
+		codec: Codec,
+		level: Optional[int],
+		mtime: int,
+		) -> None:
+	"""
+	Compress text in blocks of ``block_size`` bytes in ``executor``, writing each as a separate member (or frame).
+
+	The members are written in order, and at most a few blocks per CPU are held in memory at once.
+
+	:param fp:
+	:param chunks: The text to write.
+	:param executor:
+	:param block_size: The size of each uncompressed block, in bytes.
+	:param codec: The codec to compress each block with.
+	:param level: The compression level, or :py:obj:`None` for the codec's default.
+	:param mtime: Modification time for the header of each member.
+	"""
+
+	max_pending = 2 * (os.cpu_count() or 1)
+	pending: Deque["Future[bytes]"] = deque()
+
+	def submit(block: bytes) -> None:
+		if len(pending) >= max_pending:
+			fp.write(pending.popleft().result())
+		pending.append(executor.submit(codec.compress, block, level, mtime))
+
+	buffer: List[bytes] = []
+	buffered = 0
+
+	for chunk in chunks:
+		encoded = chunk.encode("UTF-8")
+		buffer.append(encoded)
+		buffered += len(encoded)
+
+		if buffered >= block_size:
+			data = b''.join(buffer)
+			offset = 0
+			while len(data) - offset >= block_size:
+				submit(data[offset:offset + block_size])
+				offset += block_size
+			buffer = [data[offset:]]
+			buffered = len(data) - offset
+
+	if buffered or not pending:
+		submit(b''.join(buffer))
+
+	while pending:
+		fp.write(pending.popleft().result())
+
+
+def write_gzip_json(
+		path: PathLike,
+		data: JSONInput,
+		indent: Optional[int] = 2,
+		mtime: int = 0,
+		executor: Optional[Executor] = None,
+		block_size: int = _BLOCK_SIZE,
+		codec: str = "gzip",
+		) -> None:
 	"""
 	Write JSON to a gzip file.
 
+	The document is encoded and compressed a section at a time, rather than being encoded to a single string.
+	Callables within ``data`` (e.g. the bound :meth:`~.Repeat.to_dict` method of a :class:`~.Repeat`)
+	are only called once the writer reaches them, and their return values are discarded once written,
+	so the whole document never needs to be held in memory.
+
+	If ``executor`` is given (e.g. a :class:`~concurrent.futures.ThreadPoolExecutor`) the output is split into
+	blocks of ``block_size`` bytes which are compressed concurrently and written as a multi-member gzip file.
+	This can be read by :func:`gzip.open` and :func:`~.read_gzip_json` in the same way as a single-member file.
+	The output is still reproducible for a given ``block_size``, but is not identical to
+	the single-member output, and is slightly larger.
+
+	Other compression formats can be chosen with ``codec``. The built-in codecs are ``'gzip'``, ``'bz2'``,
+	``'lzma'`` and ``'none'`` (uncompressed), and ``'zstd'`` and ``'lz4'`` if
+	`zstandard <https://pypi.org/project/zstandard/>`_ or `lz4 <https://pypi.org/project/lz4/>`_ are installed.
+	A compression level can be given after a colon, e.g. ``'gzip:1'`` for the fastest gzip compression.
+
 	:param path: The filename to write to.
 	:param data: The JSON-serializable data to output.
 	:param indent: Number of spaces used to indent JSON.
 	:param mtime: Modification time for gzip header
+	:param executor: Optional executor to compress blocks of the output in parallel.
+	:param block_size: The size of each uncompressed block, in bytes. Ignored if ``executor`` is :py:obj:`None`.
+	:param codec: The compression codec and (optionally) level. See :func:`~.get_codec`.
 
 	:rtype:
 
 	.. versionchanged:: 0.12.0  Added ``mtime`` argument.
+	.. versionchanged:: 0.14.0
+
+		* The output is written incrementally, and ``data`` may contain callables.
+		* Added the ``executor``, ``block_size`` and ``codec`` arguments.
 	"""
 
-	json_data = sdjson.dumps(data, indent=indent)
+	compression_codec, level = get_codec(codec)
+
+	if executor is not None:
+		if block_size < 1:
+			raise ValueError("'block_size' must be a positive integer")
+
+		with open(PathPlus(path), "wb") as fp:
+			_write_blocks(fp, _iterencode(data, indent), executor, block_size, compression_codec, level, mtime)
+		return
 
-	with gzip.GzipFile(PathPlus(path), 'w', mtime=mtime) as f:
-		f.write(json_data.encode("utf-8"))
+	with compression_codec.open(os.fspath(path), "wb", level, mtime) as raw_file:
+		with io.TextIOWrapper(raw_file, encoding="UTF-8", newline='') as f:
+			for chunk in _iterencode(data, indent):
+				f.write(chunk)
@@ -0,0 +1,870 @@
+#!/usr/bin/env python3
+#
+#  intensity_matrix.py
+"""
+Functions for processing intensity matrices.
+
+.. versionadded:: 0.14.0
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import itertools
+import math
+from concurrent.futures import Executor, as_completed
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Union
+
+# 3rd party
+import numpy
+from domdf_python_tools.typing import PathLike
+from numpy.typing import DTypeLike
+from pyms.GCMS.Class import GCMS_data
+from pyms.IntensityMatrix import AsciiFiletypes, IntensityMatrix
+from pyms.IonChromatogram import BasePeakChromatogram, IonChromatogram
+from pyms.Noise.SavitzkyGolay import _calc_coeff
+from pyms.Utils.Time import time_str_secs
+from pyms.Utils.Utils import is_number
+from scipy import ndimage  # type: ignore[import-untyped]
+
+# this package
+from libgunshotmatch.method import SavitzkyGolayMethod
+
+__all__ = (
+		"SparseIntensityMatrix",
+		"build_intensity_matrix",
+		"filter_intensity_array",
+		"savitzky_golay_array",
+		"tophat_array",
+		)
+
+
+# The bin boundaries used by pyms.IntensityMatrix.build_intensity_matrix_i
+_BIN_LEFT = 0.3
+_BIN_RIGHT = 0.7
+
+
+class _SinglePrecisionIntensityMatrix(IntensityMatrix):
+	"""
+	An :class:`~pyms.IntensityMatrix.IntensityMatrix` with the intensities stored as 32-bit floats.
+
+	PyMassSpec only accepts 64-bit floats in intensity matrices, ion chromatograms and peak detection,
+	so :attr:`~.intensity_array` (which is a copy) and ion chromatograms (including the TIC and base peak chromatogram)
+	are converted to double precision as they are extracted.
+
+	:param time_list: Retention time values.
+	:param mass_list: Binned mass values.
+	:param intensity_array: Array of intensities, with one row per scan and one column per *m/z* channel.
+	"""
+
+	def __init__(self, time_list: Sequence[float], mass_list: Sequence[float], intensity_array: numpy.ndarray):
+		intensity_array = numpy.asarray(intensity_array, dtype=numpy.float32)
+
+		# Validated against a read-only array of the same shape, which takes no memory.
+		super().__init__(time_list, mass_list, numpy.broadcast_to(numpy.float64(0), intensity_array.shape))
+		self._intensity_array = intensity_array
+
+	@property
+	def intensity_array(self) -> numpy.ndarray:  # noqa: D102
+		return self._intensity_array.astype(numpy.float64)
+
+	def get_ic_at_index(self, ix: int) -> IonChromatogram:  # noqa: D102
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an integer")
+
+		intensity_list: numpy.ndarray = self._intensity_array[:, ix].astype(numpy.float64)
+		return IonChromatogram(intensity_list, self._time_list[:], self.get_mass_at_index(ix))
+
+	@property
+	def tic(self) -> IonChromatogram:  # noqa: D102
+		return IonChromatogram(self._intensity_array.sum(axis=1, dtype=numpy.float64), self._time_list[:], None)
+
+	@property
+	def bpc(self) -> IonChromatogram:  # noqa: D102
+		return BasePeakChromatogram(self._intensity_array.max(axis=1).astype(numpy.float64), self._time_list[:])
+
+	def crop_mass(self, mass_min: float, mass_max: float) -> None:  # noqa: D102
+		super().crop_mass(mass_min, mass_max)
+		self._intensity_array = self._intensity_array.astype(numpy.float32)
+
+
+def _new_intensity_matrix(
+		time_list: Sequence[float],
+		mass_list: Sequence[float],
+		intensity_array: numpy.ndarray,
+		) -> IntensityMatrix:
+	"""
+	Construct an intensity matrix, keeping the intensities as 32-bit floats if ``intensity_array`` is single-precision.
+
+	:param time_list: Retention time values.
+	:param mass_list: Binned mass values.
+	:param intensity_array: Array of intensities, with one row per scan and one column per *m/z* channel.
+	"""
+
+	if isinstance(intensity_array, numpy.ndarray) and intensity_array.dtype == numpy.float32:
+		return _SinglePrecisionIntensityMatrix(time_list, mass_list, intensity_array)
+	else:
+		return IntensityMatrix(time_list, mass_list, intensity_array)
+
+
+class SparseIntensityMatrix(IntensityMatrix):
+	"""
+	An intensity matrix which only stores the non-zero intensities, in compressed sparse row (CSR) format.
+
+	The non-zero intensities of scan ``i`` are ``data[indptr[i]:indptr[i + 1]]``,
+	in the *m/z* channels given by ``indices[indptr[i]:indptr[i + 1]]``.
+
+	Ion chromatograms (including the TIC and base peak chromatogram) and mass spectra are extracted directly from
+	the sparse arrays, as is :meth:`~.crop_mass`. To extract ion chromatograms, the positions of each *m/z* channel's
+	intensities within :attr:`~.data` are found (and kept) the first time one is requested.
+	PyMassSpec functions which use the whole intensity array, such as :func:`~pyms.BillerBiemann.BillerBiemann`,
+	are given a dense copy from :attr:`~.intensity_array`. Methods which export or modify the intensities do so on
+	a dense copy, which for modifications is then converted back to sparse arrays.
+
+	After top-hat baseline correction much of the intensity matrix may be exactly zero,
+	although Savitzky-Golay smoothing (which spreads each non-zero intensity over neighbouring scans) reduces this.
+	A sparse intensity matrix takes less memory than a dense one when fewer than about 80%
+	of the intensities are non-zero (for 64-bit intensities and fewer than 65536 *m/z* channels).
+
+	:param time_list: Retention time values.
+	:param mass_list: Binned mass values.
+	:param data: The non-zero intensities, scan by scan.
+	:param indices: The index of the *m/z* channel of each intensity in ``data``.
+	:param indptr: The index in ``data`` of the first intensity of each scan, followed by the length of ``data``.
+	"""
+
+	def __init__(
+			self,
+			time_list: Sequence[float],
+			mass_list: Sequence[float],
+			data: numpy.ndarray,
+			indices: numpy.ndarray,
+			indptr: numpy.ndarray,
+			):
+		if len(indptr) != len(time_list) + 1:
+			raise ValueError("'indptr' must be one longer than 'time_list'")
+		if len(data) != len(indices) or len(data) != indptr[-1]:
+			raise ValueError("'data' and 'indices' must be the same length as given by 'indptr'")
+		if not len(time_list) or not len(mass_list):
+			raise ValueError("'time_list' and 'mass_list' must not be empty")
+
+		# Not passed to IntensityMatrix.__init__, which would require a dense array.
+		self._time_list = list(time_list)
+		self._mass_list = list(mass_list)
+		self._min_rt, self._max_rt = min(time_list), max(time_list)
+		self._min_mass, self._max_mass = min(mass_list), max(mass_list)
+
+		if not isinstance(data, numpy.ndarray) or data.dtype.kind != 'f':
+			data = numpy.asarray(data, dtype=numpy.float64)
+
+		self._data = data
+		self._indices = numpy.asarray(indices).astype(_index_dtype(len(mass_list)), copy=False)
+		self._indptr = numpy.asarray(indptr).astype(numpy.int64, copy=False)
+		self._n_masses = len(mass_list)
+
+		# The positions in data of each m/z channel's intensities, and the start of each channel's positions.
+		self._columns: Optional[Tuple[numpy.ndarray, numpy.ndarray]] = None
+
+	@classmethod
+	def from_intensity_matrix(cls, intensity_matrix: IntensityMatrix) -> "SparseIntensityMatrix":
+		"""
+		Construct a :class:`~.SparseIntensityMatrix` from a dense intensity matrix.
+
+		:param intensity_matrix:
+		"""
+
+		data, indices, indptr = _to_csr(intensity_matrix._intensity_array)
+		return cls(intensity_matrix._time_list, intensity_matrix._mass_list, data, indices, indptr)
+
+	def to_intensity_matrix(self) -> IntensityMatrix:
+		"""
+		Returns a dense copy of the intensity matrix.
+
+		The intensities are kept as 32-bit floats if :attr:`~.data` is single-precision.
+		"""
+
+		return _new_intensity_matrix(self._time_list, self._mass_list, self._intensity_array)
+
+	@property
+	def data(self) -> numpy.ndarray:
+		"""
+		The non-zero intensities, scan by scan.
+		"""
+
+		return self._data
+
+	@property
+	def indices(self) -> numpy.ndarray:
+		"""
+		The index of the *m/z* channel of each intensity in :attr:`~.data`.
+		"""
+
+		return self._indices
+
+	@property
+	def indptr(self) -> numpy.ndarray:
+		"""
+		The index in :attr:`~.data` of the first intensity of each scan, followed by the length of :attr:`~.data`.
+		"""
+
+		return self._indptr
+
+	@property
+	def nbytes(self) -> int:
+		"""
+		The number of bytes taken by the sparse arrays.
+		"""
+
+		return self._data.nbytes + self._indices.nbytes + self._indptr.nbytes
+
+	@property
+	def _intensity_array(self) -> numpy.ndarray:
+		# A new dense array each time, for any PyMassSpec methods which use the dense array directly.
+		intensity_array = numpy.zeros((len(self._indptr) - 1, self._n_masses), dtype=self._data.dtype)
+		intensity_array[self._row_indices(), self._indices] = self._data
+		return intensity_array
+
+	@_intensity_array.setter
+	def _intensity_array(self, intensity_array: numpy.ndarray) -> None:
+		intensity_array = numpy.asarray(intensity_array).astype(self._data.dtype, copy=False)
+		self._data, self._indices, self._indptr = _to_csr(intensity_array)
+		self._n_masses = intensity_array.shape[1]
+		self._columns = None
+
+	def _row_indices(self) -> numpy.ndarray:
+		"""
+		Returns the index of the scan of each intensity in :attr:`~.data`.
+		"""
+
+		return numpy.repeat(numpy.arange(len(self._indptr) - 1), numpy.diff(self._indptr))
+
+	@property
+	def size(self) -> Tuple[int, int]:  # noqa: D102
+		return len(self._indptr) - 1, self._n_masses
+
+	def iter_ms_indices(self) -> Iterator[int]:  # noqa: D102
+		yield from range(len(self._indptr) - 1)
+
+	def iter_ic_indices(self) -> Iterator[int]:  # noqa: D102
+		yield from range(self._n_masses)
+
+	@property
+	def intensity_array(self) -> numpy.ndarray:  # noqa: D102
+		# Double-precision, as PyMassSpec only accepts 64-bit floats.
+		return self._intensity_array.astype(numpy.float64, copy=False)
+
+	def _channel_positions(self, ix: int) -> numpy.ndarray:
+		"""
+		Returns the positions in :attr:`~.data` of the intensities in the *m/z* channel with the given index.
+
+		:param ix:
+		"""
+
+		if self._columns is None:
+			# Equivalent to converting to compressed sparse column (CSC) format, but without copying the data.
+			column_ptr: numpy.ndarray = numpy.zeros(self._n_masses + 1, dtype=numpy.int64)
+			numpy.cumsum(numpy.bincount(self._indices, minlength=self._n_masses), out=column_ptr[1:])
+			self._columns = (numpy.argsort(self._indices, kind="stable"), column_ptr)
+
+		column_order, column_ptr = self._columns
+		return column_order[column_ptr[ix]:column_ptr[ix + 1]]
+
+	def get_ic_at_index(self, ix: int) -> IonChromatogram:  # noqa: D102
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an integer")
+
+		positions = self._channel_positions(ix)
+		intensity_list = numpy.zeros(len(self._indptr) - 1)
+		# The scan of each position, from the start of each scan's intensities.
+		intensity_list[numpy.searchsorted(self._indptr, positions, side="right") - 1] = self._data[positions]
+		return IonChromatogram(intensity_list, self._time_list[:], self.get_mass_at_index(ix))
+
+	def get_scan_at_index(self, ix: int) -> List[float]:  # noqa: D102
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an integer")
+		if ix < 0 or ix >= len(self._indptr) - 1:
+			raise IndexError("index out of range")
+
+		start, stop = self._indptr[ix], self._indptr[ix + 1]
+		scan = numpy.zeros(self._n_masses)
+		scan[self._indices[start:stop]] = self._data[start:stop]
+		return scan.tolist()
+
+	@property
+	def tic(self) -> IonChromatogram:  # noqa: D102
+		n_scans = len(self._indptr) - 1
+		intensity_list = numpy.bincount(self._row_indices(), weights=self._data, minlength=n_scans)
+		return IonChromatogram(intensity_list, self._time_list[:], None)
+
+	@property
+	def bpc(self) -> IonChromatogram:  # noqa: D102
+		counts = numpy.diff(self._indptr)
+		intensity_list = numpy.zeros(len(counts))
+
+		non_empty = counts > 0
+		if non_empty.any():
+			intensity_list[non_empty] = numpy.maximum.reduceat(self._data, self._indptr[:-1][non_empty])
+
+		# Scans with some zero intensities, in case all the non-zero intensities are negative.
+		has_zeros = counts < self._n_masses
+		intensity_list[has_zeros] = numpy.maximum(intensity_list[has_zeros], 0)
+
+		return BasePeakChromatogram(intensity_list, self._time_list[:])
+
+	def crop_mass(self, mass_min: float, mass_max: float) -> None:  # noqa: D102
+		if not is_number(mass_min) or not is_number(mass_max):
+			raise TypeError("'mass_min' and 'mass_max' must be numbers")
+		if mass_min >= mass_max:
+			raise ValueError("'mass_min' must be less than 'mass_max'")
+		if mass_min < self._min_mass:
+			raise ValueError(f"'mass_min' is less than the smallest mass: {self._min_mass:.3f}")
+		if mass_max > self._max_mass:
+			raise ValueError(f"'mass_max' is greater than the largest mass: {self._max_mass:.3f}")
+
+		mass_array = numpy.asarray(self._mass_list)
+		keep_channel = (mass_array >= mass_min) & (mass_array <= mass_max)
+		new_mass_list = mass_array[keep_channel].tolist()
+
+		keep = keep_channel[self._indices]
+		# The number of intensities kept before the start of each scan.
+		self._indptr = numpy.concatenate([[0], numpy.cumsum(keep)])[self._indptr]
+		new_index = numpy.cumsum(keep_channel) - 1
+		self._indices = new_index[self._indices[keep]].astype(_index_dtype(len(new_mass_list)))
+		self._data = self._data[keep]
+		self._n_masses = len(new_mass_list)
+		self._columns = None
+
+		self._mass_list = new_mass_list
+		self._min_mass = min(new_mass_list)
+		self._max_mass = max(new_mass_list)
+
+	def export_ascii(self, root_name: PathLike, fmt: AsciiFiletypes = AsciiFiletypes.ASCII_DAT) -> None:  # noqa: D102
+		self.to_intensity_matrix().export_ascii(root_name, fmt)
+
+	def export_leco_csv(self, file_name: PathLike) -> None:  # noqa: D102
+		self.to_intensity_matrix().export_leco_csv(file_name)
+
+	def set_ic_at_index(self, ix: int, ic: IonChromatogram) -> None:  # noqa: D102
+		intensity_matrix = self.to_intensity_matrix()
+		intensity_matrix.set_ic_at_index(ix, ic)
+		self._intensity_array = intensity_matrix._intensity_array
+
+	def null_mass(self, mass: float) -> None:  # noqa: D102
+		intensity_matrix = self.to_intensity_matrix()
+		intensity_matrix.null_mass(mass)
+		self._intensity_array = intensity_matrix._intensity_array
+
+	def reduce_mass_spectra(self, n_intensities: int = 5) -> None:  # noqa: D102
+		intensity_matrix = self.to_intensity_matrix()
+		intensity_matrix.reduce_mass_spectra(n_intensities)
+		self._intensity_array = intensity_matrix._intensity_array
+
+
+def _index_dtype(n_masses: int) -> numpy.dtype:
+	# Nominal mass channels fit in 16 bits, as for the compact encoding of mass spectra.
+	return numpy.dtype(numpy.uint16 if n_masses <= 65536 else numpy.int32)
+
+
+def _to_csr(intensity_array: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+	"""
+	Returns the non-zero intensities of a dense intensity array, their *m/z* channels,
+	and the index of the first intensity of each scan.
+
+	:param intensity_array:
+	"""
+
+	rows, columns = numpy.nonzero(intensity_array)
+	indptr = numpy.zeros(intensity_array.shape[0] + 1, dtype=numpy.int64)
+	numpy.cumsum(numpy.bincount(rows, minlength=intensity_array.shape[0]), out=indptr[1:])
+
+	return intensity_array[rows, columns], columns.astype(_index_dtype(intensity_array.shape[1])), indptr
+
+
+def _crop_mass_bins(crop_mass_range: Optional[Tuple[float, float]]) -> Optional[Tuple[int, int]]:
+	"""
+	Returns the first and last integer *m/z* bins within ``crop_mass_range``.
+
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to,
+		or :py:obj:`None` to not limit the masses.
+	"""
+
+	if crop_mass_range is None:
+		return None
+
+	min_mass, max_mass = crop_mass_range
+	if min_mass >= max_mass:
+		raise ValueError("The minimum mass of 'crop_mass_range' must be less than the maximum mass.")
+
+	return math.ceil(min_mass), math.floor(max_mass)
+
+
+def _mass_bins(min_mass: float, max_mass: float, crop_bins: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+	"""
+	Returns the first and last integer *m/z* bins of the intensity matrix for data with the given mass range.
+
+	The bins are the same as :func:`pyms.IntensityMatrix.build_intensity_matrix_i`,
+	followed by :meth:`~pyms.IntensityMatrix.BaseIntensityMatrix.crop_mass` if ``crop_bins`` is given.
+
+	:param min_mass: The smallest mass in the data.
+	:param max_mass: The largest mass in the data.
+	:param crop_bins: The first and last bins to keep.
+	"""
+
+	first_bin = int(min_mass + 1 - _BIN_RIGHT)
+	last_bin = first_bin + int(max_mass + _BIN_LEFT - first_bin)
+
+	if crop_bins is not None:
+		first_bin = max(first_bin, crop_bins[0])
+		last_bin = min(last_bin, crop_bins[1])
+		if first_bin > last_bin:
+			raise ValueError("'crop_mass_range' does not overlap the masses in the data.")
+
+	return first_bin, last_bin
+
+
+def _bin_scans(
+		masses: Any,
+		intensities: Any,
+		offsets: numpy.ndarray,
+		first_bin: int,
+		last_bin: int,
+		chunk_size: int = 2**20,
+		dtype: DTypeLike = numpy.float64,
+		) -> numpy.ndarray:
+	"""
+	Bin scans given as flat arrays of masses and intensities into an intensity array.
+
+	The scans are binned a few at a time, with each chunk of about ``chunk_size`` points binned with
+	a single call to :func:`numpy.bincount`. The intensities in each bin are summed in the same order as
+	:func:`pyms.IntensityMatrix.build_intensity_matrix_i`, so the result is identical.
+
+	:param masses: The masses of all scans, one after the other.
+		Any object which can be sliced to give an array, such as a memory-mapped netCDF variable.
+	:param intensities: The intensities of all scans, in the same order as ``masses``.
+	:param offsets: The index of the first point of each scan, followed by the total number of points.
+	:param first_bin: The first *m/z* bin of the intensity array. Masses outside the bins are ignored.
+	:param last_bin: The last *m/z* bin of the intensity array.
+	:param chunk_size: The approximate number of points to bin at once.
+	:param dtype: The data type of the returned array.
+		The intensities are summed at double precision regardless.
+
+	:returns: An array of intensities, with one row per scan and one column per *m/z* bin.
+	"""
+
+	n_scans = len(offsets) - 1
+	n_bins = last_bin - first_bin + 1
+	intensity_array: Optional[numpy.ndarray] = None
+
+	start_scan = 0
+	while start_scan < n_scans:
+		end_scan = int(numpy.searchsorted(offsets, offsets[start_scan] + chunk_size, side="right")) - 1
+		end_scan = min(max(end_scan, start_scan + 1), n_scans)
+		start, end = int(offsets[start_scan]), int(offsets[end_scan])
+
+		chunk_masses = numpy.asarray(masses[start:end], dtype=numpy.float64)
+		chunk_intensities = numpy.asarray(intensities[start:end], dtype=numpy.float64)
+		counts = numpy.diff(offsets[start_scan:end_scan + 1])
+		rows: numpy.ndarray = numpy.repeat(numpy.arange(end_scan - start_scan), counts)
+
+		bins = numpy.floor(chunk_masses + _BIN_LEFT).astype(numpy.int64) - first_bin
+		in_range = (bins >= 0) & (bins < n_bins)
+		cells = rows[in_range] * n_bins + bins[in_range]
+
+		chunk_array = numpy.bincount(
+				cells,
+				weights=chunk_intensities[in_range],
+				minlength=(end_scan - start_scan) * n_bins,
+				).reshape(-1, n_bins)
+
+		if end_scan - start_scan == n_scans:
+			# All scans were binned at once, so no need to copy into another array.
+			return chunk_array.astype(dtype, copy=False)
+
+		if intensity_array is None:
+			intensity_array = numpy.empty((n_scans, n_bins), dtype=dtype)
+		intensity_array[start_scan:end_scan] = chunk_array
+
+		start_scan = end_scan
+
+	if intensity_array is None:
+		# No scans
+		return numpy.zeros((0, n_bins), dtype=dtype)
+
+	return intensity_array
+
+
+def build_intensity_matrix(
+		gcms_data: GCMS_data,
+		crop_mass_range: Optional[Tuple[float, float]] = None,
+		dtype: DTypeLike = numpy.float64,
+		) -> IntensityMatrix:
+	"""
+	Construct an intensity matrix with integer *m/z* bins from GC-MS data, limited to the given range of masses.
+
+	The result is the same as :func:`pyms.IntensityMatrix.build_intensity_matrix_i` followed by
+	:meth:`~pyms.IntensityMatrix.BaseIntensityMatrix.crop_mass`, but only the bins within ``crop_mass_range``
+	are allocated, and the scans are binned together with :func:`numpy.bincount` rather than one mass at a time.
+
+	:param gcms_data:
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to
+		(e.g. :attr:`IntensityMatrixMethod.crop_mass_range <.IntensityMatrixMethod.crop_mass_range>`).
+		If :py:obj:`None` the intensity matrix spans all masses in the data.
+	:param dtype: The data type of the intensity array, such as :class:`numpy.float32` for a single-precision
+		intensity matrix (see :attr:`IntensityMatrixMethod.single_precision <.IntensityMatrixMethod.single_precision>`).
+	"""
+
+	return _build_intensity_matrix(gcms_data, crop_mass_range, dtype=dtype)
+
+
+def _build_intensity_matrix(
+		gcms_data: GCMS_data,
+		crop_mass_range: Optional[Tuple[float, float]] = None,
+		start: int = 0,
+		stop: Optional[int] = None,
+		dtype: DTypeLike = numpy.float64,
+		) -> IntensityMatrix:
+	"""
+	Construct an intensity matrix from the scans ``start`` to ``stop`` of the GC-MS data.
+
+	The *m/z* bins are determined from all scans, so are the same as for the whole of the data.
+
+	:param gcms_data:
+	:param crop_mass_range:
+	:param start: The index of the first scan to include.
+	:param stop: The index after the last scan to include. If :py:obj:`None` all scans after ``start`` are included.
+	:param dtype: The data type of the intensity array.
+	"""
+
+	crop_bins = _crop_mass_bins(crop_mass_range)
+
+	if gcms_data.min_mass is None or gcms_data.max_mass is None:
+		raise ValueError("Cannot build an intensity matrix from scans with no masses.")
+
+	first_bin, last_bin = _mass_bins(gcms_data.min_mass, gcms_data.max_mass, crop_bins)
+
+	# The internal lists, as the properties return copies.
+	scan_list = gcms_data._scan_list[start:stop]
+	offsets: numpy.ndarray = numpy.zeros(len(scan_list) + 1, dtype=numpy.int64)
+	numpy.cumsum([len(scan) for scan in scan_list], out=offsets[1:])
+	n_points = int(offsets[-1])
+
+	masses = numpy.fromiter(
+			itertools.chain.from_iterable(scan._mass_list for scan in scan_list),
+			dtype=numpy.float64,
+			count=n_points,
+			)
+	intensities = numpy.fromiter(
+			itertools.chain.from_iterable(scan._intensity_list for scan in scan_list),
+			dtype=numpy.float64,
+			count=n_points,
+			)
+
+	intensity_array = _bin_scans(masses, intensities, offsets, first_bin, last_bin, dtype=dtype)
+
+	time_list = gcms_data._time_list[start:stop]
+	return _new_intensity_matrix(time_list, list(range(first_bin, last_bin + 1)), intensity_array)
+
+
+def _window_points(time_list: Sequence[float], window: Union[int, str], half_window: bool = False) -> int:
+	"""
+	Converts a window selection parameter into a number of points.
+
+	This is equivalent to :func:`pyms.GCMS.Function.ic_window_points`,
+	but without needing to construct an :class:`~pyms.IonChromatogram.IonChromatogram`.
+
+	:param time_list: The retention times of the scans.
+	:param window: The window selection parameter. This can be an integer or time string.
+		If an integer, taken as the number of points. If a string, must be the form
+		``'<NUMBER>s'`` or ``'<NUMBER>m'``, specifying a time in seconds or minutes, respectively.
+	:param half_window: Whether to return the number of points in the half-window.
+	"""
+
+	if isinstance(window, int):
+		if half_window:
+			if window % 2 == 0:
+				raise ValueError("window must be an odd number of points")
+			points = int(math.floor(window * 0.5))
+		else:
+			points = window
+
+	elif isinstance(window, str):
+		time = time_str_secs(window)
+		# Same calculation as IonChromatogram.time_step
+		time_step = numpy.diff(numpy.asarray(time_list, dtype=numpy.float64)).mean()
+
+		if half_window:
+			time = time * 0.5
+
+		points = int(math.floor(time / time_step))
+
+	else:
+		raise TypeError("'window' must be either an integer or a string")
+
+	if half_window:
+		if points < 1:
+			raise ValueError(f"window too small (half window={points:d})")
+	elif points < 2:
+		raise ValueError(f"window too small (window={points})")
+
+	return points
+
+
+def _tophat_points(time_list: Sequence[float], struct: Union[int, str, None]) -> int:
+	if struct:
+		return _window_points(time_list, struct)
+	else:
+		# Same default as pyms: 20% of the scans
+		return int(round(len(time_list) * 0.2))
+
+
+def _savitzky_golay(intensity_array: numpy.ndarray, coeff: numpy.ndarray) -> numpy.ndarray:
+	# pyms uses numpy.convolve and trims the ends, which is equivalent to zero-padding the signal.
+	return ndimage.convolve1d(intensity_array, coeff, axis=0, mode="constant", cval=0.0)
+
+
+def _tophat(intensity_array: numpy.ndarray, struct_pts: int) -> numpy.ndarray:
+	return ndimage.white_tophat(intensity_array, size=(struct_pts, 1))
+
+
+def _filter_chunk(
+		intensity_array: numpy.ndarray,
+		coeff: Optional[numpy.ndarray],
+		struct_pts: Optional[int],
+		) -> numpy.ndarray:
+	"""
+	Smooth and baseline-correct a block of *m/z* channels.
+
+	This is a module-level function so it can be pickled and sent to a process pool.
+
+	:param intensity_array:
+	:param coeff: Savitzky-Golay filter coefficients, or :py:obj:`None` to skip smoothing.
+	:param struct_pts: Size of the top-hat structuring element, or :py:obj:`None` to skip baseline correction.
+	"""
+
+	if coeff is not None:
+		intensity_array = _savitzky_golay(intensity_array, coeff)
+
+	if struct_pts is not None:
+		intensity_array = _tophat(intensity_array, struct_pts)
+
+	return intensity_array
+
+
+def savitzky_golay_array(
+		intensity_array: numpy.ndarray,
+		time_list: Sequence[float],
+		window: Union[int, str] = 7,
+		degree: int = 2,
+		) -> numpy.ndarray:
+	"""
+	Apply a Savitzky-Golay filter to every ion chromatogram in an intensity array.
+
+	The whole array is filtered along the time axis in a single call,
+	giving the same result as calling :func:`pyms.Noise.SavitzkyGolay.savitzky_golay`
+	on each ion chromatogram in turn.
+
+	:param intensity_array: Array of intensities, with one row per scan and one column per *m/z* channel.
+	:param time_list: The retention times of the scans.
+	:param window: The window size for the filter. Either a number of scans or a string
+		of the form ``'<NUMBER>s'`` or ``'<NUMBER>m'``, specifying a time in seconds or minutes, respectively.
+	:param degree: The degree of the fitting polynomial.
+
+	:returns: A new array of the same shape and dtype as ``intensity_array``.
+	"""
+
+	if not isinstance(degree, int):
+		raise TypeError("'degree' must be an integer")
+
+	wing_length = _window_points(time_list, window, half_window=True)
+	coeff = _calc_coeff(wing_length, degree)
+
+	return _savitzky_golay(intensity_array, coeff)
+
+
+def tophat_array(
+		intensity_array: numpy.ndarray,
+		time_list: Sequence[float],
+		struct: Union[int, str, None] = None,
+		) -> numpy.ndarray:
+	"""
+	Apply top-hat baseline correction to every ion chromatogram in an intensity array.
+
+	A single grey opening is performed over the whole array with a structuring element which spans
+	only the time axis, giving the same result as calling :func:`pyms.TopHat.tophat`
+	on each ion chromatogram in turn.
+
+	:param intensity_array: Array of intensities, with one row per scan and one column per *m/z* channel.
+	:param time_list: The retention times of the scans.
+	:param struct: The size of the structuring element. Either a number of scans or a string
+		of the form ``'<NUMBER>s'`` or ``'<NUMBER>m'``, specifying a time in seconds or minutes, respectively.
+		If :py:obj:`None` the structuring element spans 20% of the scans.
+
+	:returns: A new array of the same shape and dtype as ``intensity_array``.
+	"""
+
+	return _tophat(intensity_array, _tophat_points(time_list, struct))
+
+
+def filter_intensity_array(
+		intensity_array: numpy.ndarray,
+		time_list: Sequence[float],
+		savitzky_golay: Union[bool, SavitzkyGolayMethod] = True,
+		tophat: bool = True,
+		tophat_structure_size: Union[int, str, None] = "1.5m",
+		executor: Optional[Executor] = None,
+		chunk_size: int = 32,
+		) -> None:
+	"""
+	Perform Savitzky-Golay smoothing and top-hat baseline correction on an intensity array, in place.
+
+	By default the whole array is processed at once. If ``executor`` is given the *m/z* channels are
+	instead split into chunks of ``chunk_size`` columns, which are processed in the executor
+	(e.g. a :class:`~concurrent.futures.ThreadPoolExecutor` or :class:`~concurrent.futures.ProcessPoolExecutor`)
+	and written back into ``intensity_array`` as they complete.
+	Either way the result is the same.
+
+	:param intensity_array: Array of intensities, with one row per scan and one column per *m/z* channel.
+	:param time_list: The retention times of the scans.
+	:param savitzky_golay: Whether to perform Savitzky-Golay smoothing,
+		or a :class:`~.SavitzkyGolayMethod` giving the filter settings.
+	:param tophat: Whether to perform Tophat baseline correction.
+	:param tophat_structure_size: The structure size for Tophat baseline correction.
+	:param executor: Optional executor to process chunks of the array in parallel.
+	:param chunk_size: The number of *m/z* channels in each chunk. Ignored if ``executor`` is :py:obj:`None`.
+	"""
+
+	coeff, struct_pts = _filter_parameters(time_list, savitzky_golay, tophat, tophat_structure_size)
+	_filter_array(intensity_array, coeff, struct_pts, executor, chunk_size)
+
+
+def _filter_parameters(
+		time_list: Sequence[float],
+		savitzky_golay: Union[bool, SavitzkyGolayMethod] = True,
+		tophat: bool = True,
+		tophat_structure_size: Union[int, str, None] = "1.5m",
+		) -> Tuple[Optional[numpy.ndarray], Optional[int]]:
+	"""
+	Returns the Savitzky-Golay filter coefficients and the size of the top-hat structuring element,
+	or :py:obj:`None` for each filter which is disabled.
+
+	:param time_list: The retention times of the scans.
+	:param savitzky_golay:
+	:param tophat:
+	:param tophat_structure_size:
+	"""
+
+	coeff: Optional[numpy.ndarray]
+	if isinstance(savitzky_golay, SavitzkyGolayMethod):
+		wing_length = _window_points(time_list, savitzky_golay.window, half_window=True)
+		coeff = _calc_coeff(wing_length, savitzky_golay.degree)
+	elif savitzky_golay:
+		coeff = _calc_coeff(_window_points(time_list, 7, half_window=True), 2)
+	else:
+		coeff = None
+
+	struct_pts: Optional[int]
+	if tophat:
+		struct_pts = _tophat_points(time_list, tophat_structure_size)
+	else:
+		struct_pts = None
+
+	return coeff, struct_pts
+
+
+def _filter_padding(coeff: Optional[numpy.ndarray], struct_pts: Optional[int]) -> int:
+	"""
+	Returns the number of scans either side of a scan which contribute to its filtered intensities.
+
+	Cropping the scans no closer than this to a retention time range
+	leaves the filtered intensities within the range unchanged.
+
+	:param coeff: Savitzky-Golay filter coefficients, or :py:obj:`None` if smoothing is disabled.
+	:param struct_pts: Size of the top-hat structuring element, or :py:obj:`None` if baseline correction is disabled.
+	"""
+
+	padding = 0
+
+	if coeff is not None:
+		padding += len(coeff) // 2
+
+	if struct_pts is not None:
+		# The erosion and the dilation together span struct_pts - 1 scans either side.
+		padding += struct_pts - 1
+
+	return padding
+
+
+def _filter_array(
+		intensity_array: numpy.ndarray,
+		coeff: Optional[numpy.ndarray],
+		struct_pts: Optional[int],
+		executor: Optional[Executor] = None,
+		chunk_size: int = 32,
+		) -> None:
+	"""
+	Smooth and baseline-correct an intensity array in place, optionally in chunks of *m/z* channels.
+
+	:param intensity_array:
+	:param coeff: Savitzky-Golay filter coefficients, or :py:obj:`None` to skip smoothing.
+	:param struct_pts: Size of the top-hat structuring element, or :py:obj:`None` to skip baseline correction.
+	:param executor:
+	:param chunk_size:
+	"""
+
+	if chunk_size < 1:
+		raise ValueError("'chunk_size' must be a positive integer")
+
+	if executor is None:
+		intensity_array[...] = _filter_chunk(intensity_array, coeff, struct_pts)
+		return
+
+	futures = {}
+	for start in range(0, intensity_array.shape[1], chunk_size):
+		chunk = intensity_array[:, start:start + chunk_size]
+		futures[executor.submit(_filter_chunk, chunk, coeff, struct_pts)] = start
+
+	for future in as_completed(futures):
+		start = futures[future]
+		result = future.result()
+		intensity_array[:, start:start + result.shape[1]] = result
+
+
+def _rt_crop_indices(time_list: Sequence[float], crop_rt_range: Tuple[float, float]) -> Tuple[int, int]:
+	"""
+	Returns the indices of the first scan within ``crop_rt_range`` and of the scan after the last.
+
+	:param time_list: The retention times of the scans, in seconds.
+	:param crop_rt_range: The retention time range, in minutes.
+	"""
+
+	min_rt, max_rt = crop_rt_range
+	if min_rt >= max_rt:
+		raise ValueError("The minimum retention time of 'crop_rt_range' must be less than the maximum retention time.")
+
+	times = numpy.asarray(time_list, dtype=numpy.float64)
+	start = int(numpy.searchsorted(times, min_rt * 60, side="left"))
+	stop = int(numpy.searchsorted(times, max_rt * 60, side="right"))
+
+	if start >= stop:
+		raise ValueError("'crop_rt_range' does not overlap the retention times of the data.")
+
+	return start, stop
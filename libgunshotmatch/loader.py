@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+#
+#  loader.py
+"""
+Load many ``gsmd``, ``gsmr`` and ``gsmp`` files in parallel.
+
+Most of the time taken to load a file is spent decompressing and parsing it,
+so :func:`~.load_files` loads files in separate processes and yields each object as it is ready.
+
+.. code-block:: python
+
+	for result in load_files("projects/*.gsmp"):
+		if result.error is not None:
+			print(f"Failed to load {result.filename}: {result.error}")
+		else:
+			print(f"Loaded {result.filename} in {result.duration:.2f}s")
+			project = result.result
+
+.. versionadded:: 0.14.0
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import glob
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Type, Union
+
+# 3rd party
+from domdf_python_tools.typing import PathLike
+
+# this package
+from libgunshotmatch.datafile import Datafile, Repeat
+from libgunshotmatch.project import Project
+
+__all__ = ("LoadResult", "load_files")
+
+_loaders: Dict[str, Union[Type[Datafile], Type[Repeat], Type[Project]]] = {
+		".gsmd": Datafile,
+		".gsmr": Repeat,
+		".gsmp": Project,
+		}
+
+
+class LoadResult(NamedTuple):
+	"""
+	The outcome of loading a file with :func:`~.load_files`.
+	"""
+
+	#: The file which was loaded.
+	filename: str
+
+	#: The loaded :class:`~.Datafile`, :class:`~.Repeat` or :class:`~.Project`,
+	#: or its summary if only metadata was loaded. :py:obj:`None` if the file could not be loaded.
+	result: Any
+
+	#: The exception raised when loading the file, or :py:obj:`None` if it loaded successfully.
+	error: Optional[BaseException]
+
+	#: The time taken to load the file, in seconds (excluding the time spent waiting to be loaded).
+	duration: float
+
+
+def _load_file(filename: str, metadata_only: bool = False) -> LoadResult:
+	"""
+	Load a single file, catching any exception raised.
+
+	:param filename:
+	:param metadata_only: If :py:obj:`True` only the summary at the start of the file is loaded.
+	"""
+
+	start = time.perf_counter()
+
+	try:
+		suffix = os.path.splitext(filename)[1].lower()
+		if suffix not in _loaders:
+			raise ValueError(f"Unknown file type {suffix!r}")
+
+		loader = _loaders[suffix]
+		result = loader.read_metadata(filename) if metadata_only else loader.from_file(filename)
+		error = None
+	except Exception as e:
+		result, error = None, e
+
+	return LoadResult(filename, result, error, time.perf_counter() - start)
+
+
+def _iter_filenames(files: Union[PathLike, Iterable[PathLike]]) -> Iterator[str]:
+	if not isinstance(files, (str, os.PathLike)):
+		for filename in files:
+			yield os.fspath(filename)
+		return
+
+	files = os.fspath(files)
+	if os.path.isdir(files):
+		for filename in sorted(os.listdir(files)):
+			if os.path.splitext(filename)[1].lower() in _loaders:
+				yield os.path.join(files, filename)
+	elif glob.has_magic(files):
+		yield from sorted(glob.glob(files))
+	else:
+		yield files
+
+
+def load_files(
+		files: Union[PathLike, Iterable[PathLike]],
+		max_workers: Optional[int] = None,
+		max_pending: Optional[int] = None,
+		metadata_only: bool = False,
+		executor: Optional[Executor] = None,
+		) -> Iterator[LoadResult]:
+	"""
+	Load ``gsmd``, ``gsmr`` and ``gsmp`` files in parallel, yielding each as it is loaded.
+
+	The type of each file is determined from its extension.
+	Files are yielded in the order they finish loading, which may differ from the order they were given in.
+
+	Exceptions raised when loading a file are not propagated, but are given in the :attr:`~.LoadResult.error`
+	attribute of its result so the remaining files are still loaded.
+
+	:param files: A directory (all ``gsmd``, ``gsmr`` and ``gsmp`` files in which are loaded),
+		a glob pattern such as ``'projects/*.gsmp'``, a single filename, or an iterable of filenames.
+	:param max_workers: The number of processes to load files in. Defaults to the number of CPUs.
+		Ignored if ``executor`` is given.
+	:param max_pending: The maximum number of files being loaded, or loaded and waiting to be yielded, at once.
+		This limits the memory used when files are loaded faster than the results are consumed.
+		Defaults to twice the number of workers.
+	:param metadata_only: If :py:obj:`True` only the summary of each file is loaded
+		(see :meth:`Datafile.read_metadata() <.Datafile.read_metadata>`,
+		:meth:`Repeat.read_metadata() <.Repeat.read_metadata>` and
+		:meth:`Project.read_metadata() <.Project.read_metadata>`).
+	:param executor: The executor to load the files with.
+		By default a :class:`~concurrent.futures.ProcessPoolExecutor` is created for the duration of loading.
+		The loaded objects must be pickled to return them from another process,
+		so a :class:`~concurrent.futures.ThreadPoolExecutor` may be faster for small files.
+	"""
+
+	if max_pending is None:
+		max_pending = 2 * (max_workers or os.cpu_count() or 1)
+	max_pending = max(max_pending, 1)
+
+	if executor is None:
+		with ProcessPoolExecutor(max_workers) as process_pool:
+			yield from _load_files(_iter_filenames(files), process_pool, max_pending, metadata_only)
+	else:
+		yield from _load_files(_iter_filenames(files), executor, max_pending, metadata_only)
+
+
+def _load_files(
+		filenames: Iterator[str],
+		executor: Executor,
+		max_pending: int,
+		metadata_only: bool,
+		) -> Iterator[LoadResult]:
+	"""
+	Load files with the given executor, with at most ``max_pending`` files being loaded at once.
+
+	:param filenames:
+	:param executor:
+	:param max_pending:
+	:param metadata_only:
+	"""
+
+	pending: Dict["Future[LoadResult]", str] = {}
+
+	def submit_next() -> bool:
+		filename = next(filenames, None)
+		if filename is None:
+			return False
+
+		pending[executor.submit(_load_file, filename, metadata_only)] = filename
+		return True
+
+	try:
+		while len(pending) < max_pending and submit_next():
+			pass
+
+		while pending:
+			done, _ = wait(pending, return_when=FIRST_COMPLETED)
+			for future in done:
+				filename = pending.pop(future)
+				submit_next()
+
+				try:
+					result = future.result()
+				except Exception as e:
+					# e.g. the loaded object couldn't be sent back from the worker process.
+					result = LoadResult(filename, None, e, math.nan)
+
+				yield result
+
+	finally:
+		# If the caller stops iterating early.
+		for future in pending:
+			future.cancel()
@@ -161,6 +161,40 @@ class IntensityMatrixMethod(MethodBase):
 	#: The structure size for Tophat baseline correction.
 	tophat_structure_size: str = String.field(default="1.5m")
 
+	crop_rt_range: Optional[Tuple[float, float]] = attr.field(default=None, converter=convert_rt_range)
+	"""
+	Optional retention time range (in minutes) to which the intensity matrix should be limited to.
+
+	Scans outside of the range are discarded before smoothing and baseline correction,
+	so later steps only process the range of interest.
+	Enough scans either side of the range are kept while filtering that the intensities within the range
+	are the same as if the whole run had been processed.
+
+	.. versionadded:: 0.14.0
+	"""
+
+	single_precision: bool = Boolean.field(default=False)
+	"""
+	Whether to store the intensity matrix as 32-bit rather than 64-bit floats.
+
+	This halves the memory used by the intensity matrix and the size of the exported datafile,
+	and the intensity matrix stays single-precision through smoothing, baseline correction and peak detection.
+	Each intensity is rounded to the nearest 32-bit float, with a relative error of at most ``2 ** -24``.
+
+	.. versionadded:: 0.14.0
+	"""
+
+	sparse: bool = Boolean.field(default=False)
+	"""
+	Whether to store the smoothed and baseline-corrected intensity matrix as a :class:`~.SparseIntensityMatrix`,
+	in memory and in exported datafiles.
+
+	This saves space when many of the intensities are zero, such as for data which has been background subtracted
+	and only baseline-corrected, but Savitzky-Golay smoothing spreads each non-zero intensity over neighbouring scans.
+
+	.. versionadded:: 0.14.0
+	"""
+
 
 @_fix_init_annotations
 @attr.define
@@ -48,6 +48,9 @@ from pyms.Peak.List.Function import sele_peaks_by_rt
 from pyms.Spectrum import MassSpectrum
 from pyms_nist_search import SearchResult
 
+# this package
+from libgunshotmatch.container import decode_array, encode_array, is_array_reference
+
 if TYPE_CHECKING:
 	# this package
 	from libgunshotmatch.project import Project
@@ -66,6 +69,73 @@ __all__ = (
 		)
 
 
+_compact_intensity_dtypes = {"float32": "<f4", "float64": "<f8"}
+
+
+def _compact_intensity_dtype(compact: Union[bool, str]) -> str:
+	if compact is True:
+		return _compact_intensity_dtypes["float32"]
+
+	try:
+		return _compact_intensity_dtypes[compact]  # type: ignore[index]
+	except (KeyError, TypeError):
+		raise ValueError(f"Unsupported precision for the compact encoding: {compact!r}") from None
+
+
+def _mass_spectrum_to_dict(
+		mass_spectrum: MassSpectrum,
+		numpy_arrays: bool = False,
+		compact: Union[bool, str] = False,
+		) -> Dict[str, Any]:
+	if compact:
+		intensity_array = numpy.asarray(mass_spectrum.intensity_list, dtype=_compact_intensity_dtype(compact))
+		mass_array = numpy.asarray(mass_spectrum.mass_list, dtype=numpy.float64)
+
+		# Nominal masses fit in 16 bits; anything else is kept at full precision.
+		with numpy.errstate(invalid="ignore"):
+			nominal_masses = mass_array.astype("<u2")
+		if numpy.array_equal(nominal_masses, mass_array):
+			mass_array = nominal_masses
+
+		if numpy_arrays:
+			return {"intensity_list": intensity_array, "mass_list": mass_array}
+		else:
+			return {"intensity_list": encode_array(intensity_array), "mass_list": encode_array(mass_array)}
+
+	elif numpy_arrays:
+		return {
+				"intensity_list": numpy.asarray(mass_spectrum.intensity_list),
+				"mass_list": numpy.asarray(mass_spectrum.mass_list),
+				}
+	else:
+		return {
+				"intensity_list": mass_spectrum.intensity_list,
+				"mass_list": mass_spectrum.mass_list,
+				}
+
+
+def _mass_spectrum_from_dict(d: Union[Mapping[str, Any], MassSpectrum]) -> MassSpectrum:
+	# Already constructed, e.g. from a project's spectrum table.
+	if isinstance(d, MassSpectrum):
+		return d
+
+	mass_list, intensity_list = d["mass_list"], d["intensity_list"]
+
+	# Compact encoding (see PeakList.to_list).
+	if is_array_reference(mass_list):
+		mass_list = decode_array(mass_list)
+	if is_array_reference(intensity_list):
+		intensity_list = decode_array(intensity_list)
+
+	# Arrays loaded from a binary container or from the compact encoding.
+	if isinstance(mass_list, numpy.ndarray):
+		mass_list = mass_list.tolist()
+	if isinstance(intensity_list, numpy.ndarray):
+		intensity_list = intensity_list.tolist()
+
+	return MassSpectrum(mass_list=mass_list, intensity_list=intensity_list)
+
+
 class QualifiedPeak(Peak):
 	"""
 	A Peak that has been identified using NIST MS Search and contains a list of possible identities.
@@ -169,11 +239,21 @@ class QualifiedPeak(Peak):
 	def __str__(self) -> str:
 		return self.__repr__()
 
-	def to_dict(self) -> Dict[str, Any]:
+	def to_dict(self, numpy_arrays: bool = False, compact: Union[bool, str] = False) -> Dict[str, Any]:
 		"""
 		Returns a dictionary representation of this peak.
 
 		All keys are native, JSON-serializable, Python objects.
+
+		:param numpy_arrays: If :py:obj:`True` the mass spectrum is given as
+			:class:`numpy.ndarray` objects rather than lists, for writing to a binary container.
+		:param compact: Whether to use the compact encoding for the mass spectrum.
+			See :meth:`PeakList.to_list() <.PeakList.to_list>` for details.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``numpy_arrays`` argument.
+			* Added the ``compact`` argument.
 		"""
 
 		try:
@@ -187,10 +267,7 @@ class QualifiedPeak(Peak):
 				"bounds": self.bounds,
 				"ion_areas": ion_areas,
 				"is_outlier": self.is_outlier,
-				"mass_spectrum": {
-						"intensity_list": self.mass_spectrum.intensity_list,
-						"mass_list": self.mass_spectrum.mass_list,
-						},
+				"mass_spectrum": _mass_spectrum_to_dict(self.mass_spectrum, numpy_arrays, compact),
 				"rt": self.rt,
 				"hits": [hit.to_dict() for hit in self.hits],
 				"peak_number": self.peak_number,
@@ -207,7 +284,7 @@ class QualifiedPeak(Peak):
 		hits = [SearchResult.from_dict(hit) for hit in d["hits"]]
 		peak_obj = QualifiedPeak(
 				d["rt"],
-				MassSpectrum(**d["mass_spectrum"]),
+				_mass_spectrum_from_dict(d["mass_spectrum"]),
 				outlier=d["is_outlier"],
 				hits=hits,
 				peak_number=d["peak_number"]
@@ -241,9 +318,23 @@ class PeakList(List[Peak]):
 	def __str__(self) -> str:
 		return self.__repr__()
 
-	def to_list(self) -> List[Dict[str, Any]]:
+	def to_list(self, numpy_arrays: bool = False, compact: Union[bool, str] = False) -> List[Dict[str, Any]]:
 		"""
 		Return a list of pure-Python dictionaries representing the peaks and their mass spectra.
+
+		:param numpy_arrays: If :py:obj:`True` the mass spectra are given as
+			:class:`numpy.ndarray` objects rather than lists, for writing to a binary container.
+		:param compact: If :py:obj:`True` the mass spectra are given in a compact encoding.
+			The masses are stored as 16-bit unsigned integers (where they are all whole numbers from 0 to 65535)
+			and the intensities as 32-bit floats, with each array encoded as a base64 string
+			(or given as a :class:`numpy.ndarray` of that type if ``numpy_arrays`` is :py:obj:`True`).
+			Each intensity is rounded to the nearest 32-bit float, with a relative error of at most ``2 ** -24``.
+			Pass ``'float64'`` to keep the intensities at full precision.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``numpy_arrays`` argument.
+			* Added the ``compact`` argument.
 		"""
 
 		peaks_as_pure_list: List[Dict[str, Any]] = []
@@ -263,10 +354,7 @@ class PeakList(List[Peak]):
 					"bounds": peak.bounds,
 					"ion_areas": ion_areas,
 					"is_outlier": peak.is_outlier,
-					"mass_spectrum": {
-							"intensity_list": peak.mass_spectrum.intensity_list,
-							"mass_list": peak.mass_spectrum.mass_list,
-							},
+					"mass_spectrum": _mass_spectrum_to_dict(peak.mass_spectrum, numpy_arrays, compact),
 					"rt": peak.rt,
 					})
 
@@ -291,12 +379,22 @@ class QualifiedPeakList(List[QualifiedPeak]):
 	def __str__(self) -> str:
 		return self.__repr__()
 
-	def to_list(self) -> List[Dict[str, Any]]:
+	def to_list(self, numpy_arrays: bool = False, compact: Union[bool, str] = False) -> List[Dict[str, Any]]:
 		"""
 		Return a list of pure-Python dictionaries representing the peaks and their mass spectra.
+
+		:param numpy_arrays: If :py:obj:`True` the mass spectra are given as
+			:class:`numpy.ndarray` objects rather than lists, for writing to a binary container.
+		:param compact: Whether to use the compact encoding for the mass spectra.
+			See :meth:`PeakList.to_list() <.PeakList.to_list>` for details.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``numpy_arrays`` argument.
+			* Added the ``compact`` argument.
 		"""
 
-		return [qp.to_dict() for qp in self]
+		return [qp.to_dict(numpy_arrays=numpy_arrays, compact=compact) for qp in self]
 
 
 def filter_peaks(
@@ -625,7 +723,7 @@ def peak_from_dict(d: Dict[str, Any]) -> Peak:
 	.. latex:clearpage::
 	"""
 
-	peak_obj = Peak(d["rt"], MassSpectrum(**d["mass_spectrum"]), outlier=d["is_outlier"])
+	peak_obj = Peak(d["rt"], _mass_spectrum_from_dict(d["mass_spectrum"]), outlier=d["is_outlier"])
 	peak_obj.bounds = d["bounds"]
 	peak_obj._UID = d["UID"]
 	peak_obj.area = d["area"]
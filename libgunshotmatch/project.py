@@ -27,8 +27,30 @@ Represents a collection of repeat analyses.
 #
 
 # stdlib
+import functools
 import os
-from typing import Any, Dict, List, Mapping, MutableSequence, Optional, Type
+import time
+import zipfile
+from collections import UserList
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import (
+		Any,
+		Callable,
+		Dict,
+		Iterable,
+		Iterator,
+		List,
+		Mapping,
+		MutableMapping,
+		MutableSequence,
+		Optional,
+		Sequence,
+		Tuple,
+		Type,
+		TypeVar,
+		Union
+		)
 
 # 3rd party
 import attr
@@ -37,9 +59,10 @@ import pyms_nist_search
 from domdf_python_tools.typing import PathLike
 from pyms.DPA.Alignment import Alignment
 from pyms.Peak.Class import Peak
+from pyms.Spectrum import MassSpectrum
 
 # this package
-from libgunshotmatch import gzip_util
+from libgunshotmatch import container, gzip_util
 from libgunshotmatch.consolidate import (
 		ConsolidatedPeak,
 		ConsolidatedPeakFilter,
@@ -47,11 +70,26 @@ from libgunshotmatch.consolidate import (
 		pairwise_ms_comparisons
 		)
 from libgunshotmatch.datafile import Repeat
-from libgunshotmatch.peak import PeakList, QualifiedPeak, peak_from_dict
+from libgunshotmatch.peak import (
+		PeakList,
+		QualifiedPeak,
+		_mass_spectrum_from_dict,
+		_mass_spectrum_to_dict,
+		peak_from_dict
+		)
 from libgunshotmatch.utils import create_alignment
 
 __all__ = ("Project", "consolidate")
 
+# The sections of binary container files.
+_CONTAINER_SECTIONS = ("alignment", "consolidated_peaks", "spectra")
+
+# The version of the document written by Project.export.
+# Version 1 documents (without a version key) give each mass spectrum inline;
+# version 2 documents give them once in the spectrum table, and refer to them by key.
+_FORMAT_VERSION = 2
+_CONTAINER_EXPAND = ("datafile_data", )
+
 
 @attr.define
 class Project:
@@ -73,94 +111,616 @@ class Project:
 	#: List of peaks after :meth:`~.consolidate` is performed. :py:obj:`None` initially.
 	consolidated_peaks: Optional[List[ConsolidatedPeak]] = attr.field(default=None)
 
-	def to_dict(self) -> Dict[str, Any]:
+	#: The time taken (in seconds) to load each section of the project when it was read from a file or dictionary.
+	#: Keys are ``'read'``, ``'alignment'``, ``'consolidated_peaks'`` and ``'datafile_data/<repeat name>'``.
+	#: For projects loaded lazily sections are added as they are accessed.
+	#:
+	#: .. versionadded:: 0.14.0
+	load_timings: Dict[str, float] = attr.field(factory=dict, init=False, eq=False, repr=False)
+
+	# The sections of the project as last read from or written to a binary container, for incremental exports.
+	_saved_state: Optional["_SavedState"] = attr.field(default=None, init=False, eq=False, repr=False)
+
+	def to_dict(self, numpy_arrays: bool = False, compact: Union[bool, str] = False) -> Dict[str, Any]:
 		"""
 		Returns a dictionary representation of this :class:`~.Project`.
 
 		All keys are native, JSON-serializable, Python objects.
+
+		:param numpy_arrays: If :py:obj:`True` intensity matrices and peak mass spectra
+			are given as :class:`numpy.ndarray` objects rather than lists, for writing to a binary container.
+		:param compact: Whether to use the compact encoding for the peak mass spectra.
+			See :meth:`PeakList.to_list() <libgunshotmatch.peak.PeakList.to_list>` for details.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``numpy_arrays`` argument.
+			* Added the ``compact`` argument.
 		"""
 
-		alignment_as_dict = {
-				"peaks": [PeakList(x).to_list() for x in self.alignment.peakpos],
+		return self._to_dict(numpy_arrays=numpy_arrays, compact=compact)
+
+	def _consolidated_peaks_to_list(
+			self,
+			spectra: Optional["_SpectrumTable"] = None,
+			compact: Union[bool, str] = False,
+			) -> Optional[List[Dict[str, Any]]]:
+		if self.consolidated_peaks is None:
+			return None
+
+		# The spectra are replaced by keys into the table if one is given.
+		consolidated_peaks = [
+				cp.to_dict(compact=compact if spectra is None else False) for cp in self.consolidated_peaks
+				]
+
+		if spectra is not None:
+			for cp, cp_as_dict in zip(self.consolidated_peaks, consolidated_peaks):
+				cp_as_dict["ms_list"] = [None if ms is None else spectra.add(ms) for ms in cp.ms_list]
+
+		return consolidated_peaks
+
+	def _alignment_to_dict(
+			self,
+			numpy_arrays: bool = False,
+			lazy: bool = False,
+			spectra: Optional["_SpectrumTable"] = None,
+			compact: Union[bool, str] = False,
+			) -> Dict[str, Any]:
+		alignment_peaks: List[Callable[[], Any]] = [
+				functools.partial(_peaks_to_list, PeakList(x), numpy_arrays, spectra, compact)
+				for x in self.alignment.peakpos
+				]
+
+		return {
+				"peaks": alignment_peaks if lazy else [to_list() for to_list in alignment_peaks],
 				"expr_code": self.alignment.expr_code,
 				"similarity": self.alignment.similarity,
 				}
 
-		if self.consolidated_peaks is None:
-			consolidated_peaks_as_list = None
-		else:
-			consolidated_peaks_as_list = [cp.to_dict() for cp in self.consolidated_peaks]
+	def _to_dict(
+			self,
+			numpy_arrays: bool = False,
+			lazy: bool = False,
+			deduplicate_spectra: bool = False,
+			spectra: Optional["_SpectrumTable"] = None,
+			compact: Union[bool, str] = False,
+			) -> Dict[str, Any]:
+		"""
+		Returns a dictionary representation of this :class:`~.Project`.
 
-		datafile_data_as_dict = {k: v.to_dict() for k, v in self.datafile_data.items()}
+		:param numpy_arrays: If :py:obj:`True` arrays are given as :class:`numpy.ndarray` objects rather than lists.
+		:param lazy: If :py:obj:`True` the peaks for each experiment in the alignment, the repeats' large sections,
+			and the consolidated peaks are given as callables returning their dictionary representations,
+			to be evaluated by :func:`~.write_gzip_json` as it is written.
+		:param deduplicate_spectra: If :py:obj:`True` each distinct mass spectrum is given once, in a table
+			under the ``'spectra'`` key keyed by peak UID, and peaks and consolidated peaks refer to spectra by key.
+		:param spectra: The table to add the mass spectra to if ``deduplicate_spectra`` is :py:obj:`True`.
+			By default a new table is created.
+		:param compact: Whether to use the compact encoding for the mass spectra.
+		"""
 
-		return {
-				"name": self.name,
-				"alignment": alignment_as_dict,
-				"datafile_data": datafile_data_as_dict,  # "datafile_data": list(self.datafile_data.keys()),
-				"consolidated_peaks": consolidated_peaks_as_list,
+		if deduplicate_spectra and spectra is None:
+			spectra = _SpectrumTable()
+		elif not deduplicate_spectra:
+			spectra = None
+
+		# In the order they are written, so spectra are added to the table in the same order when writing lazily.
+		alignment_as_dict = self._alignment_to_dict(numpy_arrays, lazy, spectra, compact)
+
+		datafile_data_as_dict = {
+				k: _repeat_to_dict(v, numpy_arrays, lazy, spectra, compact)
+				for k, v in self.datafile_data.items()
 				}
 
-	def export(self, output_dir: PathLike) -> str:
+		consolidated_peaks = functools.partial(self._consolidated_peaks_to_list, spectra, compact)
+
+		as_dict: Dict[str, Any] = {"name": self.name}
+
+		if spectra is not None:
+			as_dict["version"] = _FORMAT_VERSION
+
+		as_dict["alignment"] = alignment_as_dict
+		as_dict["datafile_data"] = datafile_data_as_dict  # "datafile_data": list(self.datafile_data.keys()),
+		as_dict["consolidated_peaks"] = consolidated_peaks if lazy else consolidated_peaks()
+
+		if spectra is not None:
+			# Last, so the table is complete by the time it is evaluated when writing lazily.
+			spectra_as_dict = functools.partial(spectra.to_dict, numpy_arrays, compact)
+			as_dict["spectra"] = spectra_as_dict if lazy else spectra_as_dict()
+
+		return as_dict
+
+	def export(
+			self,
+			output_dir: PathLike,
+			binary: bool = False,
+			executor: Optional[Executor] = None,
+			codec: str = "gzip",
+			incremental: bool = False,
+			compact: Union[bool, str] = False,
+			compression: int = zipfile.ZIP_DEFLATED,
+			) -> str:
 		"""
 		Export as a ``gsmp`` file.
 
+		:param output_dir:
+		:param binary: If :py:obj:`True` the file is written as a binary container
+			(see :mod:`libgunshotmatch.container`) rather than gzipped JSON.
+		:param executor: Optional executor to compress the gzipped JSON in parallel.
+			See :func:`~.write_gzip_json` for details. Ignored if ``binary`` is :py:obj:`True`.
+		:param codec: The compression codec for the JSON, e.g. ``'gzip'`` or ``'lzma:9'``.
+			See :func:`~.write_gzip_json` for details. Ignored if ``binary`` is :py:obj:`True`.
+		:param incremental: If :py:obj:`True`, and the output file is the binary container this project was
+			read from or last exported to, sections which haven't changed are copied from the file
+			rather than being rewritten, and the file is only written if anything has changed
+			(see :func:`~.update_container`). Otherwise the whole file is encoded and written.
+			Ignored if ``binary`` is :py:obj:`False`.
+		:param compact: Whether to use the compact encoding for the mass spectra.
+			See :meth:`PeakList.to_list() <libgunshotmatch.peak.PeakList.to_list>` for details.
+		:param compression: The compression method for the members of the binary container.
+			Use :py:data:`zipfile.ZIP_STORED` for files which will be loaded with ``mmap=True``,
+			so the arrays are mapped in place rather than first being extracted.
+			Ignored if ``binary`` is :py:obj:`False`.
+
 		:returns: The output filename.
+
+		For incremental exports of projects read from a binary container the alignment, consolidated peaks and
+		each repeat are only encoded if they have been accessed (or replaced) since the project was read.
+		All other sections are encoded and compared with the file by their content,
+		so changes made in place are always written.
+		The members of unchanged sections are copied from the file as they are stored, without being decompressed.
+
+		.. versionchanged:: 0.14.0
+
+			* Added the ``binary``, ``executor``, ``codec``, ``incremental``, ``compact`` and ``compression`` arguments.
+			* Each distinct mass spectrum is written once, in a table keyed by peak UID,
+			  and peaks refer to the spectra in the table.
+			* In binary containers the alignment, consolidated peaks, spectrum table and each repeat
+			  are stored as separate sections, which can be loaded individually
+			  (see :meth:`~.Project.load_repeat`).
+			* A summary of the project is written at the start of the file (see :meth:`~.Project.read_metadata`).
 		"""
 
 		export_filename = os.path.join(output_dir, f"{self.name}.gsmp")
-		gzip_util.write_gzip_json(export_filename, self.to_dict(), indent=None)
+		if binary:
+			if incremental and self._export_changes(export_filename, compact, compression):
+				return export_filename
+
+			spectra = _SpectrumTable()
+			metadata = self._get_metadata()
+			container.write_container(
+					export_filename,
+					self._to_dict(numpy_arrays=True, deduplicate_spectra=True, spectra=spectra, compact=compact),
+					compression=compression,
+					sections=_CONTAINER_SECTIONS,
+					expand=_CONTAINER_EXPAND,
+					metadata=metadata,
+					)
+			self._saved_state = _SavedState(self, spectra, metadata)
+			self._saved_state.set_file(export_filename)
+		else:
+			# Sections of lazily loaded projects must be read before the file they're read from may be overwritten.
+			self._load_sections()
+			gzip_util.write_gzip_json(
+					export_filename,
+					{
+							"metadata": self._get_metadata(),
+							**self._to_dict(lazy=True, deduplicate_spectra=True, compact=compact),
+							},
+					indent=None,
+					executor=executor,
+					codec=codec,
+					)
 		return export_filename
 
+	def _export_changes(
+			self,
+			export_filename: str,
+			compact: Union[bool, str] = False,
+			compression: int = zipfile.ZIP_DEFLATED,
+			) -> bool:
+		"""
+		Update the binary container the project was read from or last exported to,
+		encoding only the sections which may have changed since.
+
+		:param export_filename:
+		:param compact: Whether to use the compact encoding for the mass spectra.
+		:param compression: The compression method for the members of the file.
+
+		:returns: Whether the file is up to date. If :py:obj:`False` it must be written in full instead.
+		"""
+
+		state = self._saved_state
+		if state is None or not state.is_current(export_filename):
+			return False
+
+		spectra = state.spectrum_table()
+		repeats_metadata = state.metadata.get("repeats", {})
+
+		alignment_as_dict: Any = container.UNCHANGED
+		n_aligned_peaks = state.metadata.get("n_aligned_peaks")
+		if not state.is_untouched(self.alignment) or n_aligned_peaks is None:
+			alignment_as_dict = self._alignment_to_dict(numpy_arrays=True, spectra=spectra, compact=compact)
+			n_aligned_peaks = len(alignment_as_dict["peaks"][0]) if alignment_as_dict["peaks"] else 0
+
+		datafile_data_as_dict: Dict[str, Any] = {}
+		repeats: Dict[str, Dict[str, Any]] = {}
+		for name in self.datafile_data:
+			if state.is_untouched(self.datafile_data, name) and name in repeats_metadata:
+				datafile_data_as_dict[name] = container.UNCHANGED
+				repeats[name] = repeats_metadata[name]
+			else:
+				repeat = self.datafile_data[name]
+				datafile_data_as_dict[name] = _repeat_to_dict(repeat, True, False, spectra, compact)
+				repeats[name] = repeat._get_metadata()
+
+		consolidated_peaks: Any = container.UNCHANGED
+		n_consolidated_peaks = state.metadata.get("n_consolidated_peaks")
+		if not state.is_untouched(self.consolidated_peaks) or "n_consolidated_peaks" not in state.metadata:
+			consolidated_peaks = self._consolidated_peaks_to_list(spectra, compact)
+			n_consolidated_peaks = None if consolidated_peaks is None else len(consolidated_peaks)
+
+		# Last, so any new spectra from the other sections are included.
+		spectra_as_dict = spectra.to_dict(numpy_arrays=True, compact=compact)
+
+		metadata = {
+				"name": self.name,
+				"n_aligned_peaks": n_aligned_peaks,
+				"n_consolidated_peaks": n_consolidated_peaks,
+				"repeats": repeats,
+				}
+
+		# The table no longer matches the file if the update fails part way through.
+		self._saved_state = None
+
+		try:
+			container.update_container(
+					export_filename,
+					{
+							"name": self.name,
+							"version": _FORMAT_VERSION,
+							"alignment": alignment_as_dict,
+							"datafile_data": datafile_data_as_dict,
+							"consolidated_peaks": consolidated_peaks,
+							"spectra": spectra_as_dict,
+							},
+					sections=_CONTAINER_SECTIONS,
+					expand=_CONTAINER_EXPAND,
+					metadata=metadata,
+					compression=compression,
+					)
+		except KeyError:
+			# The file was written without separate sections.
+			return False
+
+		self._saved_state = _SavedState(self, spectra, metadata)
+		self._saved_state.set_file(export_filename)
+		return True
+
 	@classmethod
-	def from_file(cls: Type["Project"], filename: PathLike) -> "Project":
+	def from_file(
+			cls: Type["Project"],
+			filename: PathLike,
+			mmap: bool = False,
+			lazy: bool = False,
+			executor: Optional[Executor] = None,
+			) -> "Project":
 		"""
 		Parse a ``gsmp`` file.
 
 		:param filename: The input filename.
+		:param mmap: If :py:obj:`True`, and the file is a binary container, the repeats' intensity matrices are
+			backed by read-only :class:`numpy.memmap` objects which are only read from disk when accessed.
+		:param lazy: If :py:obj:`True` the :attr:`~.alignment`, :attr:`~.datafile_data` and :attr:`~.consolidated_peaks`
+			are proxies which are only read from the file and constructed when first accessed.
+		:param executor: Optional executor (e.g. a :class:`~concurrent.futures.ThreadPoolExecutor`)
+			to decompress and decode the sections of binary container files in parallel.
+
+		When loading lazily only the summary of the project is read up front.
+		Each section of a binary container is then read individually, while gzipped JSON files
+		must be decompressed again for each section (but the other sections are skipped without being decoded).
+		:exc:`ValueError` is raised when a section is accessed if it has since been changed in the file.
+		Files written before libgunshotmatch 0.14.0 are read in full,
+		and only the construction of the sections is deferred.
+
+		.. versionchanged:: 0.14.0
+
+			* Binary container files are detected and loaded automatically.
+			* Added the ``mmap``, ``lazy`` and ``executor`` arguments.
+		"""
+
+		start_time = time.perf_counter()
+		lazily_loaded = cls._from_file_lazily(filename, mmap) if lazy else None
+
+		if lazily_loaded is None:
+			as_dict: Dict[str, Any] = container.read_document(  # type: ignore[assignment]
+				filename,
+				mmap=mmap,
+				executor=executor,
+				)
+			read_time = time.perf_counter() - start_time
+			project, spectra = cls._from_dict(as_dict, lazy=lazy)
+		else:
+			read_time = time.perf_counter() - start_time
+			project, spectra = lazily_loaded
+
+		project.load_timings["read"] = read_time
+
+		if container.is_container(filename):
+			if not lazy:
+				project._track_sections()
+			project._saved_state = _SavedState(project, spectra, container.read_metadata(filename))
+			project._saved_state.set_file(filename)
+
+		return project
+
+	@classmethod
+	def _from_file_lazily(
+			cls: Type["Project"],
+			filename: PathLike,
+			mmap: bool = False,
+			) -> Optional[Tuple["Project", "_SpectrumCache"]]:
+		"""
+		Construct a :class:`~.Project` from a file with proxies which read each section when first accessed,
+		and return it along with the mass spectra from the spectrum table.
+
+		:param filename:
+		:param mmap:
+
+		:returns: :py:obj:`None` if the file has no summary, in which case it must be read in full.
+		"""
+
+		metadata = container.read_metadata(filename)
+		if metadata is None:
+			return None
+
+		source = _ProjectFile(filename, mmap)
+		root: Dict[str, Any]
+
+		if container.is_container(filename):
+			root = source.read(("root", ))
+			if container.get_section_name(root["alignment"]) is None:
+				# Written without separate sections.
+				return cls._from_dict(root, lazy=True)
+		else:
+			members = gzip_util.iter_gzip_json(filename, select=[("name", ), ("version", )])
+			root = {path[0]: value for path, value in members}  # type: ignore[misc]
+
+		load_timings: Dict[str, float] = {}
+
+		if _format_version(root) >= 2:
+			spectra = _SpectrumCache(load=functools.partial(source.read, ("spectra", )))
+		else:
+			spectra = _SpectrumCache({})
+
+		load_alignment = functools.partial(source.load, ("alignment", ), _alignment_from_dict, spectra)
+		alignment = _LazyAlignment(load_alignment, load_timings)
+
+		datafile_data = _LazyRepeats(
+				{
+						name: functools.partial(source.load, ("datafile_data", name), _repeat_from_dict, spectra)
+						for name in metadata["repeats"]
+						},
+				load_timings,
+				)
+
+		consolidated_peaks = None
+		if metadata["n_consolidated_peaks"] is not None:
+			load_consolidated_peaks = functools.partial(
+					source.load,
+					("consolidated_peaks", ),
+					_consolidated_peaks_from_list,
+					spectra,
+					)
+			consolidated_peaks = _LazyConsolidatedPeaks(load=load_consolidated_peaks, load_timings=load_timings)
+
+		project = cls(
+				name=root["name"],
+				alignment=alignment,
+				consolidated_peaks=consolidated_peaks,  # type: ignore[arg-type]
+				datafile_data=datafile_data,  # type: ignore[arg-type]
+				)
+		project.load_timings = load_timings
+
+		return project, spectra
+
+	def _load_sections(self) -> None:
+		"""
+		Load any sections of a lazily loaded project which haven't been accessed yet.
+		"""
+
+		if isinstance(self.alignment, _LazyAlignment):
+			self.alignment._lazy_resolve()
+		if isinstance(self.datafile_data, _LazyRepeats):
+			self.datafile_data._lazy_resolve()
+		if isinstance(self.consolidated_peaks, _LazyConsolidatedPeaks):
+			self.consolidated_peaks._lazy_resolve()
+
+	def _track_sections(self) -> None:
+		"""
+		Wrap the (already loaded) alignment, repeats and consolidated peaks in the proxies used for lazy loading,
+		so incremental exports can tell which have been accessed since the project was read.
+		"""
+
+		alignment, datafile_data, consolidated_peaks = self.alignment, self.datafile_data, self.consolidated_peaks
+
+		# The loaders are picklable, e.g. for returning projects from worker processes.
+		self.alignment = _LazyAlignment(functools.partial(_already_loaded, alignment))
+		self.datafile_data = _LazyRepeats(  # type: ignore[assignment]
+			{name: functools.partial(_already_loaded, repeat) for name, repeat in datafile_data.items()},
+			)
+		if consolidated_peaks is not None:
+			self.consolidated_peaks = _LazyConsolidatedPeaks(  # type: ignore[assignment]
+				load=functools.partial(_already_loaded, consolidated_peaks),
+				)
+
+	def _get_metadata(self) -> Dict[str, Any]:
+		"""
+		Returns a summary of this :class:`~.Project`, for writing at the start of exported files.
+		"""
+
+		peakpos = self.alignment.peakpos
+
+		return {
+				"name": self.name,
+				"n_aligned_peaks": len(peakpos[0]) if peakpos else 0,
+				"n_consolidated_peaks": None if self.consolidated_peaks is None else len(self.consolidated_peaks),
+				"repeats": {name: repeat._get_metadata() for name, repeat in self.datafile_data.items()},
+				}
+
+	@classmethod
+	def read_metadata(cls: Type["Project"], filename: PathLike) -> Dict[str, Any]:
+		"""
+		Read a summary of a ``gsmp`` file, without loading the alignment, repeats or consolidated peaks.
+
+		The summary is a dictionary with the following keys:
+
+		* ``'name'`` -- the name of the project.
+		* ``'n_aligned_peaks'`` -- the number of peaks in the alignment.
+		* ``'n_consolidated_peaks'`` -- the number of consolidated peaks
+		  (:py:obj:`None` if :meth:`~.Project.consolidate` has not been performed).
+		* ``'repeats'`` -- a mapping of repeat names to summaries of each repeat (see :meth:`~.Repeat.read_metadata`).
+
+		Files written before libgunshotmatch 0.14.0 do not contain a summary,
+		in which case the whole file is loaded to create it.
+
+		:param filename: The input filename.
+
+		.. versionadded:: 0.14.0
+		"""
+
+		metadata = container.read_metadata(filename)
+		if metadata is None:
+			metadata = cls.from_file(filename, mmap=True)._get_metadata()
+		return metadata
+
+	@staticmethod
+	def load_repeat(filename: PathLike, name: str, mmap: bool = False) -> Repeat:
+		"""
+		Load a single repeat from a ``gsmp`` file, without constructing the rest of the project.
+
+		For binary container files only the repeat's section (and the spectrum table) is read.
+		Gzipped JSON files must be decompressed in full, but only the repeat (and the spectrum table) is decoded.
+
+		:param filename: The input filename.
+		:param name: The name of the repeat.
+		:param mmap: If :py:obj:`True`, and the file is a binary container, the repeat's intensity matrix is
+			backed by a read-only :class:`numpy.memmap`.
+
+		:raises KeyError: If the project has no such repeat.
+
+		.. versionadded:: 0.14.0
 		"""
 
-		as_dict: Dict[str, Any] = gzip_util.read_gzip_json(filename)  # type: ignore[assignment]
-		return cls.from_dict(as_dict)
+		section, spectra = _read_project_section(filename, ("datafile_data", name), mmap)
+		return _repeat_from_dict(section, spectra)
+
+	@staticmethod
+	def load_alignment(filename: PathLike) -> Alignment:
+		"""
+		Load the peak alignment from a ``gsmp`` file, without constructing the rest of the project.
+
+		:param filename: The input filename.
+
+		.. seealso:: :meth:`~.Project.load_repeat`
+
+		.. versionadded:: 0.14.0
+		"""
+
+		section, spectra = _read_project_section(filename, ("alignment", ))
+		return _alignment_from_dict(section, spectra)
+
+	@staticmethod
+	def load_consolidated_peaks(filename: PathLike) -> Optional[List[ConsolidatedPeak]]:
+		"""
+		Load the consolidated peaks from a ``gsmp`` file, without constructing the rest of the project.
+
+		:param filename: The input filename.
+
+		:returns: The consolidated peaks, or :py:obj:`None` if the project has not been consolidated.
+
+		.. seealso:: :meth:`~.Project.load_repeat`
+
+		.. versionadded:: 0.14.0
+		"""
+
+		section, spectra = _read_project_section(filename, ("consolidated_peaks", ))
+		return _consolidated_peaks_from_list(section, spectra)
 
 	@classmethod
-	def from_dict(cls: Type["Project"], d: Mapping[str, Any]) -> "Project":
+	def from_dict(cls: Type["Project"], d: Mapping[str, Any], lazy: bool = False) -> "Project":
 		"""
 		Construct a :class:`~.Project` from a dictionary.
 
 		:param d:
+		:param lazy: If :py:obj:`True` the :attr:`~.alignment`, :attr:`~.datafile_data` and :attr:`~.consolidated_peaks`
+			are proxies which are only constructed from the dictionary when first accessed.
+
+		.. versionchanged:: 0.14.0  Added the ``lazy`` argument.
+		"""
+
+		return cls._from_dict(d, lazy=lazy)[0]
+
+	@classmethod
+	def _from_dict(
+			cls: Type["Project"],
+			d: Mapping[str, Any],
+			lazy: bool = False,
+			) -> Tuple["Project", "_SpectrumCache"]:
 		"""
+		Construct a :class:`~.Project` from a dictionary,
+		and return it along with the mass spectra from the spectrum table.
 
-		alignment_as_dict = d["alignment"]
-		alignment_peaks: List[MutableSequence[Optional[Peak]]] = []
-		for row in alignment_as_dict["peaks"]:
-			alignment_peaks.append([])
-			for peak in row:
-				# print(peak)
-				if peak is None:
-					alignment_peaks[-1].append(None)
-				else:
-					alignment_peaks[-1].append(peak_from_dict(peak))
-
-		alignment = create_alignment(
-				alignment_peaks,
-				alignment_as_dict["expr_code"],
-				alignment_as_dict["similarity"],
+		:param d:
+		:param lazy:
+		"""
+
+		load_timings: Dict[str, float] = {}
+
+		# Mass spectra shared between peaks, in files written with a spectrum table.
+		spectra = _SpectrumCache(d.get("spectra", {}) if _format_version(d) >= 2 else {})
+
+		alignment: Alignment
+		consolidated_peaks: Optional[List[ConsolidatedPeak]]
+		datafile_data: Dict[str, Repeat]
+
+		if lazy:
+			load_alignment = functools.partial(_alignment_from_dict, d["alignment"], spectra)
+			alignment = _LazyAlignment(load_alignment, load_timings)
+			datafile_data = _LazyRepeats(  # type: ignore[assignment]
+				{k: functools.partial(_repeat_from_dict, v, spectra) for k, v in d["datafile_data"].items()},
+				load_timings,
 				)
 
-		consolidated_peaks_as_list = d["consolidated_peaks"]
-		if consolidated_peaks_as_list is None:
-			consolidated_peaks = None
+			if d["consolidated_peaks"] is None:
+				consolidated_peaks = None
+			else:
+				consolidated_peaks = _LazyConsolidatedPeaks(  # type: ignore[assignment]
+					load=functools.partial(_consolidated_peaks_from_list, d["consolidated_peaks"], spectra),
+					load_timings=load_timings,
+					)
+
 		else:
-			consolidated_peaks = [ConsolidatedPeak.from_dict(cp) for cp in consolidated_peaks_as_list]
+			with _record_timing(load_timings, "alignment"):
+				alignment = _alignment_from_dict(d["alignment"], spectra)
 
-		datafile_data = {k: Repeat.from_dict(v) for k, v in d["datafile_data"].items()}
+			with _record_timing(load_timings, "consolidated_peaks"):
+				consolidated_peaks = _consolidated_peaks_from_list(d["consolidated_peaks"], spectra)
 
-		return cls(
+			datafile_data = {}
+			for k, v in d["datafile_data"].items():
+				with _record_timing(load_timings, f"datafile_data/{k}"):
+					datafile_data[k] = _repeat_from_dict(v, spectra)
+
+		project = cls(
 				name=d["name"],
 				alignment=alignment,
 				consolidated_peaks=consolidated_peaks,
 				datafile_data=datafile_data,
 				)
+		project.load_timings = load_timings
+
+		return project, spectra
 
 	def consolidate(
 			self,
@@ -189,6 +749,625 @@ class Project:
 		# chart_data = make_chart_data(self)
 
 
+@contextmanager
+def _record_timing(load_timings: Optional[Dict[str, float]], key: str) -> Iterator[None]:
+	"""
+	Context manager to record the time taken to load a section of a project.
+
+	:param load_timings: The mapping to record the time in. If :py:obj:`None` the time isn't recorded.
+	:param key:
+	"""
+
+	start_time = time.perf_counter()
+	try:
+		yield
+	finally:
+		if load_timings is not None:
+			load_timings[key] = time.perf_counter() - start_time
+
+
+_T = TypeVar("_T")
+
+
+class _ProjectFile:
+	"""
+	A ``gsmp`` file a project is being loaded from lazily, whose sections are read when first accessed.
+
+	:param filename:
+	:param mmap: Whether to memory-map arrays in binary container files.
+	"""
+
+	def __init__(self, filename: PathLike, mmap: bool = False):
+		self.filename = os.path.abspath(filename)
+		self.mmap = mmap
+
+		# To check the sections haven't changed by the time they're read.
+		self._hashes: Optional[Dict[str, Optional[str]]] = None
+		self._signature: Optional[Tuple[int, int]] = None
+		if container.is_container(filename):
+			self._hashes = container.read_section_hashes(filename)
+		else:
+			self._signature = _file_signature(filename)
+
+	def read(self, key_path: Tuple[str, ...]) -> Any:
+		"""
+		Read a section of the project.
+
+		:param key_path: The path to the section within the document, e.g. ``('datafile_data', 'repeat_1')``.
+
+		:raises KeyError: If the section is not present.
+		:raises ValueError: If the section has changed since the file was opened.
+		"""
+
+		name = '/'.join(key_path)
+
+		if self._hashes is not None:
+			# Sections copied by incremental exports are unchanged, so can still be read.
+			return container.read_section(self.filename, name, mmap=self.mmap, sha256=self._hashes.get(name))
+
+		if _file_signature(self.filename) != self._signature:
+			raise ValueError(f"{self.filename} has changed since the project was read from it.")
+
+		for _, value in gzip_util.iter_gzip_json(self.filename, expand=key_path[:-1], select=[key_path]):
+			return value
+
+		raise KeyError(name)
+
+	def load(
+			self,
+			key_path: Tuple[str, ...],
+			construct: Callable[[Any, "_SpectrumCache"], _T],
+			spectra: "_SpectrumCache",
+			) -> _T:
+		"""
+		Read a section of the project and construct it from its dictionary representation.
+
+		:param key_path: The path to the section within the document.
+		:param construct: Function to construct the section from its dictionary representation
+			and the mass spectra.
+		:param spectra: The project's mass spectra, for peaks which refer to the spectrum table.
+		"""
+
+		return construct(self.read(key_path), spectra)
+
+
+def _already_loaded(section: _T) -> _T:
+	"""
+	Loader for a section of a project which has already been loaded.
+
+	:param section:
+	"""
+
+	return section
+
+
+def _read_project_section(
+		filename: PathLike,
+		key_path: Tuple[str, ...],
+		mmap: bool = False,
+		) -> Tuple[Any, "_SpectrumCache"]:
+	"""
+	Read a single section of a project file, and the spectrum table (if any).
+
+	:param filename:
+	:param key_path: The path to the section within the document, e.g. ``('datafile_data', 'repeat_1')``.
+	:param mmap: Whether to memory-map arrays in binary container files.
+
+	:raises KeyError: If the section is not present.
+	"""
+
+	spectra: Mapping[str, Any] = {}
+
+	if container.is_container(filename):
+		try:
+			section = container.read_section(filename, '/'.join(key_path), mmap=mmap)
+		except KeyError:
+			# Written without separate sections.
+			section = container.read_container(filename, mmap=mmap)
+			version = _format_version(section)  # type: ignore[arg-type]
+			spectra = section.get("spectra", {})  # type: ignore[union-attr]
+			for key in key_path:
+				section = section[key]  # type: ignore[index,call-overload]
+		else:
+			version = _format_version(container.read_section(filename, "root"))  # type: ignore[arg-type]
+			try:
+				spectra = container.read_section(filename, "spectra")  # type: ignore[assignment]
+			except KeyError:
+				pass
+
+		return section, _SpectrumCache(spectra if version >= 2 else {})
+
+	found = False
+	section = None
+	version = 1
+
+	select = [key_path, ("version", ), ("spectra", )]
+	for path, value in gzip_util.iter_gzip_json(filename, expand=key_path[:-1], select=select):
+		if path == key_path:
+			found, section = True, value
+		elif path == ("version", ):
+			version = _format_version({"version": value})
+		elif path == ("spectra", ):
+			spectra = value  # type: ignore[assignment]
+
+	if not found:
+		raise KeyError('/'.join(key_path))
+
+	return section, _SpectrumCache(spectra if version >= 2 else {})
+
+
+def _format_version(d: Mapping[str, Any]) -> int:
+	"""
+	Returns the format version of a project document.
+
+	:param d:
+
+	:raises ValueError: If the document was written by a newer version of libgunshotmatch
+		in a format this version can't read.
+	"""
+
+	version: int = d.get("version", 1)
+	if version > _FORMAT_VERSION:
+		raise ValueError(f"Unsupported project format version {version}")
+	return version
+
+
+class _SpectrumTable:
+	"""
+	Table of the distinct mass spectra in a project, for writing each spectrum only once.
+
+	Spectra are keyed by the UID of the first peak they are found in.
+	"""
+
+	def __init__(self):
+		self.spectra: Dict[str, MassSpectrum] = {}
+		# Holds a reference to each spectrum, so its id isn't reused while the table exists.
+		self._keys_by_id: Dict[int, Tuple[str, MassSpectrum]] = {}
+		self._keys_by_content: Dict[Tuple[Tuple[Any, ...], Tuple[Any, ...]], str] = {}
+		# Keys of inserted spectra not yet in _keys_by_content, which are only needed if a lookup by identity fails.
+		self._unindexed: List[str] = []
+
+	def add(self, mass_spectrum: MassSpectrum, uid: Optional[str] = None) -> str:
+		"""
+		Add a mass spectrum to the table if it isn't already present, and return its key.
+
+		:param mass_spectrum:
+		:param uid: The UID of the peak the spectrum belongs to, if any.
+		"""
+
+		# The same object is usually shared between the alignment and the repeats' peaks.
+		if id(mass_spectrum) in self._keys_by_id:
+			return self._keys_by_id[id(mass_spectrum)][0]
+
+		for inserted_key in self._unindexed:
+			self._keys_by_content.setdefault(_spectrum_content(self.spectra[inserted_key]), inserted_key)
+		self._unindexed.clear()
+
+		content = _spectrum_content(mass_spectrum)
+		key = self._keys_by_content.get(content)
+
+		if key is None:
+			base_key = key = uid or "spectrum"
+			suffix = 1
+			while key in self.spectra:
+				# Different spectra for peaks with the same UID (or without one).
+				key = f"{base_key}#{suffix}"
+				suffix += 1
+
+			self.spectra[key] = mass_spectrum
+			self._keys_by_content[content] = key
+
+		self._keys_by_id[id(mass_spectrum)] = (key, mass_spectrum)
+		return key
+
+	def insert(self, key: str, mass_spectrum: MassSpectrum) -> None:
+		"""
+		Add a mass spectrum to the table with the given key, e.g. from the spectrum table of an existing file.
+
+		:param key:
+		:param mass_spectrum:
+		"""
+
+		self.spectra[key] = mass_spectrum
+		self._keys_by_id[id(mass_spectrum)] = (key, mass_spectrum)
+		self._unindexed.append(key)
+
+	def to_dict(self, numpy_arrays: bool = False, compact: Union[bool, str] = False) -> Dict[str, Dict[str, Any]]:
+		"""
+		Returns a dictionary mapping keys to the dictionary representations of the mass spectra.
+
+		:param numpy_arrays: If :py:obj:`True` the mass spectra are given as :class:`numpy.ndarray` objects rather than lists.
+		:param compact: Whether to use the compact encoding for the mass spectra.
+		"""
+
+		return {key: _mass_spectrum_to_dict(ms, numpy_arrays, compact) for key, ms in self.spectra.items()}
+
+
+def _spectrum_content(mass_spectrum: MassSpectrum) -> Tuple[Tuple[Any, ...], Tuple[Any, ...]]:
+	return tuple(mass_spectrum.mass_list), tuple(mass_spectrum.intensity_list)
+
+
+class _SpectrumCache(Dict[str, MassSpectrum]):
+	"""
+	Mapping of keys in a project's spectrum table to :class:`~pyms.Spectrum.MassSpectrum` objects,
+	which are constructed from their dictionary representations on first access and then reused.
+
+	:param source: Mapping of keys to the dictionary representations of the mass spectra.
+	:param load: Function returning ``source``, which is called when a spectrum is first needed.
+	"""
+
+	def __init__(
+			self,
+			source: Optional[Mapping[str, Mapping[str, Any]]] = None,
+			load: Optional[Callable[[], Mapping[str, Mapping[str, Any]]]] = None,
+			):
+		super().__init__()
+		self._loaded_source = source
+		self._load_source = load
+
+	@property
+	def _source(self) -> Mapping[str, Mapping[str, Any]]:
+		if self._loaded_source is None:
+			self._loaded_source = {} if self._load_source is None else self._load_source()
+			self._load_source = None
+		return self._loaded_source
+
+	def __missing__(self, key: str) -> MassSpectrum:
+		mass_spectrum = self[key] = _mass_spectrum_from_dict(self._source[key])
+		return mass_spectrum
+
+	def resolve_peaks(self, peaks: Optional[Sequence[Optional[Mapping[str, Any]]]]) -> Any:
+		"""
+		Replace references to the spectrum table in a list of peak dictionaries with the mass spectra.
+
+		:param peaks:
+		"""
+
+		if peaks is None:
+			return None
+
+		return [
+				{**peak, "mass_spectrum": self[peak["mass_spectrum"]]}
+				if peak is not None and isinstance(peak["mass_spectrum"], str) else peak for peak in peaks
+				]
+
+
+class _SavedState:
+	"""
+	The sections of a project as last read from or written to a binary container, for incremental exports.
+
+	:param project:
+	:param spectra: The mass spectra in the file, either as the table used to write it
+		or as the cache used to read it.
+	:param metadata: The summary of the project in the file.
+	"""
+
+	def __init__(
+			self,
+			project: Project,
+			spectra: Union[_SpectrumTable, _SpectrumCache],
+			metadata: Optional[Mapping[str, Any]] = None,
+			):
+		self.alignment = project.alignment
+		self.datafile_data = project.datafile_data
+		self.consolidated_peaks = project.consolidated_peaks
+		self.metadata = metadata or {}
+		self.filename: Optional[str] = None
+		self._file_signature: Optional[Tuple[int, int]] = None
+		self._spectra = spectra
+
+	def set_file(self, filename: PathLike) -> None:
+		"""
+		Record the file the project was read from or written to.
+
+		:param filename:
+		"""
+
+		self.filename = os.path.abspath(filename)
+		self._file_signature = _file_signature(filename)
+
+	def is_current(self, filename: PathLike) -> bool:
+		"""
+		Returns whether the given file is the one the project was read from or written to,
+		and it hasn't been modified since.
+
+		:param filename:
+		"""
+
+		if self.filename != os.path.abspath(filename):
+			return False
+
+		try:
+			return _file_signature(filename) == self._file_signature
+		except FileNotFoundError:
+			return False
+
+	def is_untouched(self, section: Any, name: Optional[str] = None) -> bool:
+		"""
+		Returns whether a section of the project is still the proxy created when the file was read,
+		and hasn't been accessed since. Only then can it not have been modified.
+
+		:param section: The project's alignment, repeats or consolidated peaks.
+		:param name: The name of the repeat, if ``section`` is the project's repeats.
+		"""
+
+		if isinstance(section, _LazyRepeats):
+			return section is self.datafile_data and name in section._unloaded
+		elif isinstance(section, (_LazyAlignment, _LazyConsolidatedPeaks)):
+			is_saved = section is self.alignment or section is self.consolidated_peaks
+			return is_saved and section._lazy_load is not None
+		else:
+			return False
+
+	def spectrum_table(self) -> _SpectrumTable:
+		"""
+		Returns the spectrum table of the file, to add any new spectra to.
+		"""
+
+		if isinstance(self._spectra, _SpectrumCache):
+			table = _SpectrumTable()
+			for key in self._spectra._source:
+				table.insert(key, self._spectra[key])
+			self._spectra = table
+
+		return self._spectra
+
+
+def _file_signature(filename: PathLike) -> Tuple[int, int]:
+	stat = os.stat(filename)
+	return stat.st_size, stat.st_mtime_ns
+
+
+def _peaks_to_list(
+		peaks: Optional[Sequence[Optional[Peak]]],
+		numpy_arrays: bool,
+		spectra: Optional[_SpectrumTable],
+		compact: Union[bool, str] = False,
+		) -> Optional[Sequence[Optional[Dict[str, Any]]]]:
+	"""
+	Returns a list of dictionaries representing the peaks.
+
+	:param peaks: A list of peaks (some of which may be :py:obj:`None`), or a list of qualified peaks.
+	:param numpy_arrays: If :py:obj:`True` mass spectra are given as :class:`numpy.ndarray` objects rather than lists.
+	:param spectra: If given the mass spectra are added to the table, and the peaks refer to them by key.
+	:param compact: Whether to use the compact encoding for the mass spectra if ``spectra`` is not given.
+	"""
+
+	if peaks is None:
+		return None
+
+	if spectra is not None:
+		# The spectra are replaced by keys into the table.
+		numpy_arrays, compact = False, False
+
+	peaks_as_list: Sequence[Optional[Dict[str, Any]]]
+	if isinstance(peaks, PeakList):
+		peaks_as_list = peaks.to_list(numpy_arrays=numpy_arrays, compact=compact)
+	else:
+		peaks_as_list = [
+				peak.to_dict(numpy_arrays, compact) if isinstance(peak, QualifiedPeak) else None for peak in peaks
+				]
+
+	if spectra is not None:
+		for peak, peak_as_dict in zip(peaks, peaks_as_list):
+			if peak is not None and peak_as_dict is not None:
+				# The mass_spectrum property returns a copy.
+				peak_as_dict["mass_spectrum"] = spectra.add(peak._mass_spectrum, peak.UID)
+
+	return peaks_as_list
+
+
+def _repeat_to_dict(
+		repeat: Repeat,
+		numpy_arrays: bool,
+		lazy: bool,
+		spectra: Optional[_SpectrumTable],
+		compact: Union[bool, str] = False,
+		) -> Dict[str, Any]:
+	"""
+	Returns a dictionary representation of a repeat in a project.
+
+	:param repeat:
+	:param numpy_arrays: If :py:obj:`True` arrays are given as :class:`numpy.ndarray` objects rather than lists.
+	:param lazy: If :py:obj:`True` the peaks and qualified peaks are given as callables.
+	:param spectra: If given the mass spectra are added to the table, and the peaks refer to them by key.
+	:param compact: Whether to use the compact encoding for the mass spectra if ``spectra`` is not given.
+	"""
+
+	repeat_as_dict = repeat._to_dict(numpy_arrays=numpy_arrays, lazy=lazy, compact=compact)
+
+	if spectra is not None:
+		peaks = functools.partial(_peaks_to_list, repeat.peaks, numpy_arrays, spectra)
+		qualified_peaks = functools.partial(_peaks_to_list, repeat.qualified_peaks, numpy_arrays, spectra)
+		repeat_as_dict["peaks"] = peaks if lazy else peaks()
+		repeat_as_dict["qualified_peaks"] = qualified_peaks if lazy else qualified_peaks()
+
+	return repeat_as_dict
+
+
+def _alignment_from_dict(
+		alignment_as_dict: Mapping[str, Any],
+		spectra: Optional[_SpectrumCache] = None,
+		) -> Alignment:
+	alignment_peaks: List[MutableSequence[Optional[Peak]]] = []
+	for row in alignment_as_dict["peaks"]:
+		if spectra is not None:
+			row = spectra.resolve_peaks(row)
+
+		alignment_peaks.append([])
+		for peak in row:
+			# print(peak)
+			if peak is None:
+				alignment_peaks[-1].append(None)
+			else:
+				alignment_peaks[-1].append(peak_from_dict(peak))
+
+	return create_alignment(
+			alignment_peaks,
+			alignment_as_dict["expr_code"],
+			alignment_as_dict["similarity"],
+			)
+
+
+def _repeat_from_dict(repeat_as_dict: Mapping[str, Any], spectra: Optional[_SpectrumCache] = None) -> Repeat:
+	if spectra is not None:
+		repeat_as_dict = {
+				**repeat_as_dict,
+				"peaks": spectra.resolve_peaks(repeat_as_dict["peaks"]),
+				"qualified_peaks": spectra.resolve_peaks(repeat_as_dict["qualified_peaks"]),
+				}
+
+	return Repeat.from_dict(repeat_as_dict)
+
+
+def _consolidated_peaks_from_list(
+		consolidated_peaks_as_list: Optional[Iterable[Mapping[str, Any]]],
+		spectra: Optional[_SpectrumCache] = None,
+		) -> Optional[List[ConsolidatedPeak]]:
+	if consolidated_peaks_as_list is None:
+		return None
+
+	consolidated_peaks = []
+	for cp in consolidated_peaks_as_list:
+		if spectra is not None:
+			cp = {**cp, "ms_list": [spectra[ms] if isinstance(ms, str) else ms for ms in cp["ms_list"]]}
+		consolidated_peaks.append(ConsolidatedPeak.from_dict(cp))
+
+	return consolidated_peaks
+
+
+class _LazyAlignment(Alignment):
+	"""
+	Proxy for an :class:`~pyms.DPA.Alignment.Alignment` which is loaded on first access.
+
+	:param load: Function returning the alignment.
+	:param load_timings: Mapping to record the time taken to load the alignment in.
+	"""
+
+	def __init__(self, load: Callable[[], Alignment], load_timings: Optional[Dict[str, float]] = None):
+		self._lazy_load: Optional[Callable[[], Alignment]] = load
+		self._lazy_timings = load_timings
+
+	def __getattr__(self, name: str) -> Any:
+		# Only called for attributes which haven't been set yet.
+		if name.startswith("__") or name.startswith("_lazy") or self._lazy_load is None:
+			raise AttributeError(name)
+
+		self._lazy_resolve()
+		return getattr(self, name)
+
+	def _lazy_resolve(self) -> None:
+		"""
+		Load the alignment, if it hasn't been loaded yet.
+		"""
+
+		if self._lazy_load is None:
+			return
+
+		with _record_timing(self._lazy_timings, "alignment"):
+			alignment = self._lazy_load()
+
+		self._lazy_load = None
+
+		# Don't overwrite any attributes set before loading.
+		for key, value in vars(alignment).items():
+			self.__dict__.setdefault(key, value)
+
+
+class _LazyRepeats(MutableMapping[str, Repeat]):
+	"""
+	Mapping of repeat names to :class:`~.Repeat` objects, which are loaded on first access.
+
+	:param loaders: Mapping of repeat names to functions returning the repeats.
+	:param load_timings: Mapping to record the time taken to load each repeat in.
+	"""
+
+	def __init__(
+			self,
+			loaders: Mapping[str, Callable[[], Repeat]],
+			load_timings: Optional[Dict[str, float]] = None,
+			):
+		self._data: Dict[str, Any] = dict(loaders)
+		self._unloaded = set(self._data)
+		self._lazy_timings = load_timings
+
+	def __getitem__(self, key: str) -> Repeat:
+		if key in self._unloaded:
+			with _record_timing(self._lazy_timings, f"datafile_data/{key}"):
+				self._data[key] = self._data[key]()
+			self._unloaded.discard(key)
+
+		return self._data[key]
+
+	def __setitem__(self, key: str, value: Repeat) -> None:
+		self._data[key] = value
+		self._unloaded.discard(key)
+
+	def _lazy_resolve(self) -> None:
+		"""
+		Load any repeats which haven't been loaded yet.
+		"""
+
+		for key in list(self._unloaded):
+			self.__getitem__(key)
+
+	def __delitem__(self, key: str) -> None:
+		del self._data[key]
+		self._unloaded.discard(key)
+
+	def __iter__(self) -> Iterator[str]:
+		return iter(self._data)
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+	def __repr__(self) -> str:
+		return f"{self.__class__.__name__}({list(self._data)!r})"
+
+
+class _LazyConsolidatedPeaks(UserList):
+	"""
+	List of :class:`~.ConsolidatedPeak` objects, which are loaded on first access.
+
+	:param initlist: Optional initial (already loaded) peaks.
+	:param load: Function returning the peaks.
+	:param load_timings: Mapping to record the time taken to load the peaks in.
+	"""
+
+	def __init__(
+			self,
+			initlist: Optional[Iterable[ConsolidatedPeak]] = None,
+			load: Optional[Callable[[], Optional[List[ConsolidatedPeak]]]] = None,
+			load_timings: Optional[Dict[str, float]] = None,
+			):
+		self._lazy_load = load
+		self._lazy_timings = load_timings
+		self._data: List[ConsolidatedPeak] = []
+
+		if initlist is not None:
+			self.data = list(initlist)
+
+	@property  # type: ignore[override]
+	def data(self) -> List[ConsolidatedPeak]:
+		self._lazy_resolve()
+		return self._data
+
+	@data.setter
+	def data(self, value: List[ConsolidatedPeak]) -> None:
+		self._lazy_load = None
+		self._data = value
+
+	def _lazy_resolve(self) -> None:
+		"""
+		Load the peaks, if they haven't been loaded yet.
+		"""
+
+		if self._lazy_load is not None:
+			with _record_timing(self._lazy_timings, "consolidated_peaks"):
+				self._data = self._lazy_load()  # type: ignore[assignment]
+			self._lazy_load = None
+
+
 def consolidate(
 		project: Project,
 		engine: pyms_nist_search.Engine,
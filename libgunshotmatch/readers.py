@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+#
+#  readers.py
+"""
+Fast readers for raw GC-MS data files.
+
+:func:`~.jcamp_reader` is a drop-in replacement for :func:`pyms.GCMS.IO.JCAMP.JCAMP_reader`
+which parses all of the mass spectra in the file with numpy at once, rather than line by line.
+It is used by :meth:`Datafile.load_gcms_data() <.Datafile.load_gcms_data>` for JCAMP-DX files.
+
+:func:`~.mzml_intensity_matrix` reads an mzML file one spectrum at a time,
+binning each spectrum into the intensity matrix as it is read rather than
+first constructing a :class:`~pyms.Spectrum.Scan` for every spectrum in the file.
+
+.. versionadded:: 0.14.0
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import os
+import warnings
+from statistics import mean, median, stdev
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+
+# 3rd party
+import numpy
+from domdf_python_tools.typing import PathLike
+from pyms.GCMS.Class import GCMS_data
+from pyms.IntensityMatrix import IntensityMatrix
+from pyms.Spectrum import Scan
+from pyms.Utils.jcamp import xydata_tags
+from scipy.io import netcdf_file  # type: ignore[import-untyped]
+
+# this package
+from libgunshotmatch.datafile import GCMSDataInfo
+from libgunshotmatch.intensity_matrix import _BIN_LEFT, _bin_scans, _crop_mass_bins, _mass_bins
+
+__all__ = ("andi_intensity_matrix", "jcamp_intensity_matrix", "jcamp_reader", "mzml_intensity_matrix")
+
+
+def _read_jcamp(file_name: PathLike) -> Tuple[List[float], numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+	"""
+	Read the retention times and the masses and intensities of all scans from a JCAMP-DX file.
+
+	:param file_name:
+
+	:returns: The retention times, the masses and intensities of all scans one after the other,
+		and the index of the first point of each scan followed by the total number of points.
+	"""
+
+	with open(file_name, encoding="UTF-8") as fp:
+		# Ensures a label on the first line is found by the split below.
+		text = '\n' + fp.read()
+
+	time_list: List[float] = []
+	xy_blocks: List[str] = []
+
+	for chunk in text.split("\n##")[1:]:
+		line, _, xy_data = chunk.partition('\n')
+		label, value = line.split('=', 1)
+		label = label.upper()
+		value = value.strip()
+
+		if "PAGE" in label:
+			if "T=" in value:
+				# PAGE contains retention time starting with T= (FileConverter Pro style)
+				time_list.append(float(value[2:] if value.startswith("T=") else value))
+
+		elif "RETENTION_TIME" in label:
+			# OpenChrom style; may be given as well as PAGE
+			time = float(value)
+			if not time_list or time_list[-1] != time:
+				time_list.append(time)
+
+		elif label in xydata_tags:
+			xy_blocks.append(xy_data.strip().replace(",\n", '\n').rstrip(',').replace('\n', ','))
+
+	if len(time_list) != len(xy_blocks):
+		raise ValueError(
+				f"Number of time points ({len(time_list)}) does not equal the number of scans ({len(xy_blocks)})"
+				)
+
+	counts = numpy.array([block.count(',') + 1 if block else 0 for block in xy_blocks], dtype=numpy.int64)
+	values = _parse_xy_blocks(xy_blocks, counts)
+
+	odd = numpy.flatnonzero(counts % 2)
+	if odd.size:
+		raise ValueError(f"Expected an even number of values, got {counts[odd[0]]}")
+
+	offsets: numpy.ndarray = numpy.zeros(len(counts) + 1, dtype=numpy.int64)
+	numpy.cumsum(counts // 2, out=offsets[1:])
+
+	return time_list, values[::2], values[1::2], offsets
+
+
+def jcamp_reader(file_name: PathLike) -> GCMS_data:
+	"""
+	Reader for JCAMP-DX files.
+
+	The result is the same as :func:`pyms.GCMS.IO.JCAMP.JCAMP_reader`, but the file is read in one go
+	and the XY data of all scans is parsed into a single array, which is several times faster.
+
+	:param file_name: The name of the JCAMP-DX file.
+	"""
+
+	time_list, masses, intensities, offsets = _read_jcamp(file_name)
+	return GCMS_data(time_list, _scans_from_arrays(masses, intensities, offsets))
+
+
+def jcamp_intensity_matrix(
+		file_name: PathLike,
+		crop_mass_range: Optional[Tuple[float, float]] = None,
+		) -> Tuple[IntensityMatrix, GCMSDataInfo]:
+	"""
+	Read a JCAMP-DX file directly into an intensity matrix, without constructing a :class:`~pyms.Spectrum.Scan`
+	for each scan in the file.
+
+	:param file_name: The name of the JCAMP-DX file.
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to.
+
+	:returns: The intensity matrix, and the same information about the file as :func:`~.get_info_from_gcms_data`.
+	"""
+
+	time_list, masses, intensities, offsets = _read_jcamp(file_name)
+
+	min_mass: Optional[float]
+	max_mass: Optional[float]
+	if len(masses):
+		min_mass, max_mass = float(masses.min()), float(masses.max())
+	else:
+		min_mass = max_mass = None
+
+	return _flat_intensity_matrix(time_list, masses, intensities, offsets, min_mass, max_mass, crop_mass_range)
+
+
+def _parse_xy_blocks(xy_blocks: List[str], counts: numpy.ndarray) -> numpy.ndarray:
+	"""
+	Parse the comma-separated values in each block, which have had newlines replaced with commas.
+
+	:param xy_blocks:
+	:param counts: The number of values expected in each block.
+	"""
+
+	with warnings.catch_warnings():
+		# numpy warns (rather than raising) if it can't parse the whole string.
+		warnings.simplefilter("ignore", DeprecationWarning)
+		values = numpy.fromstring(','.join(block for block in xy_blocks if block), sep=',')
+
+	if len(values) == counts.sum():
+		return values
+
+	# Unusual formatting (e.g. whitespace after a trailing comma); parse each line in turn as pyms does.
+	parsed_values: List[float] = []
+	for idx, block in enumerate(xy_blocks):
+		block_values = []
+		for line in block.split(','):
+			if line.strip():
+				block_values.append(float(line))
+		counts[idx] = len(block_values)
+		parsed_values.extend(block_values)
+
+	return numpy.asarray(parsed_values, dtype=numpy.float64)
+
+
+def _scans_from_arrays(masses: numpy.ndarray, intensities: numpy.ndarray, offsets: numpy.ndarray) -> List[Scan]:
+	"""
+	Construct scans from flat arrays of masses and intensities.
+
+	:param masses:
+	:param intensities:
+	:param offsets: The index of the first value of each scan, followed by the total number of values.
+	"""
+
+	n_scans = len(offsets) - 1
+	scan_ids: numpy.ndarray = numpy.repeat(numpy.arange(n_scans), numpy.diff(offsets))
+
+	# As with pyms.Spectrum.Scan, masses in descending order are reversed,
+	# and a warning is emitted if a scan is in neither ascending nor descending order.
+	same_scan = scan_ids[1:] == scan_ids[:-1]
+	mass_diff = numpy.diff(masses)
+	not_ascending: numpy.ndarray = numpy.zeros(n_scans, dtype=bool)
+	not_ascending[scan_ids[1:][same_scan & (mass_diff < 0)]] = True
+	not_descending: numpy.ndarray = numpy.zeros(n_scans, dtype=bool)
+	not_descending[scan_ids[1:][same_scan & (mass_diff > 0)]] = True
+
+	if (not_ascending & not_descending).any():
+		warnings.warn(
+				"Unknown sort order for mass list; it doesn't appear to be in either ascending or descending order."
+				)
+
+	mass_list = masses.tolist()
+	intensity_list = intensities.tolist()
+	offset_list = offsets.tolist()
+
+	scan_list = []
+	for idx, (start, end) in enumerate(zip(offset_list, offset_list[1:])):
+		# Constructed directly rather than through Scan.__init__, which checks the sort order in Python.
+		scan = Scan.__new__(Scan)
+		scan._mass_list = mass_list[start:end]
+		scan._intensity_list = intensity_list[start:end]
+
+		if not_ascending[idx] and not not_descending[idx]:
+			scan._mass_list.reverse()
+			scan._intensity_list.reverse()
+
+		if start == end:
+			scan._min_mass = scan._max_mass = None
+		elif not_ascending[idx] and not_descending[idx]:
+			scan._min_mass = min(scan._mass_list)
+			scan._max_mass = max(scan._mass_list)
+		else:
+			scan._min_mass = scan._mass_list[0]
+			scan._max_mass = scan._mass_list[-1]
+
+		scan_list.append(scan)
+
+	return scan_list
+
+
+def _gcms_data_info(
+		time_list: List[float],
+		n_list: Sequence[int],
+		min_mass: Optional[float],
+		max_mass: Optional[float],
+		) -> GCMSDataInfo:
+	"""
+	Returns the same information as :func:`~.get_info_from_gcms_data` for the given scans,
+	checking the retention times are in ascending order (as :class:`~pyms.GCMS.Class.GCMS_data` does).
+
+	:param time_list: The retention times of the scans.
+	:param n_list: The number of masses in each scan.
+	:param min_mass: The smallest mass in any scan.
+	:param max_mass: The largest mass in any scan.
+	"""
+
+	time_diff_list = []
+	for t1, t2 in zip(time_list, time_list[1:]):
+		if not t2 > t1:
+			raise ValueError("Retention times are not in ascending order!")
+		time_diff_list.append(t2 - t1)
+
+	return GCMSDataInfo(
+			rt_range=(min(time_list) / 60, max(time_list) / 60),
+			time_step=mean(time_diff_list),
+			time_step_stdev=stdev(time_diff_list),
+			n_scans=len(time_list),
+			mz_range=(min_mass or -1, max_mass or -1),
+			num_mz_mean=mean(n_list),
+			num_mz_median=median(n_list),
+			)
+
+
+def _flat_intensity_matrix(
+		time_list: List[float],
+		masses: Any,
+		intensities: Any,
+		offsets: numpy.ndarray,
+		min_mass: Optional[float],
+		max_mass: Optional[float],
+		crop_mass_range: Optional[Tuple[float, float]],
+		chunk_size: int = 2**20,
+		) -> Tuple[IntensityMatrix, GCMSDataInfo]:
+	"""
+	Construct an intensity matrix from scans given as flat arrays of masses and intensities.
+
+	:param time_list: The retention times of the scans.
+	:param masses: The masses of all scans, one after the other.
+	:param intensities: The intensities of all scans, in the same order as ``masses``.
+	:param offsets: The index of the first point of each scan, followed by the total number of points.
+	:param min_mass: The smallest mass in any scan.
+	:param max_mass: The largest mass in any scan.
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to.
+	:param chunk_size: The approximate number of points to bin at once.
+	"""
+
+	crop_bins = _crop_mass_bins(crop_mass_range)
+	info = _gcms_data_info(time_list, numpy.diff(offsets).tolist(), min_mass, max_mass)
+
+	if min_mass is None or max_mass is None:
+		raise ValueError("Cannot build an intensity matrix from scans with no masses.")
+
+	first_bin, last_bin = _mass_bins(min_mass, max_mass, crop_bins)
+	intensity_array = _bin_scans(masses, intensities, offsets, first_bin, last_bin, chunk_size)
+
+	return IntensityMatrix(time_list, list(range(first_bin, last_bin + 1)), intensity_array), info
+
+
+class _IntensityMatrixBuilder:
+	"""
+	Bins scans into an intensity matrix as they are added, with the same result as
+	:func:`pyms.IntensityMatrix.build_intensity_matrix_i` followed by
+	:meth:`~pyms.IntensityMatrix.BaseIntensityMatrix.crop_mass`.
+
+	:param n_scans: The expected number of scans. More rows are allocated if more scans are added.
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to.
+	"""
+
+	def __init__(self, n_scans: int = 1024, crop_mass_range: Optional[Tuple[float, float]] = None):
+		self.time_list: List[float] = []
+		self.n_list: List[int] = []
+		self.min_mass: Optional[float] = None
+		self.max_mass: Optional[float] = None
+
+		self._crop_bins = _crop_mass_bins(crop_mass_range)
+
+		if self._crop_bins is None:
+			# Columns are added as new masses are seen.
+			self._first_bin = 0
+			n_bins = 0
+		else:
+			self._first_bin = self._crop_bins[0]
+			n_bins = max(self._crop_bins[1] - self._crop_bins[0] + 1, 0)
+
+		self._array: numpy.ndarray = numpy.zeros((max(n_scans, 1), n_bins), dtype=numpy.float64)
+
+	def _extend_columns(self, first_bin: int, last_bin: int) -> None:
+		n_rows, n_bins = self._array.shape
+		if n_bins:
+			first_bin = min(first_bin, self._first_bin)
+			last_bin = max(last_bin, self._first_bin + n_bins - 1)
+
+		array: numpy.ndarray = numpy.zeros((n_rows, last_bin - first_bin + 1), dtype=numpy.float64)
+		start = self._first_bin - first_bin
+		array[:, start:start + n_bins] = self._array
+		self._array = array
+		self._first_bin = first_bin
+
+	def add_scan(self, time: float, masses: numpy.ndarray, intensities: numpy.ndarray) -> None:
+		"""
+		Bin a scan into the next row of the intensity matrix.
+
+		:param time: The retention time of the scan, in seconds.
+		:param masses:
+		:param intensities:
+		"""
+
+		row = len(self.time_list)
+		if row == self._array.shape[0]:
+			self._array = numpy.concatenate([self._array, numpy.zeros_like(self._array)])
+
+		self.time_list.append(time)
+		self.n_list.append(len(masses))
+
+		if not len(masses):
+			return
+
+		masses = numpy.asarray(masses, dtype=numpy.float64)
+		intensities = numpy.asarray(intensities, dtype=numpy.float64)
+
+		scan_min_mass, scan_max_mass = float(masses.min()), float(masses.max())
+		if self.min_mass is None or scan_min_mass < self.min_mass:
+			self.min_mass = scan_min_mass
+		if self.max_mass is None or scan_max_mass > self.max_mass:
+			self.max_mass = scan_max_mass
+
+		bins = numpy.floor(masses + _BIN_LEFT).astype(numpy.int64)
+
+		if self._crop_bins is None:
+			first_bin, last_bin = int(bins.min()), int(bins.max())
+			last_allocated_bin = self._first_bin + self._array.shape[1] - 1
+			if not self._array.shape[1] or first_bin < self._first_bin or last_bin > last_allocated_bin:
+				self._extend_columns(first_bin, last_bin)
+		else:
+			in_range = (bins >= self._crop_bins[0]) & (bins <= self._crop_bins[1])
+			bins, intensities = bins[in_range], intensities[in_range]
+
+		# bincount sums the intensities in each bin in order, as pyms does.
+		self._array[row] = numpy.bincount(bins - self._first_bin, weights=intensities, minlength=self._array.shape[1])
+
+	def build(self) -> Tuple[IntensityMatrix, GCMSDataInfo]:
+		"""
+		Returns the intensity matrix, and information about the scans it was built from.
+		"""
+
+		time_list = self.time_list
+		info = _gcms_data_info(time_list, self.n_list, self.min_mass, self.max_mass)
+
+		if self.min_mass is None or self.max_mass is None:
+			raise ValueError("Cannot build an intensity matrix from scans with no masses.")
+
+		first_bin, last_bin = _mass_bins(self.min_mass, self.max_mass, self._crop_bins)
+
+		if first_bin < self._first_bin or last_bin >= self._first_bin + self._array.shape[1]:
+			self._extend_columns(first_bin, last_bin)
+
+		start = first_bin - self._first_bin
+		intensity_array = self._array[:len(time_list), start:start + last_bin - first_bin + 1]
+
+		return IntensityMatrix(time_list, list(range(first_bin, last_bin + 1)), intensity_array), info
+
+
+def mzml_intensity_matrix(
+		file_name: PathLike,
+		crop_mass_range: Optional[Tuple[float, float]] = None,
+		) -> Tuple[IntensityMatrix, GCMSDataInfo]:
+	"""
+	Read an mzML file directly into an intensity matrix.
+
+	Each spectrum is binned as it is read, so unlike :func:`pyms.GCMS.IO.MZML.mzML_reader`
+	followed by :func:`pyms.IntensityMatrix.build_intensity_matrix_i`
+	the whole file is never held in memory as a list of :class:`~pyms.Spectrum.Scan` objects.
+	Masses outside of ``crop_mass_range`` are discarded while binning.
+
+	The intensity matrix can be passed to :meth:`Datafile.prepare_intensity_matrix() <.Datafile.prepare_intensity_matrix>`
+	in place of the :class:`~pyms.GCMS.Class.GCMS_data`.
+
+	:param file_name: The name of the mzML file.
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to.
+
+	:returns: The intensity matrix, and the same information about the file as :func:`~.get_info_from_gcms_data`.
+	"""
+
+	# 3rd party
+	from pymzml.run import Reader  # type: ignore[import-untyped]
+
+	with Reader(os.fspath(file_name)) as mzml_file:
+		try:
+			n_scans = mzml_file.get_spectrum_count()
+		except Exception:
+			n_scans = 1024
+
+		builder = _IntensityMatrixBuilder(n_scans or 1024, crop_mass_range)
+
+		for spectrum in mzml_file:
+			peaks = spectrum.peaks("raw")
+			if len(peaks):
+				masses, intensities = peaks[:, 0], peaks[:, 1]
+			else:
+				masses = intensities = numpy.empty(0)
+
+			builder.add_scan(spectrum.scan_time_in_minutes() * 60, masses, intensities)
+
+	return builder.build()
+
+
+class _ScaledVariable:
+	"""
+	Applies the ``scale_factor`` and ``add_offset`` attributes of a netCDF variable when it is sliced.
+
+	:param variable:
+	"""
+
+	def __init__(self, variable: Any):
+		self._variable = variable
+		self._scale_factor = getattr(variable, "scale_factor", None)
+		self._add_offset = getattr(variable, "add_offset", None)
+
+	def __getitem__(self, index: Any) -> numpy.ndarray:
+		values = numpy.asarray(self._variable[index], dtype=numpy.float64)
+
+		if self._scale_factor is not None:
+			values = values * self._scale_factor
+		if self._add_offset is not None:
+			values = values + self._add_offset
+
+		return values
+
+
+def andi_intensity_matrix(
+		file_name: PathLike,
+		crop_mass_range: Optional[Tuple[float, float]] = None,
+		chunk_size: int = 2**20,
+		) -> Tuple[IntensityMatrix, GCMSDataInfo]:
+	"""
+	Read an ANDI-MS (netCDF) file directly into an intensity matrix.
+
+	The ``mass_values`` and ``intensity_values`` variables are memory-mapped,
+	and binned into the intensity matrix a chunk of scans at a time using the ``scan_index`` offsets,
+	so unlike :func:`pyms.GCMS.IO.ANDI.ANDI_reader` the file is never loaded into memory in full
+	and no :class:`~pyms.Spectrum.Scan` objects are created.
+
+	Files in the netCDF-4 (HDF5) format, which can't be memory-mapped, are read a chunk at a time instead.
+
+	:param file_name: The name of the ANDI-MS file.
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to.
+	:param chunk_size: The approximate number of points to read and bin at once.
+
+	:returns: The intensity matrix, and the same information about the file as :func:`~.get_info_from_gcms_data`.
+	"""
+
+	if not os.path.isfile(file_name):
+		raise FileNotFoundError(2, "No such file or directory", os.fspath(file_name))
+
+	try:
+		dataset = netcdf_file(os.fspath(file_name), 'r', mmap=True)
+	except TypeError:
+		# Not a netCDF 3 file, e.g. netCDF-4 (HDF5).
+
+		# 3rd party
+		from netCDF4 import Dataset
+
+		dataset = Dataset(os.fspath(file_name), 'r')
+		dataset.set_auto_maskandscale(False)
+
+	try:
+		return _read_andi(dataset.variables, crop_mass_range, chunk_size)
+	finally:
+		dataset.close()
+
+
+def _read_andi(
+		variables: Mapping[str, Any],
+		crop_mass_range: Optional[Tuple[float, float]],
+		chunk_size: int,
+		) -> Tuple[IntensityMatrix, GCMSDataInfo]:
+	"""
+	Construct an intensity matrix from the variables of an ANDI-MS file.
+
+	No references to the (possibly memory-mapped) variables are kept once this function returns,
+	so the file can be closed.
+
+	:param variables:
+	:param crop_mass_range: The range of masses to which the intensity matrix should be limited to.
+	:param chunk_size: The approximate number of points to read and bin at once.
+	"""
+
+	n_points = variables["mass_values"].shape[0]
+	if variables["intensity_values"].shape[0] != n_points:
+		raise ValueError("The lengths of the mass and intensity lists differ!")
+
+	masses = _ScaledVariable(variables["mass_values"])
+	intensities = _ScaledVariable(variables["intensity_values"])
+	time_list = _ScaledVariable(variables["scan_acquisition_time"])[:].tolist()
+
+	if "scan_index" in variables:
+		scan_index = numpy.array(variables["scan_index"][:], dtype=numpy.int64)
+	else:
+		point_count = numpy.array(variables["point_count"][:], dtype=numpy.int64)
+		scan_index = numpy.cumsum(point_count) - point_count
+
+	offsets = numpy.append(scan_index, n_points)
+	if (numpy.diff(offsets) < 0).any():
+		raise ValueError("The scan offsets ('scan_index') are not in ascending order!")
+
+	if len(time_list) != len(scan_index):
+		raise ValueError("number of time points does not equal the number of scans")
+
+	min_mass: Optional[float] = None
+	max_mass: Optional[float] = None
+	for start in range(0, n_points, chunk_size):
+		chunk = masses[start:start + chunk_size]
+		chunk_min_mass, chunk_max_mass = float(chunk.min()), float(chunk.max())
+		min_mass = chunk_min_mass if min_mass is None else min(min_mass, chunk_min_mass)
+		max_mass = chunk_max_mass if max_mass is None else max(max_mass, chunk_max_mass)
+
+	return _flat_intensity_matrix(
+			time_list,
+			masses,
+			intensities,
+			offsets,
+			min_mass,
+			max_mass,
+			crop_mass_range,
+			chunk_size,
+			)
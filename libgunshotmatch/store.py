@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+#
+#  store.py
+"""
+An indexed store of the consolidated peaks from many projects, backed by SQLite.
+
+Searching a directory of ``gsmp`` files for a compound means loading every file.
+A :class:`~.ProjectStore` instead holds a summary of each project
+(see :meth:`Project.read_metadata() <.Project.read_metadata>`) alongside the retention times, areas and hits of its consolidated peaks in indexed tables,
+so peaks can be found by compound name, CAS number and retention time without loading any projects.
+
+.. code-block:: python
+
+	with ProjectStore("projects.db") as store:
+		store.add_projects(PathPlus("projects").glob("*.gsmp"))
+
+		for match in store.find_peaks(name="Diphenylamine", rt=850, rt_tolerance=10):
+			print(match.project, match.rt, match.match_factor)
+			peak = store.load_consolidated_peak(match.project, match.peak_index)
+
+The consolidated peaks themselves are also stored (with their mass spectra in the compact encoding,
+see :meth:`PeakList.to_list() <.PeakList.to_list>`), so they can be reconstructed from the store,
+and the full project can be loaded from the file it was added from.
+
+.. versionadded:: 0.14.0
+"""
+#
+#  Copyright © 2023 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# stdlib
+import math
+import os
+import sqlite3
+import warnings
+from types import TracebackType
+from typing import Any, Collection, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Type, Union
+
+# 3rd party
+import numpy
+import sdjson
+from domdf_python_tools.typing import PathLike
+
+# this package
+from libgunshotmatch.consolidate import ConsolidatedPeak, ConsolidatedSearchResult
+from libgunshotmatch.consolidate._fields import _attrs_convert_cas
+from libgunshotmatch.project import Project
+
+__all__ = ("PeakMatch", "ProjectStore")
+
+# Incremented when the schema changes.
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+	id INTEGER PRIMARY KEY,
+	name TEXT NOT NULL UNIQUE,
+	filename TEXT,
+	n_aligned_peaks INTEGER,
+	n_consolidated_peaks INTEGER,
+	metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repeats (
+	project_id INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	user TEXT,
+	device TEXT,
+	date_created TEXT,
+	date_modified TEXT,
+	n_peaks INTEGER,
+	n_qualified_peaks INTEGER,
+	PRIMARY KEY (project_id, name)
+);
+CREATE TABLE IF NOT EXISTS peaks (
+	project_id INTEGER NOT NULL,
+	peak_index INTEGER NOT NULL,
+	peak_number INTEGER,
+	rt REAL,
+	rt_stdev REAL,
+	area REAL,
+	area_stdev REAL,
+	n_peaks INTEGER NOT NULL,
+	data TEXT NOT NULL,
+	PRIMARY KEY (project_id, peak_index)
+);
+CREATE INDEX IF NOT EXISTS peaks_rt ON peaks (rt);
+CREATE TABLE IF NOT EXISTS hits (
+	project_id INTEGER NOT NULL,
+	peak_index INTEGER NOT NULL,
+	hit_index INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	cas TEXT NOT NULL,
+	match_factor REAL,
+	match_factor_stdev REAL,
+	reverse_match_factor REAL,
+	reverse_match_factor_stdev REAL,
+	average_hit_number REAL,
+	hit_number_stdev REAL,
+	n_peaks INTEGER NOT NULL,
+	PRIMARY KEY (project_id, peak_index, hit_index)
+);
+CREATE INDEX IF NOT EXISTS hits_name ON hits (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS hits_cas ON hits (cas);
+"""
+
+
+class PeakMatch(NamedTuple):
+	"""
+	A hit for a consolidated peak in a :class:`~.ProjectStore` which matches a query.
+	"""
+
+	#: The name of the project.
+	project: str
+
+	#: The index of the peak in the project's :attr:`~.Project.consolidated_peaks`.
+	peak_index: int
+
+	#: The average retention time of the peak, in seconds.
+	rt: float
+
+	#: The average peak area.
+	area: float
+
+	#: The position of the hit in the peak's :attr:`~.ConsolidatedPeak.hits`, where 0 is the best hit.
+	hit_index: int
+
+	#: The name of the compound.
+	name: str
+
+	#: The CAS number of the compound.
+	cas: str
+
+	#: The average match factor of the hit (see :attr:`.ConsolidatedSearchResult.match_factor`).
+	match_factor: float
+
+	#: The average reverse match factor of the hit (see :attr:`.ConsolidatedSearchResult.reverse_match_factor`).
+	reverse_match_factor: float
+
+	#: The average hit number (see :attr:`.ConsolidatedSearchResult.average_hit_number`).
+	average_hit_number: float
+
+	#: The number of aligned peaks which had the compound in their hit list.
+	n_peaks: int
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+	# SQLite has no NaN.
+	value = float(value)
+	return None if math.isnan(value) else value
+
+
+def _none_to_nan(value: Optional[float]) -> float:
+	return math.nan if value is None else value
+
+
+def _nan_statistics(*lists: Sequence[Sequence[float]]) -> List[Tuple[Any, ...]]:
+	"""
+	Returns the averages and standard deviations of each row of each of the given lists of lists of values,
+	ignoring NaN values, followed by the number of values in the row of the last list which aren't NaN.
+
+	Equivalent to the properties of :class:`~.ConsolidatedPeak` and :class:`~.ConsolidatedSearchResult`,
+	but calculated for all the peaks or hits in a project at once.
+
+	:param lists: Lists of lists of values. Each must have the same number of rows.
+	"""
+
+	if not lists[0]:
+		return []
+
+	try:
+		arrays = [numpy.array(rows, dtype=numpy.float64, ndmin=2) for rows in lists]
+	except ValueError:
+		# Rows of different lengths.
+		return [_nan_statistics(*([rows[idx]] for rows in lists))[0] for idx in range(len(lists[0]))]
+
+	with warnings.catch_warnings():
+		# Rows which are entirely NaN.
+		warnings.simplefilter("ignore", RuntimeWarning)
+		columns = []
+		for array in arrays:
+			columns.append(numpy.nanmean(array, axis=1))
+			columns.append(numpy.nanstd(array, axis=1))
+
+	counts = numpy.count_nonzero(~numpy.isnan(arrays[-1]), axis=1).tolist()
+	return [(*map(_nan_to_none, row), n) for row, n in zip(numpy.column_stack(columns).tolist(), counts)]
+
+
+def _hits_query(
+		columns: str,
+		name: Optional[str],
+		cas: Optional[str],
+		rt: Optional[float],
+		rt_tolerance: float,
+		max_hit_index: Optional[int],
+		projects: Optional[Collection[str]] = None,
+		) -> Tuple[str, List[Any]]:
+	"""
+	Returns an SQL query (and its parameters) selecting the given columns for the hits matching the criteria.
+
+	See :meth:`.ProjectStore.find_peaks` for details of the criteria.
+	"""
+
+	conditions = []
+	parameters: List[Any] = []
+
+	if name is not None:
+		conditions.append("hits.name = ? COLLATE NOCASE")
+		parameters.append(name)
+	if cas is not None:
+		conditions.append("hits.cas = ?")
+		parameters.append(_attrs_convert_cas(cas))
+	if rt is not None:
+		conditions.append("peaks.rt BETWEEN ? AND ?")
+		parameters.extend([rt - rt_tolerance, rt + rt_tolerance])
+	if max_hit_index is not None:
+		conditions.append("hits.hit_index <= ?")
+		parameters.append(max_hit_index)
+	if projects is not None:
+		projects = list(projects)
+		conditions.append(f"projects.name IN ({', '.join('?' * len(projects))})")
+		parameters.extend(projects)
+
+	query = (
+			f"SELECT {columns} FROM hits "
+			"JOIN peaks ON peaks.project_id = hits.project_id AND peaks.peak_index = hits.peak_index "
+			"JOIN projects ON projects.id = hits.project_id"
+			)
+	if conditions:
+		query += f" WHERE {' AND '.join(conditions)}"
+
+	return query, parameters
+
+
+class ProjectStore:
+	"""
+	An indexed store of the consolidated peaks from many projects, backed by an SQLite database.
+
+	:param filename: The database file, which is created if it doesn't exist.
+		By default the database is held in memory.
+
+	The store can be used as a context manager, which closes the database on exit.
+	"""
+
+	def __init__(self, filename: Union[PathLike, str] = ":memory:"):
+		self._connection = sqlite3.connect(os.fspath(filename))
+
+		version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+		if version not in {0, _SCHEMA_VERSION}:
+			self._connection.close()
+			raise ValueError(f"Unsupported store version {version} (expected {_SCHEMA_VERSION})")
+
+		with self._connection:
+			self._connection.executescript(_SCHEMA)
+			self._connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+	def close(self) -> None:
+		"""
+		Close the database.
+		"""
+
+		self._connection.close()
+
+	def __enter__(self) -> "ProjectStore":
+		return self
+
+	def __exit__(
+			self,
+			exc_type: Optional[Type[BaseException]],
+			exc_val: Optional[BaseException],
+			exc_tb: Optional[TracebackType],
+			) -> None:
+		self.close()
+
+	def add_projects(self, projects: Iterable[Union[Project, PathLike]]) -> List[str]:
+		"""
+		Add projects to the store, replacing any existing projects with the same names.
+
+		All projects are added in a single transaction, so if any of them fails to load
+		none are added.
+
+		:param projects: :class:`~.Project` objects, or the filenames of ``gsmp`` files.
+			Only the summary and consolidated peaks are read from each file
+			(see :meth:`~.Project.read_metadata` and :meth:`~.Project.load_consolidated_peaks`),
+			and the filename is recorded for :meth:`~.ProjectStore.load_project`.
+
+		:returns: The names of the projects added.
+		"""
+
+		names = []
+
+		with self._connection:
+			for project in projects:
+				if isinstance(project, Project):
+					filename = None
+					metadata = project._get_metadata()
+					consolidated_peaks = project.consolidated_peaks
+				else:
+					filename = os.path.abspath(project)
+					metadata = Project.read_metadata(filename)
+					consolidated_peaks = Project.load_consolidated_peaks(filename)
+
+				self._insert_project(metadata, consolidated_peaks, filename)
+				names.append(metadata["name"])
+
+		return names
+
+	def _insert_project(
+			self,
+			metadata: Dict[str, Any],
+			consolidated_peaks: Optional[List[ConsolidatedPeak]],
+			filename: Optional[str],
+			) -> None:
+		"""
+		Add a project to the store. Must be called within a transaction.
+
+		:param metadata: The project's summary.
+		:param consolidated_peaks:
+		:param filename: The file the project was read from, if any.
+		"""
+
+		self._delete_project(metadata["name"])
+
+		cursor = self._connection.execute(
+				"INSERT INTO projects (name, filename, n_aligned_peaks, n_consolidated_peaks, metadata) "
+				"VALUES (?, ?, ?, ?, ?)",
+				(
+						metadata["name"],
+						filename,
+						metadata.get("n_aligned_peaks"),
+						metadata.get("n_consolidated_peaks"),
+						sdjson.dumps(metadata),
+						),
+				)
+		project_id = cursor.lastrowid
+
+		self._connection.executemany(
+				"INSERT INTO repeats VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+				[(
+						project_id,
+						name,
+						repeat.get("user"),
+						repeat.get("device"),
+						repeat.get("date_created"),
+						repeat.get("date_modified"),
+						repeat.get("n_peaks"),
+						repeat.get("n_qualified_peaks"),
+						) for name, repeat in metadata.get("repeats", {}).items()],
+				)
+
+		consolidated_peaks = consolidated_peaks or []
+		peak_statistics = _nan_statistics(
+				[cp.area_list for cp in consolidated_peaks],
+				[cp.rt_list for cp in consolidated_peaks],
+				)
+
+		peak_rows: List[Tuple[Any, ...]] = []
+		hits: List[ConsolidatedSearchResult] = []
+		hit_keys: List[Tuple[Any, ...]] = []
+
+		for peak_index, (cp, statistics) in enumerate(zip(consolidated_peaks, peak_statistics)):
+			area, area_stdev, rt, rt_stdev, n_peaks = statistics
+			peak_rows.append((
+					project_id,
+					peak_index,
+					cp.meta.get("peak_number"),
+					rt,
+					rt_stdev,
+					area,
+					area_stdev,
+					n_peaks,
+					sdjson.dumps(cp.to_dict(compact="float64")),
+					))
+
+			for hit_index, hit in enumerate(cp.hits):
+				hits.append(hit)
+				hit_keys.append((project_id, peak_index, hit_index, hit.name, hit.cas))
+
+		hit_statistics = _nan_statistics(
+				[hit.mf_list for hit in hits],
+				[hit.rmf_list for hit in hits],
+				[hit.hit_numbers for hit in hits],
+				)
+		hit_rows = [(*key, *statistics) for key, statistics in zip(hit_keys, hit_statistics)]
+
+		self._connection.executemany("INSERT INTO peaks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", peak_rows)
+		self._connection.executemany("INSERT INTO hits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", hit_rows)
+
+	def _delete_project(self, name: str) -> bool:
+		row = self._connection.execute("SELECT id FROM projects WHERE name = ?", (name, )).fetchone()
+		if row is None:
+			return False
+
+		for table in ("hits", "peaks", "repeats"):
+			self._connection.execute(f"DELETE FROM {table} WHERE project_id = ?", row)
+		self._connection.execute("DELETE FROM projects WHERE id = ?", row)
+		return True
+
+	def remove_project(self, name: str) -> None:
+		"""
+		Remove a project from the store.
+
+		:param name: The name of the project.
+
+		:raises KeyError: If the project is not in the store.
+		"""
+
+		with self._connection:
+			if not self._delete_project(name):
+				raise KeyError(name)
+
+	@property
+	def project_names(self) -> List[str]:
+		"""
+		The names of the projects in the store, in alphabetical order.
+		"""
+
+		return [row[0] for row in self._connection.execute("SELECT name FROM projects ORDER BY name")]
+
+	def __contains__(self, name: object) -> bool:
+		row = self._connection.execute("SELECT 1 FROM projects WHERE name = ?", (name, )).fetchone()
+		return row is not None
+
+	def __len__(self) -> int:
+		return self._connection.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+
+	def get_metadata(self, name: str) -> Dict[str, Any]:
+		"""
+		Returns the summary of a project in the store (see :meth:`~.Project.read_metadata`).
+
+		:param name: The name of the project.
+
+		:raises KeyError: If the project is not in the store.
+		"""
+
+		row = self._connection.execute("SELECT metadata FROM projects WHERE name = ?", (name, )).fetchone()
+		if row is None:
+			raise KeyError(name)
+
+		return sdjson.loads(row[0])
+
+	def find_peaks(
+			self,
+			name: Optional[str] = None,
+			cas: Optional[str] = None,
+			rt: Optional[float] = None,
+			rt_tolerance: float = 5.0,
+			max_hit_index: Optional[int] = None,
+			projects: Optional[Collection[str]] = None,
+			) -> List[PeakMatch]:
+		"""
+		Find the consolidated peaks with a given compound in their hits, near a given retention time.
+
+		:param name: The name of the compound (case-insensitive).
+		:param cas: The CAS number of the compound.
+		:param rt: The retention time of the peak, in seconds.
+		:param rt_tolerance: The maximum difference between ``rt`` and the average retention time of the peak,
+			in seconds.
+		:param max_hit_index: If given, only hits up to this position in each peak's hits are considered
+			(e.g. ``0`` for the best hit only).
+		:param projects: If given, only search these projects.
+
+		:returns: The matching hits, ordered by project name, then peak, then hit.
+		"""
+
+		columns = (
+				"projects.name, peaks.peak_index, peaks.rt, peaks.area, hits.hit_index, hits.name, hits.cas, "
+				"hits.match_factor, hits.reverse_match_factor, hits.average_hit_number, hits.n_peaks"
+				)
+		query, parameters = _hits_query(columns, name, cas, rt, rt_tolerance, max_hit_index, projects)
+		query += " ORDER BY projects.name, peaks.peak_index, hits.hit_index"
+
+		matches = []
+		for row in self._connection.execute(query, parameters):
+			project, peak_index, peak_rt, area, hit_index, hit_name, hit_cas, mf, rmf, hit_number, n_peaks = row
+			matches.append(
+					PeakMatch(
+							project=project,
+							peak_index=peak_index,
+							rt=_none_to_nan(peak_rt),
+							area=_none_to_nan(area),
+							hit_index=hit_index,
+							name=hit_name,
+							cas=hit_cas,
+							match_factor=_none_to_nan(mf),
+							reverse_match_factor=_none_to_nan(rmf),
+							average_hit_number=_none_to_nan(hit_number),
+							n_peaks=n_peaks,
+							)
+					)
+
+		return matches
+
+	def find_projects(
+			self,
+			name: Optional[str] = None,
+			cas: Optional[str] = None,
+			rt: Optional[float] = None,
+			rt_tolerance: float = 5.0,
+			max_hit_index: Optional[int] = None,
+			) -> List[str]:
+		"""
+		Find the projects with a consolidated peak with a given compound in its hits, near a given retention time.
+
+		:param name: The name of the compound (case-insensitive).
+		:param cas: The CAS number of the compound.
+		:param rt: The retention time of the peak, in seconds.
+		:param rt_tolerance: The maximum difference between ``rt`` and the average retention time of the peak,
+			in seconds.
+		:param max_hit_index: If given, only hits up to this position in each peak's hits are considered
+			(e.g. ``0`` for the best hit only).
+
+		:returns: The names of the matching projects, in alphabetical order.
+		"""
+
+		query, parameters = _hits_query("DISTINCT projects.name", name, cas, rt, rt_tolerance, max_hit_index)
+		query += " ORDER BY projects.name"
+		return [row[0] for row in self._connection.execute(query, parameters)]
+
+	def load_consolidated_peak(self, project: str, peak_index: int) -> ConsolidatedPeak:
+		"""
+		Reconstruct a consolidated peak from the store.
+
+		:param project: The name of the project.
+		:param peak_index: The index of the peak in the project's :attr:`~.Project.consolidated_peaks`.
+
+		:raises KeyError: If the peak is not in the store.
+		"""
+
+		row = self._connection.execute(
+				"SELECT peaks.data FROM peaks JOIN projects ON projects.id = peaks.project_id "
+				"WHERE projects.name = ? AND peaks.peak_index = ?",
+				(project, peak_index),
+				).fetchone()
+
+		if row is None:
+			raise KeyError((project, peak_index))
+
+		return ConsolidatedPeak.from_dict(sdjson.loads(row[0]))
+
+	def load_consolidated_peaks(self, project: str) -> Optional[List[ConsolidatedPeak]]:
+		"""
+		Reconstruct a project's consolidated peaks from the store.
+
+		:param project: The name of the project.
+
+		:returns: The consolidated peaks, or :py:obj:`None` if the project had not been consolidated.
+
+		:raises KeyError: If the project is not in the store.
+		"""
+
+		if self.get_metadata(project)["n_consolidated_peaks"] is None:
+			return None
+
+		rows = self._connection.execute(
+				"SELECT peaks.data FROM peaks JOIN projects ON projects.id = peaks.project_id "
+				"WHERE projects.name = ? ORDER BY peaks.peak_index",
+				(project, ),
+				)
+
+		return [ConsolidatedPeak.from_dict(sdjson.loads(row[0])) for row in rows]
+
+	def load_project(self, project: str, lazy: bool = False) -> Project:
+		"""
+		Load a project from the file it was added to the store from.
+
+		:param project: The name of the project.
+		:param lazy: Passed to :meth:`Project.from_file() <.Project.from_file>`.
+
+		:raises KeyError: If the project is not in the store.
+		:raises ValueError: If the project was added as a :class:`~.Project` object rather than from a file.
+		"""
+
+		row = self._connection.execute("SELECT filename FROM projects WHERE name = ?", (project, )).fetchone()
+		if row is None:
+			raise KeyError(project)
+
+		filename = row[0]
+		if filename is None:
+			raise ValueError(f"Project {project!r} was not added from a file")
+
+		return Project.from_file(filename, lazy=lazy)
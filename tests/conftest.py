@@ -1,9 +1,25 @@
+# stdlib
+import datetime
+from typing import Callable, List
+
 # 3rd party
 import numpy
+import pytest
 from coincidence.regressions import _representer_for
 from pytest_regressions.data_regression import RegressionYamlDumper
+from pyms.IntensityMatrix import IntensityMatrix
+from pyms.Peak.Class import Peak
+from pyms.Spectrum import MassSpectrum
+from pyms_nist_search import SearchResult
 from yaml.representer import RepresenterError
 
+# this package
+from libgunshotmatch.consolidate import ConsolidatedPeak, ConsolidatedSearchResult
+from libgunshotmatch.datafile import Datafile, FileType, Repeat
+from libgunshotmatch.peak import PeakList, QualifiedPeak
+from libgunshotmatch.project import Project
+from libgunshotmatch.utils import create_alignment
+
 pytest_plugins = ("coincidence", )
 
 
@@ -30,3 +46,97 @@ def _represent_numpy(dumper: RegressionYamlDumper, data: int):  # noqa: MAN002
 # 	if data == 0:
 # 		return dumper.represent_data(0)
 # 	return dumper.represent_data(str(round_rt(data)))
+
+
+_date = datetime.datetime(2023, 5, 1, 12, 0, 0)
+
+
+def _make_repeat(name: str, seed: int) -> Repeat:
+	# Small synthetic repeat, much quicker to create than running peak detection on the example data.
+	rng = numpy.random.default_rng(seed)
+	times = [60.0 + 0.5 * i for i in range(200)]
+	masses = list(range(50, 100))
+	intensity_matrix = IntensityMatrix(times, masses, rng.uniform(0, 1000, (len(times), len(masses))))
+
+	peaks: List[Peak] = []
+	qualified_peaks = []
+	for idx, rt in enumerate([70.0, 80.5, 95.0]):
+		ms = MassSpectrum(masses, rng.uniform(0, 500, len(masses)).tolist())
+		peak = Peak(rt, ms, outlier=False)
+		peak.area = float(idx * 1000 + 123.4)
+		peak.bounds = (1, 5, 1)
+		peaks.append(peak)
+
+		qualified_peak = QualifiedPeak.from_peak(peak)
+		qualified_peak.peak_number = idx + 1
+		qualified_peak.hits = [SearchResult(f"Compound {idx}", "64-17-5", 900, 910, 95.5, 1, 2)]
+		qualified_peaks.append(qualified_peak)
+
+	datafile = Datafile(
+			name=name,
+			original_filename=f"/data/{name}.JDX",
+			original_filetype=FileType.JDX,
+			intensity_matrix=intensity_matrix,
+			user="test-user",
+			device="test-device",
+			date_created=_date,
+			date_modified=_date,
+			)
+
+	return Repeat(
+			datafile=datafile,
+			peaks=PeakList(peaks),
+			qualified_peaks=qualified_peaks,
+			user="test-user",
+			device="test-device",
+			date_created=_date,
+			date_modified=_date,
+			)
+
+
+def _make_project(n_repeats: int = 2) -> Project:
+	repeats = {f"repeat_{idx}": _make_repeat(f"repeat_{idx}", idx) for idx in range(n_repeats)}
+	peakpos = [list(repeat.peaks) for repeat in repeats.values()]
+	alignment = create_alignment(peakpos, list(repeats), 0.75)
+
+	consolidated_peaks = []
+	for peak_idx, row in enumerate(zip(*peakpos)):
+		hit = ConsolidatedSearchResult(
+				name=f"Compound {peak_idx}",
+				cas="64-17-5",
+				mf_list=[900] * (n_repeats - 1) + [float("nan")],  # type: ignore[list-item]
+				rmf_list=[910] * (n_repeats - 1) + [float("nan")],  # type: ignore[list-item]
+				hit_numbers=[1] * (n_repeats - 1) + [float("nan")],  # type: ignore[list-item]
+				)
+		consolidated_peaks.append(
+				ConsolidatedPeak(
+						rt_list=[peak.rt for peak in row],
+						area_list=[peak.area for peak in row],
+						ms_list=[peak.mass_spectrum for peak in row],
+						hits=[hit],
+						ms_comparison={"repeat_0 vs repeat_1": 950.0},
+						meta={"peak_number": peak_idx + 1},
+						)
+				)
+
+	return Project(
+			name="project",
+			alignment=alignment,
+			datafile_data=repeats,
+			consolidated_peaks=consolidated_peaks,
+			)
+
+
+@pytest.fixture()
+def repeat() -> Repeat:
+	return _make_repeat("repeat", 1234)
+
+
+@pytest.fixture()
+def project() -> Project:
+	return _make_project()
+
+
+@pytest.fixture()
+def project_factory() -> Callable[..., Project]:
+	return _make_project
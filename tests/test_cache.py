@@ -0,0 +1,155 @@
+# stdlib
+import functools
+import os
+import shutil
+
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus
+from pyms.GCMS.Class import GCMS_data
+from pyms.GCMS.IO.JCAMP import JCAMP_reader
+from pyms.Spectrum import Scan
+
+# this package
+from libgunshotmatch.cache import GCMSDataCache, get_default_cache, set_default_cache
+from libgunshotmatch.datafile import Datafile
+
+jdx_path = PathPlus(__file__).parent / "ELEY_1_SUBTRACT.JDX"
+
+
+def _check_gcms_data(gcms_data: GCMS_data, expected: GCMS_data) -> None:
+	assert gcms_data.time_list == expected.time_list
+	assert gcms_data.min_mass == expected.min_mass
+	assert gcms_data.max_mass == expected.max_mass
+	assert gcms_data.time_step == expected.time_step
+	assert gcms_data.time_step_std == expected.time_step_std
+	assert len(gcms_data.scan_list) == len(expected.scan_list)
+	for scan, expected_scan in zip(gcms_data.scan_list, expected.scan_list):
+		assert scan.mass_list == expected_scan.mass_list
+		assert scan.intensity_list == expected_scan.intensity_list
+		assert scan.min_mass == expected_scan.min_mass
+		assert scan.max_mass == expected_scan.max_mass
+	assert list(gcms_data.tic.intensity_array) == list(expected.tic.intensity_array)
+
+
+def test_cache(tmp_pathplus: PathPlus):
+	cache = GCMSDataCache(tmp_pathplus / "cache")
+	expected = JCAMP_reader(jdx_path)
+
+	calls = []
+
+	def reader(filename: PathPlus) -> GCMS_data:
+		calls.append(filename)
+		return JCAMP_reader(filename)
+
+	_check_gcms_data(cache.load(jdx_path, reader), expected)
+	assert len(calls) == 1
+	assert len(cache) == 1
+
+	# From the cache
+	_check_gcms_data(cache.load(jdx_path, reader), expected)
+	assert len(calls) == 1
+
+	# Keyed by content, not filename.
+	shutil.copy(jdx_path, tmp_pathplus / "copy.JDX")
+	cache.load(tmp_pathplus / "copy.JDX", reader)
+	assert len(calls) == 1
+
+	(tmp_pathplus / "copy.JDX").write_text((tmp_pathplus / "copy.JDX").read_text().replace("##TITLE=", "##TITLE=x"))
+	cache.load(tmp_pathplus / "copy.JDX", reader)
+	assert len(calls) == 2
+	assert len(cache) == 2
+
+	# Corrupt entries are discarded.
+	key = cache.key(jdx_path, reader)
+	(cache.directory / f"{key}.gcms").write_bytes(b"not a zip file")
+	assert cache.get(key) is None
+	_check_gcms_data(cache.load(jdx_path, reader), expected)
+	assert len(calls) == 3
+
+	# Scans from the cache are ordinary Scan objects.
+	scan = cache.load(jdx_path, reader).scan_list[0]
+	assert type(scan) is Scan
+	assert scan == Scan(scan.mass_list, scan.intensity_list)
+
+	cache.clear()
+	assert len(cache) == 0
+	assert cache.size == 0
+
+
+def test_cache_scan_order(tmp_pathplus: PathPlus):
+	cache = GCMSDataCache(tmp_pathplus / "cache")
+
+	with pytest.warns(UserWarning, match="Unknown sort order for mass list"):
+		scans = [
+				Scan([52.0, 50.0, 51.0], [1.0, 2.0, 3.0]),
+				Scan([], []),
+				Scan([60.0, 55.0], [4.0, 5.0]),
+				Scan([45.0], [6.0]),
+				]
+	expected = GCMS_data([1.0, 2.0, 3.0, 4.0], scans)
+
+	def reader(filename: PathPlus) -> GCMS_data:
+		return expected
+
+	cache.load(jdx_path, reader)
+	gcms_data = cache.get(cache.key(jdx_path, reader))
+	assert gcms_data is not None
+	_check_gcms_data(gcms_data, expected)
+	mass_ranges = [(scan.min_mass, scan.max_mass) for scan in gcms_data.scan_list]
+	assert mass_ranges == [(50, 52), (None, None), (55, 60), (45, 45)]
+	assert (gcms_data.min_mass, gcms_data.max_mass) == (45, 60)
+
+
+def test_cache_key_callables(tmp_pathplus: PathPlus):
+	cache = GCMSDataCache(tmp_pathplus / "cache")
+
+	# Callables without a __qualname__, such as partial objects.
+	reader = functools.partial(JCAMP_reader)
+	key = cache.key(jdx_path, reader)
+	assert key == cache.key(jdx_path, reader)
+	assert key != cache.key(jdx_path, JCAMP_reader)
+	_check_gcms_data(cache.load(jdx_path, reader), JCAMP_reader(jdx_path))
+	assert cache.get(key) is not None
+
+
+def test_cache_eviction(tmp_pathplus: PathPlus):
+	cache = GCMSDataCache(tmp_pathplus / "cache", max_size=None)
+	gcms_data = JCAMP_reader(jdx_path)
+
+	for key in "abc":
+		cache.put(key, gcms_data)
+		# Ensure distinct modification times.
+		os.utime(cache.directory / f"{key}.gcms", ns=(0, ord(key) * 1_000_000_000))
+
+	entry_size = cache.size // 3
+	assert cache.get("a") is not None  # Now the most recently used
+
+	cache.trim(entry_size * 2)
+	assert cache.get("b") is None
+	assert cache.get("a") is not None
+	assert cache.get("c") is not None
+
+	cache.max_size = entry_size
+	cache.put("d", gcms_data)
+	assert len(cache) == 1
+	assert cache.get("d") is not None
+
+
+def test_load_gcms_data(tmp_pathplus: PathPlus):
+	datafile = Datafile.new(jdx_path.stem, jdx_path)
+	expected = datafile.load_gcms_data()
+
+	cache = GCMSDataCache(tmp_pathplus / "cache")
+	_check_gcms_data(datafile.load_gcms_data(cache=cache), expected)
+	assert len(cache) == 1
+
+	previous = set_default_cache(cache)
+	try:
+		assert get_default_cache() is cache
+		_check_gcms_data(datafile.load_gcms_data(), expected)
+		assert len(cache) == 1
+	finally:
+		set_default_cache(previous)
+
+	assert get_default_cache() is previous
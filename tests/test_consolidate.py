@@ -1,4 +1,5 @@
 # stdlib
+import math
 from operator import attrgetter
 from typing import Optional
 
@@ -13,11 +14,13 @@ from pytest_regressions.dataframe_regression import DataFrameRegressionFixture
 # this package
 from libgunshotmatch.consolidate import (
 		ConsolidatedPeakFilter,
+		ConsolidatedSearchResult,
 		InvertedFilter,
 		combine_spectra,
 		pairwise_ms_comparisons
 		)
 from libgunshotmatch.consolidate._fields import _attrs_convert_reference_data
+from libgunshotmatch.gzip_util import read_gzip_json, write_gzip_json
 from libgunshotmatch.project import Project
 
 # Test consolidate process from gsmp file
@@ -146,6 +149,26 @@ def test_consolidated_peak_attributes():
 	assert len(bottom_hit) == 1
 
 
+def test_consolidated_search_result_nan(tmp_pathplus: PathPlus):
+	hit = ConsolidatedSearchResult(
+			name="Diphenylamine",
+			cas="122-39-4",
+			mf_list=[900, 850, float("nan")],  # type: ignore[list-item]
+			rmf_list=[910, 860, float("nan")],  # type: ignore[list-item]
+			hit_numbers=[1, 2, float("nan")],  # type: ignore[list-item]
+			)
+	write_gzip_json(tmp_pathplus / "hit.json.gz", hit.to_dict())
+
+	as_dict = read_gzip_json(tmp_pathplus / "hit.json.gz")
+	assert isinstance(as_dict, dict)
+	loaded = ConsolidatedSearchResult.from_dict(as_dict)
+	assert loaded.mf_list[:2] == [900, 850]
+	assert math.isnan(loaded.mf_list[2])
+	assert math.isnan(loaded.rmf_list[2])
+	assert len(loaded) == 2
+	assert loaded.match_factor == 875
+
+
 def test_pairwise_ms_comparison(dataframe_regression: DataFrameRegressionFixture):
 	project_file = PathPlus(__file__).parent / "ELEY .22LR.gsmp"
 	project = Project.from_file(project_file)
@@ -0,0 +1,480 @@
+# stdlib
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+# 3rd party
+import numpy
+import pytest
+import sdjson
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from libgunshotmatch.container import (
+		UNCHANGED,
+		decode_array,
+		encode_array,
+		get_section_name,
+		is_array_reference,
+		is_container,
+		read_container,
+		read_document,
+		read_metadata,
+		read_section,
+		read_section_hashes,
+		update_container,
+		write_container
+		)
+from libgunshotmatch.datafile import Datafile, Repeat
+from libgunshotmatch.gzip_util import write_gzip_json
+from libgunshotmatch.project import Project
+
+
+def test_container_roundtrip(tmp_pathplus: PathPlus):
+	data: Dict[str, Any] = {
+			"name": "test",
+			"nan": float("nan"),
+			"float64": numpy.arange(12, dtype=numpy.float64).reshape(3, 4),
+			"int32_big_endian": numpy.arange(5, dtype=">i4"),
+			"empty": numpy.empty((0, 3)),
+			"nested": [None, {"float32": numpy.linspace(0, 1, 7, dtype=numpy.float32)}],
+			}
+
+	write_container(tmp_pathplus / "test.gsmd", data)
+	assert is_container(tmp_pathplus / "test.gsmd")
+
+	loaded = read_container(tmp_pathplus / "test.gsmd")
+	assert isinstance(loaded, dict)
+	assert loaded["name"] == "test"
+	assert numpy.isnan(loaded["nan"])
+
+	numpy.testing.assert_array_equal(loaded["float64"], data["float64"])
+	assert loaded["float64"].dtype == numpy.float64
+	numpy.testing.assert_array_equal(loaded["int32_big_endian"], data["int32_big_endian"])
+	assert loaded["int32_big_endian"].dtype == numpy.dtype("<i4")
+	assert loaded["empty"].shape == (0, 3)
+	assert loaded["nested"][0] is None
+	numpy.testing.assert_array_equal(loaded["nested"][1]["float32"], data["nested"][1]["float32"])
+	assert loaded["nested"][1]["float32"].dtype == numpy.float32
+
+
+@pytest.mark.parametrize("dtype", ["<f4", ">f8", "<u2", "<i8"])
+def test_encode_array(tmp_pathplus: PathPlus, dtype: str):
+	array = numpy.arange(12).reshape(3, 4).astype(dtype)
+	reference = encode_array(array)
+	assert is_array_reference(reference)
+	assert not is_array_reference({**reference, "name": "test"})
+	assert not is_array_reference(array.tolist())
+
+	decoded = decode_array(reference)
+	assert decoded.dtype == array.dtype.newbyteorder('<')
+	numpy.testing.assert_array_equal(decoded, array)
+
+	# Inline references can also be written to JSON, and are decoded when read back.
+	write_gzip_json(tmp_pathplus / "test.json.gz", {"array": reference})
+	as_dict = read_document(tmp_pathplus / "test.json.gz")
+	assert isinstance(as_dict, dict)
+	assert is_array_reference(as_dict["array"])
+	write_container(tmp_pathplus / "test.gsmd", {"array": reference})
+	as_dict = read_container(tmp_pathplus / "test.gsmd")
+	assert isinstance(as_dict, dict)
+	numpy.testing.assert_array_equal(as_dict["array"], array)
+
+
+def test_container_reproducible(tmp_pathplus: PathPlus):
+	data = {"array": numpy.arange(100), "name": "test"}
+	write_container(tmp_pathplus / "a.gsmd", data)
+	write_container(tmp_pathplus / "b.gsmd", data)
+	assert (tmp_pathplus / "a.gsmd").read_bytes() == (tmp_pathplus / "b.gsmd").read_bytes()
+
+
+def test_read_document(tmp_pathplus: PathPlus):
+	data = {"hello": "world", "list": [1, 2, 3]}
+
+	write_gzip_json(tmp_pathplus / "test.gsmd", data)
+	assert not is_container(tmp_pathplus / "test.gsmd")
+	assert read_document(tmp_pathplus / "test.gsmd") == data
+
+	write_container(tmp_pathplus / "test.gsmd", data)
+	assert is_container(tmp_pathplus / "test.gsmd")
+	assert read_document(tmp_pathplus / "test.gsmd") == data
+
+
+def test_not_a_container(tmp_pathplus: PathPlus):
+	with zipfile.ZipFile(tmp_pathplus / "test.zip", 'w') as zf:
+		zf.writestr("index.json", '{"format": "something-else", "version": 1}')
+
+	with pytest.raises(ValueError, match="is not a GunShotMatch container file"):
+		read_container(tmp_pathplus / "test.zip")
+
+
+@pytest.mark.parametrize(
+		"filename",
+		[
+				"ELEY_1_SUBTRACT.gsmd",
+				"ELEY_2_SUBTRACT.gsmd",
+				"ELEY_3_SUBTRACT.gsmd",
+				"ELEY_4_SUBTRACT.gsmd",
+				"ELEY_5_SUBTRACT.gsmd",
+				]
+		)
+def test_datafile_binary_roundtrip(filename: str, tmp_pathplus: PathPlus):
+	datafile = Datafile.from_file(PathPlus(__file__).parent / filename)
+
+	export_filename = datafile.export(tmp_pathplus, binary=True)
+	assert is_container(export_filename)
+
+	loaded = Datafile.from_file(export_filename)
+	assert loaded.to_dict() == datafile.to_dict()
+
+	assert loaded.intensity_matrix is not None
+	assert loaded.intensity_matrix._intensity_array.flags.writeable
+	assert isinstance(loaded.intensity_matrix.time_list[0], float)
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_repeat_binary_roundtrip(tmp_pathplus: PathPlus, repeat: Repeat, compression: int):
+	export_filename = repeat.export(tmp_pathplus, binary=True, compression=compression)
+	assert is_container(export_filename)
+	with zipfile.ZipFile(export_filename) as zf:
+		assert {info.compress_type for info in zf.infolist()} == {compression}
+
+	loaded = Repeat.from_file(export_filename)
+	assert loaded.to_dict() == repeat.to_dict()
+	assert loaded.peaks.datafile_name == "repeat"
+
+
+def test_project_binary_roundtrip(tmp_pathplus: PathPlus, project: Project):
+
+	binary_filename = project.export(tmp_pathplus, binary=True)
+	assert is_container(binary_filename)
+	from_binary = Project.from_file(binary_filename)
+
+	(tmp_pathplus / "json").mkdir()
+	json_filename = project.export(tmp_pathplus / "json")
+	from_json = Project.from_file(json_filename)
+
+	assert sdjson.dumps(from_binary.to_dict()) == sdjson.dumps(project.to_dict())
+	assert sdjson.dumps(from_binary.to_dict()) == sdjson.dumps(from_json.to_dict())
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_container_mmap(tmp_pathplus: PathPlus, compression: int):
+	data: Dict[str, numpy.ndarray] = {
+			"float64": numpy.arange(12, dtype=numpy.float64).reshape(3, 4),
+			"int32": numpy.arange(5, dtype=numpy.int32),
+			"empty": numpy.empty((0, 3)),
+			}
+
+	write_container(tmp_pathplus / "test.gsmd", data, compression=compression)
+	loaded = read_container(tmp_pathplus / "test.gsmd", mmap=True)
+	assert isinstance(loaded, dict)
+
+	for key, expected in data.items():
+		if expected.size:
+			assert isinstance(loaded[key], numpy.memmap)
+		assert not loaded[key].flags.writeable
+		assert loaded[key].dtype == expected.dtype
+		numpy.testing.assert_array_equal(loaded[key], expected)
+
+
+def test_container_rewrite_mmap(tmp_pathplus: PathPlus):
+	filename = tmp_pathplus / "test.gsmd"
+	data = {"array": numpy.arange(100_000, dtype=numpy.float64)}
+	write_container(filename, data, compression=zipfile.ZIP_STORED)
+	loaded = read_container(filename, mmap=True)
+	assert isinstance(loaded, dict)
+	assert isinstance(loaded["array"], numpy.memmap)
+
+	# Re-exporting over the file (with smaller arrays) leaves the existing mapping valid.
+	write_container(filename, {"array": numpy.arange(10, dtype=numpy.float64)}, compression=zipfile.ZIP_STORED)
+	numpy.testing.assert_array_equal(loaded["array"], data["array"])
+	assert [p.name for p in tmp_pathplus.iterdir()] == ["test.gsmd"]
+
+	reloaded = read_container(filename, mmap=True)
+	assert isinstance(reloaded, dict)
+	numpy.testing.assert_array_equal(reloaded["array"], numpy.arange(10))
+
+	# The existing file is left as it was if writing fails.
+	with pytest.raises(TypeError):
+		write_container(filename, {"array": object()}, compression=zipfile.ZIP_STORED)
+	assert [p.name for p in tmp_pathplus.iterdir()] == ["test.gsmd"]
+	reloaded = read_container(filename)
+	assert isinstance(reloaded, dict)
+	numpy.testing.assert_array_equal(reloaded["array"], numpy.arange(10))
+
+
+def test_container_stored_alignment(tmp_pathplus: PathPlus):
+	# Vary the preceding members' sizes so the arrays member starts at different offsets.
+	for name_length in range(1, 70, 7):
+		data = {"name": 'a' * name_length, "array": numpy.arange(10, dtype=numpy.float64)}
+		write_container(tmp_pathplus / "test.gsmd", data, compression=zipfile.ZIP_STORED)
+
+		with zipfile.ZipFile(tmp_pathplus / "test.gsmd") as zf:
+			assert zf.testzip() is None
+			info = zf.getinfo("root.bin")
+			with zf.open(info) as f:
+				f.read()
+			header_size = 30 + len(info.filename) + len(info.extra) + 20
+			assert (info.header_offset + header_size) % 64 == 0
+
+		loaded = read_container(tmp_pathplus / "test.gsmd", mmap=True)
+		assert isinstance(loaded, dict)
+		numpy.testing.assert_array_equal(loaded["array"], data["array"])
+
+
+def test_datafile_mmap(tmp_pathplus: PathPlus):
+	datafile = Datafile.from_file(PathPlus(__file__).parent / "ELEY_1_SUBTRACT.gsmd")
+	export_filename = datafile.export(tmp_pathplus, binary=True)
+
+	loaded = Datafile.from_file(export_filename, mmap=True)
+	assert loaded.intensity_matrix is not None
+	assert isinstance(loaded.intensity_matrix._intensity_array, numpy.memmap)
+	assert not loaded.intensity_matrix._intensity_array.flags.writeable
+	assert loaded.to_dict() == datafile.to_dict()
+
+	# Uncompressed containers are mapped in place.
+	export_filename = datafile.export(tmp_pathplus, binary=True, compression=zipfile.ZIP_STORED)
+	with zipfile.ZipFile(export_filename) as zf:
+		assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+
+	loaded = Datafile.from_file(export_filename, mmap=True)
+	assert loaded.intensity_matrix is not None
+	assert isinstance(loaded.intensity_matrix._intensity_array, numpy.memmap)
+	assert loaded.intensity_matrix._intensity_array.filename == export_filename
+	assert loaded.to_dict() == datafile.to_dict()
+
+	# Has no effect for gzipped JSON
+	loaded = Datafile.from_file(PathPlus(__file__).parent / "ELEY_1_SUBTRACT.gsmd", mmap=True)
+	assert loaded.intensity_matrix is not None
+	assert not isinstance(loaded.intensity_matrix._intensity_array, numpy.memmap)
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_project_mmap(tmp_pathplus: PathPlus, project: Project, compression: int):
+	export_filename = project.export(tmp_pathplus, binary=True, compression=compression)
+	loaded = Project.from_file(export_filename, mmap=True)
+
+	for repeat in loaded.datafile_data.values():
+		assert repeat.datafile.intensity_matrix is not None
+		assert isinstance(repeat.datafile.intensity_matrix._intensity_array, numpy.memmap)
+		mapped_file = repeat.datafile.intensity_matrix._intensity_array.filename
+		assert (mapped_file == export_filename) is (compression == zipfile.ZIP_STORED)
+
+	assert sdjson.dumps(loaded.to_dict()) == sdjson.dumps(project.to_dict())
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_container_sections(tmp_pathplus: PathPlus, compression: int):
+	data = {
+			"name": "test",
+			"alignment": {"peaks": [[1, 2], [3, None]], "similarity": 0.75},
+			"datafile_data": {
+					"a": {"array": numpy.arange(10, dtype=numpy.float64), "name": 'a'},
+					"b": {"array": numpy.arange(20, dtype=numpy.int32).reshape(4, 5), "name": 'b'},
+					},
+			"list": [numpy.arange(3), "text"],
+			"missing": None,
+			}
+
+	filename = tmp_pathplus / "test.gsmp"
+	write_container(
+			filename,
+			data,
+			compression=compression,
+			sections=("alignment", "missing", "not_present"),
+			expand=("datafile_data", "list"),
+			)
+
+	with zipfile.ZipFile(filename) as zf:
+		assert zf.namelist()[0] == "index.json"
+		index = sdjson.loads(zf.read("index.json"))
+
+	assert list(index["sections"]) == [
+			"root",
+			"alignment",
+			"missing",
+			"datafile_data/a",
+			"datafile_data/b",
+			"list/0",
+			"list/1",
+			]
+	assert index["sections"]["alignment"] == {
+			"document": "alignment.json",
+			"arrays": None,
+			"sha256": hashlib.sha256(zipfile.ZipFile(filename).read("alignment.json")).hexdigest(),
+			}
+	assert index["sections"]["datafile_data/a"] == {
+			"document": "datafile_data/a.json",
+			"arrays": "datafile_data/a.bin",
+			"sha256": index["sections"]["datafile_data/a"]["sha256"],
+			}
+	assert index["sections"]["datafile_data/a"]["sha256"] != index["sections"]["datafile_data/b"]["sha256"]
+
+	assert read_section(filename, "alignment") == data["alignment"]
+	assert read_section(filename, "missing") is None
+	section = read_section(filename, "datafile_data/b")
+	assert isinstance(section, dict)
+	numpy.testing.assert_array_equal(section["array"], data["datafile_data"]["b"]["array"])  # type: ignore[index]
+
+	root = read_section(filename, "root")
+	assert isinstance(root, dict)
+	assert root["name"] == "test"
+	assert root["alignment"] == {"__section__": "alignment"}
+	assert root["datafile_data"] == {
+			'a': {"__section__": "datafile_data/a"},
+			'b': {"__section__": "datafile_data/b"},
+			}
+
+	with pytest.raises(KeyError, match="datafile_data/c"):
+		read_section(filename, "datafile_data/c")
+
+	hashes = read_section_hashes(filename)
+	assert list(hashes) == list(index["sections"])
+	assert hashes["alignment"] == index["sections"]["alignment"]["sha256"]
+	assert read_section(filename, "alignment", sha256=hashes["alignment"]) == data["alignment"]
+	with pytest.raises(ValueError, match="Section 'alignment' of .* has changed."):
+		read_section(filename, "alignment", sha256=hashes["root"])
+
+	assert get_section_name(root["alignment"]) == "alignment"
+	assert get_section_name(root["name"]) is None
+	assert get_section_name({"__section__": "alignment", "other": 1}) is None
+
+	with ThreadPoolExecutor(4) as executor:
+		for loaded in [
+				read_container(filename),
+				read_container(filename, executor=executor),
+				read_container(filename, mmap=True, executor=executor),
+				]:
+			assert isinstance(loaded, dict)
+			assert list(loaded) == list(data)
+			assert sdjson.dumps(loaded) == sdjson.dumps(data)
+			assert loaded["datafile_data"]["b"]["array"].dtype == numpy.int32
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_update_container(tmp_pathplus: PathPlus, compression: int):
+	data = {
+			"name": "test",
+			"alignment": {"similarity": 0.75},
+			"datafile_data": {
+					"a": {"array": numpy.arange(10, dtype=numpy.float64)},
+					"b": {"array": numpy.arange(20, dtype=numpy.int32)},
+					},
+			}
+	sections, expand = ("alignment", ), ("datafile_data", )
+
+	filename = tmp_pathplus / "test.gsmp"
+	write_container(filename, data, compression, sections, expand, metadata={"version": 1})
+	mapped = read_container(filename, mmap=True)
+	assert isinstance(mapped, dict)
+
+	updated = {
+			"name": "updated",
+			"alignment": UNCHANGED,
+			"datafile_data": {"b": {"array": numpy.arange(5, dtype=numpy.int64)}, "c": UNCHANGED},
+			}
+
+	# Nothing is written if an unchanged section is missing.
+	content = filename.read_bytes()
+	with pytest.raises(KeyError, match="datafile_data/c"):
+		update_container(filename, updated, sections, expand, compression=compression)
+	assert filename.read_bytes() == content
+
+	# Nothing is written if the content is the same.
+	unchanged = {**data, "alignment": UNCHANGED}
+	assert not update_container(filename, unchanged, sections, expand, metadata={"version": 1}, compression=compression)
+	assert filename.read_bytes() == content
+
+	updated["datafile_data"] = {"b": {"array": numpy.arange(5, dtype=numpy.int64)}, "a": UNCHANGED}
+	assert update_container(filename, updated, sections, expand, metadata={"version": 2}, compression=compression)
+
+	# The file is rewritten in full, without any superseded members.
+	with zipfile.ZipFile(filename) as zf:
+		assert zf.namelist() == [
+				"index.json",
+				"root.json",
+				"root.bin",
+				"alignment.json",
+				"datafile_data/b.json",
+				"datafile_data/b.bin",
+				"datafile_data/a.json",
+				"datafile_data/a.bin",
+				]
+	assert [p.name for p in tmp_pathplus.iterdir()] == ["test.gsmp"]
+
+	assert read_metadata(filename) == {"version": 2}
+
+	expected = {
+			"name": "updated",
+			"alignment": {"similarity": 0.75},
+			"datafile_data": {"b": {"array": numpy.arange(5)}, 'a': {"array": numpy.arange(10.0)}},
+			}
+	for loaded in [read_container(filename), read_container(filename, mmap=True)]:
+		assert sdjson.dumps(loaded) == sdjson.dumps(expected)
+
+	# The sections copied from the old file are identical to a full rewrite.
+	write_container(tmp_pathplus / "full.gsmp", expected, compression, sections, expand, metadata={"version": 2})
+	assert (tmp_pathplus / "full.gsmp").read_bytes() == filename.read_bytes()
+
+	# Arrays mapped from the old file remain valid.
+	assert sdjson.dumps(mapped) == sdjson.dumps(data)
+
+	# The file doesn't grow with repeated updates.
+	size = filename.stat().st_size
+	for version in range(3, 6):
+		update_container(filename, updated, sections, expand, metadata={"version": version}, compression=compression)
+	assert filename.stat().st_size == size
+
+	# Changing the compression rewrites the file.
+	other_compression = zipfile.ZIP_DEFLATED if compression == zipfile.ZIP_STORED else zipfile.ZIP_STORED
+	assert update_container(filename, expected, sections, expand, {"version": 5}, compression=other_compression)
+	with zipfile.ZipFile(filename) as zf:
+		assert {info.compress_type for info in zf.infolist()} == {other_compression}
+	assert sdjson.dumps(read_container(filename)) == sdjson.dumps(expected)
+
+
+def test_update_container_copies_members(tmp_pathplus: PathPlus):
+	array = numpy.linspace(0, 1, 10000)
+	data: Dict[str, Any] = {"name": "test", "datafile_data": {"a": {"array": array}}}
+	expand = ("datafile_data", )
+	write_container(tmp_pathplus / "original.gsmp", data, expand=expand)
+
+	# Recompressed at a different level, so members copied as they are can be told apart.
+	filename = tmp_pathplus / "test.gsmp"
+	with zipfile.ZipFile(tmp_pathplus / "original.gsmp") as source, zipfile.ZipFile(filename, 'w') as zf:
+		for info in source.infolist():
+			zf.writestr(info, source.read(info), compresslevel=1)
+
+	def stored_members() -> Dict[str, Any]:
+		with zipfile.ZipFile(filename) as zf:
+			return {info.filename: (info.CRC, info.compress_size) for info in zf.infolist()}
+
+	members = stored_members()
+
+	# Both for sections given as UNCHANGED and those with the same content.
+	for root_name, datafile_data in [("updated", {'a': UNCHANGED}), ("test", data["datafile_data"])]:
+		assert update_container(filename, {"name": root_name, "datafile_data": datafile_data}, expand=expand)
+		for name in ["datafile_data/a.json", "datafile_data/a.bin"]:
+			assert stored_members()[name] == members[name]
+
+	loaded = read_container(filename)
+	assert isinstance(loaded, dict)
+	numpy.testing.assert_array_equal(loaded["datafile_data"]["a"]["array"], array)
+
+	# Arrays stored without compression remain aligned when copied to a different offset.
+	write_container(filename, data, zipfile.ZIP_STORED, expand=expand)
+	for name_length in range(1, 70, 7):
+		updated = {"name": 'a' * name_length, "datafile_data": {'a': UNCHANGED}}
+		assert update_container(filename, updated, expand=expand, compression=zipfile.ZIP_STORED)
+
+		with zipfile.ZipFile(filename) as zf:
+			assert zf.testzip() is None
+			info = zf.getinfo("datafile_data/a.bin")
+			header_size = 30 + len(info.filename) + len(info.extra) + 20
+			assert (info.header_offset + header_size) % 64 == 0
+
+		loaded = read_container(filename, mmap=True)
+		assert isinstance(loaded, dict)
+		numpy.testing.assert_array_equal(loaded["datafile_data"]["a"]["array"], array)
@@ -1,8 +1,40 @@
+# stdlib
+import gzip
+import math
+from concurrent.futures import ThreadPoolExecutor
+
 # 3rd party
+import numpy
+import pytest
+import sdjson
 from domdf_python_tools.paths import PathPlus
 
 # this package
-from libgunshotmatch.gzip_util import read_gzip_json, write_gzip_json
+from libgunshotmatch.datafile import Datafile
+from libgunshotmatch.gzip_util import (
+		JSONInput,
+		_loads,
+		detect_codec,
+		get_codec,
+		iter_gzip_json,
+		read_gzip_json,
+		write_gzip_json
+		)
+
+
+try:
+	# 3rd party
+	import zstandard  # noqa: F401
+	_zstd_missing = False
+except ImportError:
+	_zstd_missing = True
+
+try:
+	# 3rd party
+	import lz4.frame  # noqa: F401
+	_lz4_missing = False
+except ImportError:
+	_lz4_missing = True
 
 
 def test_roundtrip(tmp_pathplus: PathPlus):
@@ -13,3 +45,287 @@ def test_roundtrip(tmp_pathplus: PathPlus):
 
 	write_gzip_json(tmp_pathplus / "test.gsmp", data)
 	assert read_gzip_json(tmp_pathplus / "test.gsmp") == data
+
+
+_tricky_data = {
+		"string": "he said \"hi\\\" ünïcødé 😀 [{ \\\\",
+		"nan": float("nan"),
+		"list": [1, 2.5e-10, True, None, -3, "x\"]", {}],
+		"nested": {"x": {"y": [[], {}]}, "z": "}"},
+		"float": -1.5,
+		}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64, 1024 * 1024])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_gzip_json(tmp_pathplus: PathPlus, chunk_size: int, indent: int):
+	write_gzip_json(tmp_pathplus / "test.json.gz", _tricky_data, indent=indent)
+
+	items = list(iter_gzip_json(tmp_pathplus / "test.json.gz", chunk_size=chunk_size))
+	assert [key_path for key_path, value in items] == [("string", ), ("nan", ), ("list", ), ("nested", ), ("float", )]
+
+	loaded = {key_path[0]: value for key_path, value in items}
+	assert math.isnan(loaded.pop("nan"))  # type: ignore[arg-type]
+	assert loaded == {k: v for k, v in _tricky_data.items() if k != "nan"}
+
+	items = list(iter_gzip_json(tmp_pathplus / "test.json.gz", expand=("list", "nested"), chunk_size=chunk_size))
+	assert [key_path for key_path, value in items] == [
+			("string", ),
+			("nan", ),
+			("list", 0),
+			("list", 1),
+			("list", 2),
+			("list", 3),
+			("list", 4),
+			("list", 5),
+			("list", 6),
+			("nested", 'x'),
+			("nested", 'z'),
+			("float", ),
+			]
+	assert items[3][1] == 2.5e-10
+	assert items[9][1] == {"y": [[], {}]}
+
+	# Only the selected members are decoded.
+	select = [("nested", 'x'), ("string", ), ("missing", )]
+	items = list(iter_gzip_json(tmp_pathplus / "test.json.gz", ("nested", ), chunk_size, select))
+	assert items == [(("string", ), _tricky_data["string"]), (("nested", 'x'), {"y": [[], {}]})]
+
+
+def test_iter_gzip_json_select(tmp_pathplus: PathPlus):
+	# The rest of the file isn't read once the selected members have been found.
+	with gzip.open(tmp_pathplus / "test.json.gz", "wt") as f:
+		f.write('{"name": "test", "version": 2, "large": [1, 2, 3], "truncated": ')
+
+	path = tmp_pathplus / "test.json.gz"
+	items = list(iter_gzip_json(path, select=[("name", ), ("version", )]))
+	assert items == [(("name", ), "test"), (("version", ), 2)]
+
+	with pytest.raises(ValueError, match="Unexpected end of file"):
+		list(iter_gzip_json(path, select=[("name", ), ("other", )]))
+
+
+@pytest.mark.parametrize("data", [[1, 2, 3], 5, "string", None, {}, [], "a\\", ["\\"], {"a": None}])
+def test_read_gzip_json_non_objects(tmp_pathplus: PathPlus, data: JSONInput):
+	write_gzip_json(tmp_pathplus / "test.json.gz", data)
+	assert read_gzip_json(tmp_pathplus / "test.json.gz") == data
+
+
+def test_read_gzip_json_nan(tmp_pathplus: PathPlus):
+	write_gzip_json(tmp_pathplus / "test.json.gz", {"mf_list": [900, float("nan")], "name": "NaN"})
+	data = read_gzip_json(tmp_pathplus / "test.json.gz")
+	assert isinstance(data, dict)
+	assert data["mf_list"][0] == 900
+	assert math.isnan(data["mf_list"][1])
+	assert data["name"] == "NaN"
+
+
+def test_loads():
+	# Only within strings
+	assert _loads('{"name": "NaN", "value": "-Infinity"}') == {"name": "NaN", "value": "-Infinity"}
+
+	as_list = _loads('["NaN", NaN, Infinity, -Infinity]')
+	assert isinstance(as_list, list)
+	assert as_list[0] == "NaN"
+	assert math.isnan(as_list[1])
+	assert as_list[2:] == [math.inf, -math.inf]
+
+	with pytest.raises(ValueError):  # noqa: PT011
+		_loads('{"name": NaNa}')
+
+
+@pytest.mark.parametrize(
+		"filename",
+		[
+				"ELEY_1_SUBTRACT.gsmd",
+				"ELEY_2_SUBTRACT.gsmd",
+				"ELEY_3_SUBTRACT.gsmd",
+				"ELEY_4_SUBTRACT.gsmd",
+				"ELEY_5_SUBTRACT.gsmd",
+				]
+		)
+def test_read_gzip_json_datafile(filename: str):
+	path = PathPlus(__file__).parent / filename
+
+	with gzip.open(path) as f:
+		expected = sdjson.load(f)
+
+	assert read_gzip_json(path) == expected
+	assert list(iter_gzip_json(path, chunk_size=4096)) == [((k, ), v) for k, v in expected.items()]
+
+
+@pytest.mark.parametrize("text", ['{"a": [1, 2', '{"a": 1', '{"a" 1}', '{"a": 1}{', '{"a": "abc'])
+def test_iter_gzip_json_errors(tmp_pathplus: PathPlus, text: str):
+	(tmp_pathplus / "test.json.gz").write_bytes(gzip.compress(text.encode("UTF-8")))
+
+	with pytest.raises(ValueError):  # noqa: PT011
+		list(iter_gzip_json(tmp_pathplus / "test.json.gz"))
+
+
+@pytest.mark.parametrize("indent", [None, 0, 2, 4])
+@pytest.mark.parametrize(
+		"data",
+		[
+				pytest.param(_tricky_data, id="tricky"),
+				pytest.param({1: 2, None: 3, False: 4, 1.5: [{'q': [[1, 2], [3]]}]}, id="keys"),
+				pytest.param({"a": {'b': [1, {'c': {}}], 'd': {}}, 'e': [], 't': (1, (2, 3))}, id="nested"),
+				pytest.param([1, 2], id="list"),
+				pytest.param({}, id="empty"),
+				pytest.param("string", id="string"),
+				]
+		)
+def test_write_gzip_json_matches_dumps(tmp_pathplus: PathPlus, data: JSONInput, indent: int):
+	write_gzip_json(tmp_pathplus / "test.json.gz", data, indent=indent)
+
+	with gzip.open(tmp_pathplus / "test.json.gz") as f:
+		assert f.read().decode("UTF-8") == sdjson.dumps(data, indent=indent)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_write_gzip_json_callables(tmp_pathplus: PathPlus, indent: int):
+	calls = []
+
+	def section(name: str) -> object:
+		calls.append(name)
+		return {"name": name, "values": [1.5, 2.5]}
+
+	data = {
+			"first": lambda: section("first"),
+			"nested": {"second": lambda: section("second"), "list": [lambda: section("third"), 4]},
+			"plain": [5, 6],
+			}
+	expected = {
+			"first": {"name": "first", "values": [1.5, 2.5]},
+			"nested": {"second": {"name": "second", "values": [1.5, 2.5]}, "list": [{"name": "third", "values": [1.5, 2.5]}, 4]},
+			"plain": [5, 6],
+			}
+
+	write_gzip_json(tmp_pathplus / "test.json.gz", data, indent=indent)
+	assert calls == ["first", "second", "third"]
+
+	with gzip.open(tmp_pathplus / "test.json.gz") as f:
+		assert f.read().decode("UTF-8") == sdjson.dumps(expected, indent=indent)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize(
+		"array",
+		[
+				pytest.param(
+						numpy.array([0.0, -0.0, 1e-5, -1.5e-5, 10.00001, 1.2345e-7, 1e16, 5e-324, 1.7976931348623157e308]),
+						id="floats",
+						),
+				pytest.param(numpy.random.default_rng(0).standard_normal((20, 30)) * 1e6, id="2d"),
+				pytest.param(numpy.linspace(0, 1, 11, dtype=numpy.float32), id="float32"),
+				pytest.param(numpy.arange(10, dtype=">f8")[::2], id="big_endian_strided"),
+				pytest.param(numpy.array([-2**62, 0, 2**62], dtype=numpy.int64), id="int64"),
+				pytest.param(numpy.array([True, False]), id="bool"),
+				pytest.param(numpy.array([1.0, numpy.nan, numpy.inf]), id="nan"),
+				pytest.param(numpy.empty((0, 3)), id="empty"),
+				pytest.param(numpy.array(3.5), id="0d"),
+				]
+		)
+def test_write_gzip_json_numpy(tmp_pathplus: PathPlus, array: numpy.ndarray, indent: int):
+	data = {"array": array, "scalars": [numpy.float64(1.5), numpy.float32(0.5), numpy.int32(3), numpy.bool_(True)]}
+	expected = {"array": array.tolist(), "scalars": [1.5, 0.5, 3, True]}
+
+	write_gzip_json(tmp_pathplus / "test.json.gz", data, indent=indent)
+
+	with gzip.open(tmp_pathplus / "test.json.gz") as f:
+		assert f.read().decode("UTF-8") == sdjson.dumps(expected, indent=indent)
+
+
+@pytest.mark.parametrize("filename", ["ELEY_1_SUBTRACT.gsmd", "ELEY_2_SUBTRACT.gsmd"])
+def test_write_gzip_json_datafile(tmp_pathplus: PathPlus, filename: str):
+	datafile = Datafile.from_file(PathPlus(__file__).parent / filename)
+
+	with gzip.open(datafile.export(tmp_pathplus)) as f:
+		expected = {"metadata": datafile._get_metadata(), **datafile.to_dict()}
+		assert f.read().decode("UTF-8") == sdjson.dumps(expected, indent=None)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 4096])
+@pytest.mark.parametrize(
+		"data",
+		[
+				pytest.param(_tricky_data, id="tricky"),
+				pytest.param({"array": numpy.arange(1000.0), "list": list(range(500))}, id="large"),
+				pytest.param({}, id="empty"),
+				]
+		)
+def test_write_gzip_json_executor(tmp_pathplus: PathPlus, data: JSONInput, block_size: int):
+	with ThreadPoolExecutor(4) as executor:
+		write_gzip_json(tmp_pathplus / "a.json.gz", data, indent=None, executor=executor, block_size=block_size)
+		write_gzip_json(tmp_pathplus / "b.json.gz", data, indent=None, executor=executor, block_size=block_size)
+
+	# Reproducible
+	assert (tmp_pathplus / "a.json.gz").read_bytes() == (tmp_pathplus / "b.json.gz").read_bytes()
+
+	expected = sdjson.dumps(data, indent=None)
+	with gzip.open(tmp_pathplus / "a.json.gz") as f:
+		assert f.read().decode("UTF-8") == expected
+
+	assert sdjson.dumps(read_gzip_json(tmp_pathplus / "a.json.gz"), indent=None) == expected
+
+
+def test_write_gzip_json_executor_members(tmp_pathplus: PathPlus):
+	data = {"list": list(range(1000))}
+
+	with ThreadPoolExecutor(2) as executor:
+		write_gzip_json(tmp_pathplus / "test.json.gz", data, indent=None, executor=executor, block_size=1024)
+
+	raw = (tmp_pathplus / "test.json.gz").read_bytes()
+	expected_size = len(sdjson.dumps(data, indent=None).encode("UTF-8"))
+	assert raw.count(b"\x1f\x8b\x08\x00\x00\x00\x00\x00") == -(-expected_size // 1024)
+
+	with pytest.raises(ValueError, match="'block_size' must be a positive integer"):
+		write_gzip_json(tmp_pathplus / "test.json.gz", data, executor=executor, block_size=0)
+
+
+_codecs = [
+		"gzip",
+		"gzip:1",
+		"bz2",
+		"lzma",
+		"lzma:0",
+		"none",
+		pytest.param("zstd", marks=pytest.mark.skipif(_zstd_missing, reason="requires zstandard")),
+		pytest.param("zstd:19", marks=pytest.mark.skipif(_zstd_missing, reason="requires zstandard")),
+		pytest.param("lz4", marks=pytest.mark.skipif(_lz4_missing, reason="requires lz4")),
+		]
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+@pytest.mark.parametrize("codec", _codecs)
+def test_write_gzip_json_codec(tmp_pathplus: PathPlus, codec: str, parallel: bool):
+	data = {**_tricky_data, "array": numpy.arange(1000.0)}
+	expected = sdjson.dumps(data, indent=None)
+
+	with ThreadPoolExecutor(2) as executor:
+		write_gzip_json(
+				tmp_pathplus / "test.json.gz",
+				data,
+				indent=None,
+				executor=executor if parallel else None,
+				block_size=256,
+				codec=codec,
+				)
+
+	codec_name = codec.partition(':')[0]
+	assert detect_codec(tmp_pathplus / "test.json.gz").name == codec_name
+	assert sdjson.dumps(read_gzip_json(tmp_pathplus / "test.json.gz"), indent=None) == expected
+	assert list(iter_gzip_json(tmp_pathplus / "test.json.gz", chunk_size=64)) == [
+			((k, ), v) for k, v in sdjson.loads(expected).items()
+			]
+
+
+def test_get_codec():
+	assert get_codec("gzip") == (get_codec("gzip:9")[0], None)
+	assert get_codec("lzma:6")[0].name == "lzma"
+	assert get_codec("lzma:6")[1] == 6
+
+	with pytest.raises(ValueError, match="Unknown compression codec 'deflate'"):
+		get_codec("deflate")
+
+	with pytest.raises(ValueError, match="Invalid compression level 'fast'"):
+		get_codec("gzip:fast")
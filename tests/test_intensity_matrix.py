@@ -0,0 +1,350 @@
+# stdlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple, Type, Union
+
+# 3rd party
+import numpy
+import pytest
+from domdf_python_tools.paths import PathPlus
+from pyms.GCMS.Class import GCMS_data
+from pyms.IntensityMatrix import IntensityMatrix, build_intensity_matrix_i
+from pyms.Noise.SavitzkyGolay import savitzky_golay
+from pyms.TopHat import tophat
+
+# this package
+from libgunshotmatch.datafile import Datafile
+from libgunshotmatch.intensity_matrix import (
+		SparseIntensityMatrix,
+		build_intensity_matrix,
+		filter_intensity_array,
+		savitzky_golay_array,
+		tophat_array
+		)
+from libgunshotmatch.method import SavitzkyGolayMethod
+
+
+@pytest.fixture(scope="module")
+def intensity_matrix() -> IntensityMatrix:
+	datafile = Datafile.from_file(PathPlus(__file__).parent / "ELEY_1_SUBTRACT.gsmd")
+	assert datafile.intensity_matrix is not None
+	return datafile.intensity_matrix
+
+
+@pytest.mark.parametrize(
+		"window, degree",
+		[
+				pytest.param(7, 2, id="default"),
+				pytest.param(11, 3, id="11_3"),
+				pytest.param("3s", 2, id="seconds"),
+				pytest.param("0.1m", 2, id="minutes"),
+				]
+		)
+def test_savitzky_golay_array(intensity_matrix: IntensityMatrix, window: str, degree: int):
+	expected = numpy.column_stack([
+			savitzky_golay(intensity_matrix.get_ic_at_index(idx), window=window, degree=degree).intensity_array
+			for idx in range(intensity_matrix.size[1])
+			])
+
+	smoothed = savitzky_golay_array(intensity_matrix.intensity_array, intensity_matrix.time_list, window, degree)
+	assert smoothed.shape == expected.shape
+	assert smoothed.dtype == expected.dtype
+	numpy.testing.assert_allclose(smoothed, expected, rtol=1e-12, atol=1e-6)
+
+
+def test_savitzky_golay_array_errors(intensity_matrix: IntensityMatrix):
+	with pytest.raises(ValueError, match="window must be an odd number of points"):
+		savitzky_golay_array(intensity_matrix.intensity_array, intensity_matrix.time_list, 8)
+
+	with pytest.raises(TypeError, match="'degree' must be an integer"):
+		savitzky_golay_array(intensity_matrix.intensity_array, intensity_matrix.time_list, 7, 2.5)  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize(
+		"name", [
+				"ELEY_1_SUBTRACT",
+				"ELEY_2_SUBTRACT",
+				"ELEY_3_SUBTRACT",
+				"ELEY_4_SUBTRACT",
+				"ELEY_5_SUBTRACT",
+				]
+		)
+@pytest.mark.parametrize("struct", ["1.5m", "30s", 25, None])
+def test_tophat_array(name: str, struct: str):
+	datafile = Datafile.from_file(PathPlus(__file__).parent / f"{name}.gsmd")
+	intensity_matrix = datafile.intensity_matrix
+	assert intensity_matrix is not None
+
+	expected = numpy.column_stack([
+			tophat(intensity_matrix.get_ic_at_index(idx), struct=struct).intensity_array
+			for idx in range(intensity_matrix.size[1])
+			])
+
+	corrected = tophat_array(intensity_matrix.intensity_array, intensity_matrix.time_list, struct)
+	assert corrected.dtype == expected.dtype
+	numpy.testing.assert_array_equal(corrected, expected)
+
+
+@pytest.fixture(scope="module")
+def gcms_data() -> GCMS_data:
+	path = PathPlus(__file__).parent / "ELEY_1_SUBTRACT.JDX"
+	return Datafile.new(path.stem, path).load_gcms_data()
+
+
+@pytest.mark.parametrize(
+		"crop_mass_range",
+		[None, (50, 500), (50, 499), (60.5, 200.2), (10, 1000), (100, 100.5)],
+		)
+def test_build_intensity_matrix(gcms_data: GCMS_data, crop_mass_range: Optional[Tuple[float, float]]):
+	expected = build_intensity_matrix_i(gcms_data)
+	if crop_mass_range is not None:
+		min_mass, max_mass = crop_mass_range
+		assert expected.min_mass is not None and expected.max_mass is not None
+		expected.crop_mass(max(min_mass, expected.min_mass), min(max_mass, expected.max_mass))
+
+	intensity_matrix = build_intensity_matrix(gcms_data, crop_mass_range)
+	assert intensity_matrix.time_list == expected.time_list
+	assert intensity_matrix.mass_list == expected.mass_list
+	numpy.testing.assert_array_equal(intensity_matrix.intensity_array, expected.intensity_array)
+
+
+def test_build_intensity_matrix_single_precision(gcms_data: GCMS_data):
+	expected = build_intensity_matrix(gcms_data, (50, 500))
+	intensity_matrix = build_intensity_matrix(gcms_data, (50, 500), dtype=numpy.float32)
+
+	assert isinstance(intensity_matrix, IntensityMatrix)
+	assert intensity_matrix.time_list == expected.time_list
+	assert intensity_matrix.mass_list == expected.mass_list
+	assert intensity_matrix._intensity_array.dtype == numpy.float32
+	numpy.testing.assert_array_equal(intensity_matrix._intensity_array, expected.intensity_array.astype(numpy.float32))
+
+	# PyMassSpec's functions are given double-precision copies.
+	assert intensity_matrix.intensity_array.dtype == numpy.float64
+	ic = intensity_matrix.get_ic_at_mass(73)
+	numpy.testing.assert_array_equal(ic.intensity_array, intensity_matrix._intensity_array[:, 23])
+	assert ic.intensity_array.dtype == numpy.float64
+	numpy.testing.assert_allclose(intensity_matrix.tic.intensity_array, expected.tic.intensity_array, rtol=1e-6)
+
+	intensity_matrix.crop_mass(60, 100)
+	assert intensity_matrix.mass_list == list(range(60, 101))
+	assert intensity_matrix._intensity_array.dtype == numpy.float32
+
+
+@pytest.mark.parametrize("dtype", [numpy.float64, numpy.float32])
+def test_sparse_intensity_matrix(gcms_data: GCMS_data, dtype: Type[numpy.floating]):
+	dense = build_intensity_matrix(gcms_data, (50, 500), dtype=dtype)
+	sparse = SparseIntensityMatrix.from_intensity_matrix(dense)
+
+	assert sparse.size == dense.size
+	assert sparse.data.dtype == dtype
+	assert sparse.indices.dtype == numpy.uint16
+	assert len(sparse.data) == numpy.count_nonzero(dense._intensity_array)
+	assert sparse.nbytes < dense._intensity_array.nbytes / 2
+	assert list(sparse.iter_ms_indices()) == list(dense.iter_ms_indices())
+	assert list(sparse.iter_ic_indices()) == list(dense.iter_ic_indices())
+
+	numpy.testing.assert_array_equal(sparse.intensity_array, dense.intensity_array)
+	assert sparse.intensity_array.dtype == numpy.float64
+	numpy.testing.assert_allclose(sparse.tic.intensity_array, dense.tic.intensity_array, rtol=1e-12)
+	numpy.testing.assert_array_equal(sparse.bpc.intensity_array, dense.bpc.intensity_array)
+
+	for ix in (0, 23, sparse.size[1] - 1):
+		numpy.testing.assert_array_equal(
+				sparse.get_ic_at_index(ix).intensity_array,
+				dense.get_ic_at_index(ix).intensity_array,
+				)
+	for ix in (0, 1000, sparse.size[0] - 1):
+		assert sparse.get_ms_at_index(ix).intensity_list == dense.get_ms_at_index(ix).intensity_list
+
+	with pytest.raises(IndexError, match="index out of range"):
+		sparse.get_scan_at_index(sparse.size[0])
+
+	round_trip = sparse.to_intensity_matrix()
+	assert type(round_trip) is type(dense)
+	numpy.testing.assert_array_equal(round_trip._intensity_array, dense._intensity_array)
+
+
+def test_sparse_intensity_matrix_modify(gcms_data: GCMS_data):
+	dense = build_intensity_matrix(gcms_data, (50, 500))
+	sparse = SparseIntensityMatrix.from_intensity_matrix(dense)
+
+	ic = dense.get_ic_at_index(10)
+	for intensity_matrix in (dense, sparse):
+		intensity_matrix.set_ic_at_index(5, ic)
+		intensity_matrix.null_mass(73)
+		intensity_matrix.reduce_mass_spectra(20)
+		intensity_matrix.crop_mass(55, 400)
+
+	assert isinstance(sparse, SparseIntensityMatrix)
+	assert sparse.mass_list == dense.mass_list
+	assert sparse.size == dense.size
+	numpy.testing.assert_array_equal(sparse.intensity_array, dense.intensity_array)
+	assert len(sparse.data) == numpy.count_nonzero(dense._intensity_array)
+
+
+def test_sparse_intensity_matrix_crop_mass(gcms_data: GCMS_data, tmp_pathplus: PathPlus):
+	dense = build_intensity_matrix(gcms_data, (50, 500))
+	sparse = SparseIntensityMatrix.from_intensity_matrix(dense)
+
+	# Builds the column index, which must then be discarded by crop_mass.
+	sparse.get_ic_at_index(30)
+
+	for intensity_matrix in (dense, sparse):
+		intensity_matrix.crop_mass(60.5, 300)
+
+	assert sparse.mass_list == dense.mass_list
+	assert (sparse.min_mass, sparse.max_mass) == (61, 300)
+	assert sparse.size == dense.size
+	assert sparse.indices.dtype == numpy.uint16
+	numpy.testing.assert_array_equal(sparse.intensity_array, dense.intensity_array)
+	for ix in (0, 30, sparse.size[1] - 1):
+		numpy.testing.assert_array_equal(
+				sparse.get_ic_at_index(ix).intensity_array,
+				dense.get_ic_at_index(ix).intensity_array,
+				)
+
+	dense.export_leco_csv(tmp_pathplus / "dense.csv")
+	sparse.export_leco_csv(tmp_pathplus / "sparse.csv")
+	assert (tmp_pathplus / "sparse.csv").read_text() == (tmp_pathplus / "dense.csv").read_text()
+
+	dense.export_ascii(tmp_pathplus / "dense")
+	sparse.export_ascii(tmp_pathplus / "sparse")
+	for suffix in (".im.dat", ".mz.dat", ".rt.dat"):
+		assert (tmp_pathplus / f"sparse{suffix}").read_text() == (tmp_pathplus / f"dense{suffix}").read_text()
+
+	with pytest.raises(TypeError, match="'mass_min' and 'mass_max' must be numbers"):
+		sparse.crop_mass("60", 100)  # type: ignore[arg-type]
+	with pytest.raises(ValueError, match="'mass_min' must be less than 'mass_max'"):
+		sparse.crop_mass(100, 60)
+	with pytest.raises(ValueError, match="'mass_min' is less than the smallest mass: 61.000"):
+		sparse.crop_mass(50, 100)
+	with pytest.raises(ValueError, match="'mass_max' is greater than the largest mass: 300.000"):
+		sparse.crop_mass(100, 400)
+
+
+def test_sparse_intensity_matrix_errors():
+	with pytest.raises(ValueError, match="'indptr' must be one longer than 'time_list'"):
+		SparseIntensityMatrix([1, 2], [50, 51], numpy.zeros(0), numpy.zeros(0), numpy.zeros(2))
+
+	with pytest.raises(ValueError, match="'data' and 'indices' must be the same length as given by 'indptr'"):
+		SparseIntensityMatrix([1, 2], [50, 51], numpy.ones(2), numpy.zeros(2), numpy.array([0, 1, 1]))
+
+
+def test_build_intensity_matrix_errors(gcms_data: GCMS_data):
+	with pytest.raises(ValueError, match="The minimum mass of 'crop_mass_range' must be less than the maximum mass."):
+		build_intensity_matrix(gcms_data, (500, 50))
+
+	with pytest.raises(ValueError, match="'crop_mass_range' does not overlap the masses in the data."):
+		build_intensity_matrix(gcms_data, (600, 700))
+
+
+def test_prepare_intensity_matrix_matches_per_ion():
+	path = PathPlus(__file__).parent / "ELEY_1_SUBTRACT.JDX"
+	datafile = Datafile.new(path.stem, path)
+	gcms_data = datafile.load_gcms_data()
+
+	expected = build_intensity_matrix_i(gcms_data)
+	expected.crop_mass(50, 499)
+	for idx in range(expected.size[1]):
+		ic = savitzky_golay(expected.get_ic_at_index(idx))
+		ic = tophat(ic, struct="1.5m")
+		expected.set_ic_at_index(idx, ic)
+
+	intensity_matrix = datafile.prepare_intensity_matrix(gcms_data, crop_mass_range=(50, 500))
+	assert intensity_matrix.time_list == expected.time_list
+	assert intensity_matrix.mass_list == expected.mass_list
+	numpy.testing.assert_allclose(intensity_matrix.intensity_array, expected.intensity_array, rtol=1e-12, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+		"crop_rt_range",
+		[
+				pytest.param((3, 6), id="3_6"),
+				pytest.param((0, 4), id="start"),
+				pytest.param((30, 100), id="end"),
+				pytest.param((4.2, 4.3), id="narrow"),
+				]
+		)
+@pytest.mark.parametrize(
+		"savgol, tophat_structure_size",
+		[
+				pytest.param(True, "1.5m", id="default"),
+				pytest.param(SavitzkyGolayMethod(window="10s"), "30s", id="time_windows"),
+				pytest.param(False, None, id="tophat_only"),
+				]
+		)
+@pytest.mark.parametrize("from_intensity_matrix", [False, True])
+def test_prepare_intensity_matrix_crop_rt_range(
+		gcms_data: GCMS_data,
+		crop_rt_range: Tuple[float, float],
+		savgol: SavitzkyGolayMethod,
+		tophat_structure_size: Optional[str],
+		from_intensity_matrix: bool,
+		):
+	datafile = Datafile.new("ELEY_1_SUBTRACT", PathPlus(__file__).parent / "ELEY_1_SUBTRACT.JDX")
+
+	expected = datafile.prepare_intensity_matrix(
+			gcms_data,
+			savitzky_golay=savgol,
+			tophat_structure_size=tophat_structure_size,  # type: ignore[arg-type]
+			crop_mass_range=(50, 500),
+			)
+
+	times = numpy.asarray(expected.time_list)
+	in_range = (times >= crop_rt_range[0] * 60) & (times <= crop_rt_range[1] * 60)
+
+	data: Union[GCMS_data, IntensityMatrix] = build_intensity_matrix(gcms_data) if from_intensity_matrix else gcms_data
+	intensity_matrix = datafile.prepare_intensity_matrix(
+			data,
+			savitzky_golay=savgol,
+			tophat_structure_size=tophat_structure_size,  # type: ignore[arg-type]
+			crop_mass_range=(50, 500),
+			crop_rt_range=crop_rt_range,
+			)
+
+	assert datafile.intensity_matrix is intensity_matrix
+	assert intensity_matrix.time_list == times[in_range].tolist()
+	assert intensity_matrix.mass_list == expected.mass_list
+	numpy.testing.assert_array_equal(intensity_matrix.intensity_array, expected.intensity_array[in_range])
+
+
+def test_prepare_intensity_matrix_crop_rt_range_errors(gcms_data: GCMS_data):
+	datafile = Datafile.new("ELEY_1_SUBTRACT", PathPlus(__file__).parent / "ELEY_1_SUBTRACT.JDX")
+
+	with pytest.raises(
+			ValueError,
+			match="The minimum retention time of 'crop_rt_range' must be less than the maximum retention time.",
+			):
+		datafile.prepare_intensity_matrix(gcms_data, crop_rt_range=(10, 5))
+
+	with pytest.raises(ValueError, match="'crop_rt_range' does not overlap the retention times of the data."):
+		datafile.prepare_intensity_matrix(gcms_data, crop_rt_range=(50, 60))
+
+
+@pytest.mark.parametrize("executor_cls", [ThreadPoolExecutor, ProcessPoolExecutor])
+@pytest.mark.parametrize("chunk_size", [1, 32, 1000])
+def test_filter_intensity_array_executor(
+		intensity_matrix: IntensityMatrix,
+		executor_cls: Type[Union[ThreadPoolExecutor, ProcessPoolExecutor]],
+		chunk_size: int,
+		):
+	savitzky_golay = SavitzkyGolayMethod(window="5s", degree=3)
+
+	expected = intensity_matrix.intensity_array
+	filter_intensity_array(expected, intensity_matrix.time_list, savitzky_golay=savitzky_golay)
+
+	intensity_array = intensity_matrix.intensity_array
+	with executor_cls(max_workers=2) as executor:
+		filter_intensity_array(
+				intensity_array,
+				intensity_matrix.time_list,
+				savitzky_golay=savitzky_golay,
+				executor=executor,
+				chunk_size=chunk_size,
+				)
+
+	numpy.testing.assert_array_equal(intensity_array, expected)
+
+
+def test_filter_intensity_array_errors(intensity_matrix: IntensityMatrix):
+	with pytest.raises(ValueError, match="'chunk_size' must be a positive integer"):
+		filter_intensity_array(intensity_matrix.intensity_array, intensity_matrix.time_list, chunk_size=0)
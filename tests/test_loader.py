@@ -0,0 +1,73 @@
+# stdlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+# 3rd party
+import pytest
+import sdjson
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from libgunshotmatch.datafile import Datafile, Repeat
+from libgunshotmatch.loader import load_files
+from libgunshotmatch.project import Project
+
+
+@pytest.fixture()
+def files_dir(tmp_pathplus: PathPlus, project: Project) -> PathPlus:
+	project.export(tmp_pathplus, binary=True)
+	repeat = project.datafile_data["repeat_0"]
+	repeat.export(tmp_pathplus)
+	repeat.datafile.export(tmp_pathplus)
+	(tmp_pathplus / "notes.txt").write_text("Not a GunShotMatch file")
+	return tmp_pathplus
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_load_files(files_dir: PathPlus, project: Project, processes: bool):
+	executor = None if processes else ThreadPoolExecutor(2)
+	results = {PathPlus(result.filename).name: result for result in load_files(files_dir, 2, executor=executor)}
+
+	assert sorted(results) == ["project.gsmp", "repeat_0.gsmd", "repeat_0.gsmr"]
+	assert all(result.error is None and result.duration > 0 for result in results.values())
+
+	assert isinstance(results["project.gsmp"].result, Project)
+	assert sdjson.dumps(results["project.gsmp"].result.to_dict()) == sdjson.dumps(project.to_dict())
+	assert isinstance(results["repeat_0.gsmr"].result, Repeat)
+	assert isinstance(results["repeat_0.gsmd"].result, Datafile)
+	assert results["repeat_0.gsmd"].result.name == "repeat_0"
+
+
+def test_load_files_glob(files_dir: PathPlus, project: Project):
+	for idx in range(5):
+		shutil.copy(files_dir / "project.gsmp", files_dir / f"project_{idx}.gsmp")
+
+	with ThreadPoolExecutor(2) as executor:
+		results = list(load_files(files_dir / "project_*.gsmp", max_pending=2, executor=executor))
+
+	assert sorted(PathPlus(result.filename).name for result in results) == [f"project_{idx}.gsmp" for idx in range(5)]
+
+	with ThreadPoolExecutor(2) as executor:
+		results = list(load_files(files_dir / "*.gsm?", metadata_only=True, executor=executor))
+
+	assert len(results) == 8
+	metadata = {PathPlus(result.filename).name: result.result for result in results}
+	assert metadata["project_0.gsmp"] == project._get_metadata()
+	assert metadata["repeat_0.gsmr"] == project.datafile_data["repeat_0"]._get_metadata()
+	assert metadata["repeat_0.gsmd"] == project.datafile_data["repeat_0"].datafile._get_metadata()
+
+
+def test_load_files_errors(files_dir: PathPlus):
+	(files_dir / "broken.gsmp").write_text("{")
+	filenames = [files_dir / "broken.gsmp", files_dir / "missing.gsmr", files_dir / "notes.txt", files_dir / "project.gsmp"]
+
+	with ThreadPoolExecutor(2) as executor:
+		results = {PathPlus(result.filename).name: result for result in load_files(filenames, executor=executor)}
+
+	assert isinstance(results["broken.gsmp"].error, ValueError)
+	assert isinstance(results["missing.gsmr"].error, FileNotFoundError)
+	assert isinstance(results["notes.txt"].error, ValueError)
+	assert str(results["notes.txt"].error) == "Unknown file type '.txt'"
+	assert results["notes.txt"].result is None
+	assert results["project.gsmp"].error is None
+	assert isinstance(results["project.gsmp"].result, Project)
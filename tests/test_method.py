@@ -45,6 +45,9 @@ def test_default_methods(advanced_data_regression: AdvancedDataRegressionFixture
 				pytest.param(SavitzkyGolayMethod, {"degree": 5}, id="savgol_degree"),
 				pytest.param(SavitzkyGolayMethod, {"window": 8, "degree": 5}, id="savgol_window_degree"),
 				pytest.param(IntensityMatrixMethod, {"crop_mass_range": [100, 200]}, id="im_mass_range"),
+				pytest.param(IntensityMatrixMethod, {"crop_rt_range": [3, 25]}, id="im_rt_range"),
+				pytest.param(IntensityMatrixMethod, {"single_precision": True}, id="im_single_precision"),
+				pytest.param(IntensityMatrixMethod, {"sparse": True}, id="im_sparse"),
 				pytest.param(
 						IntensityMatrixMethod, {"tophat_structure_size": "2m"}, id="im_tophat_structure_size"
 						),
@@ -1,10 +1,16 @@
+# stdlib
+from typing import Union
+
 # 3rd party
+import numpy
+import pytest
+import sdjson
 from coincidence.regressions import AdvancedDataRegressionFixture
 from pyms.Peak import Peak
 from pyms.Spectrum import MassSpectrum
 
 # this package
-from libgunshotmatch.peak import QualifiedPeak, base_peak_mass
+from libgunshotmatch.peak import PeakList, QualifiedPeak, base_peak_mass, peak_from_dict
 from libgunshotmatch.project import Project
 
 
@@ -25,6 +31,51 @@ def test_qualified_from_peak():
 	assert qp.UID == peak.UID
 
 
+@pytest.mark.parametrize("compact", [True, "float32", "float64"])
+def test_compact_encoding(compact: Union[bool, str]):
+	rng = numpy.random.default_rng(1234)
+	spectra = [MassSpectrum(list(range(50, 500)), rng.uniform(0, 1e7, 450).tolist()) for _ in range(5)]
+	# Masses which are not whole numbers are kept at full precision.
+	spectra.append(MassSpectrum([50.5, 51.25], [1.0, 2.0]))
+
+	peaks = PeakList()
+	for idx, ms in enumerate(spectra):
+		peak = Peak(rt=100.0 + idx, ms=ms)
+		peak.area = 12345678.9
+		peak.bounds = (7, 8, 9)
+		peaks.append(peak)
+
+	as_list = sdjson.loads(sdjson.dumps(peaks.to_list(compact=compact)))
+	assert len(sdjson.dumps(as_list)) < len(sdjson.dumps(peaks.to_list())) * (0.6 if compact == "float64" else 0.4)
+	assert as_list[0]["mass_spectrum"]["mass_list"]["__ndarray__"]["dtype"] == "<u2"
+	assert as_list[-1]["mass_spectrum"]["mass_list"]["__ndarray__"]["dtype"] == "<f8"
+
+	for peak, peak_as_dict in zip(peaks, as_list):
+		loaded = peak_from_dict(peak_as_dict)
+		assert loaded.rt == peak.rt
+		assert loaded.UID == peak.UID
+		assert loaded.mass_spectrum.mass_list == peak.mass_spectrum.mass_list
+
+		expected = numpy.asarray(peak.mass_spectrum.intensity_list)
+		actual = numpy.asarray(loaded.mass_spectrum.intensity_list)
+		if compact == "float64":
+			assert (actual == expected).all()
+		else:
+			assert (numpy.abs(actual - expected) <= numpy.abs(expected) * 2**-24).all()
+
+	qp = QualifiedPeak.from_peak(peaks[0])
+	as_dict = qp.to_dict(numpy_arrays=True, compact=compact)
+	assert as_dict["mass_spectrum"]["mass_list"].dtype == numpy.uint16
+	assert as_dict["mass_spectrum"]["intensity_list"].dtype == (numpy.float64 if compact == "float64" else numpy.float32)
+
+
+def test_compact_encoding_invalid():
+	peaks = PeakList([Peak(rt=100.0, ms=MassSpectrum([50, 51], [1.0, 2.0]))])
+
+	with pytest.raises(ValueError, match="Unsupported precision for the compact encoding: 'float16'"):
+		peaks.to_list(compact="float16")
+
+
 def test_base_peak_mass(advanced_data_regression: AdvancedDataRegressionFixture):
 	project = Project.from_file("tests/ELEY .22LR.gsmp")
 
@@ -1,10 +1,23 @@
+# stdlib
+import copy
+import gzip
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
 # 3rd party
+import pytest
 import sdjson
 from coincidence.regressions import AdvancedFileRegressionFixture
 from domdf_python_tools.paths import PathPlus
+from domdf_python_tools.typing import PathLike
+from pyms.Spectrum import MassSpectrum
 
 # this package
-from libgunshotmatch.project import Project
+from libgunshotmatch import container, gzip_util
+from libgunshotmatch.consolidate import ConsolidatedPeak
+from libgunshotmatch.datafile import Datafile, Repeat
+from libgunshotmatch.project import Project, _SpectrumTable
 
 
 def test_load(advanced_file_regression: AdvancedFileRegressionFixture):
@@ -14,3 +27,368 @@ def test_load(advanced_file_regression: AdvancedFileRegressionFixture):
 
 
 # TODO: creation etc.
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_lazy_load(tmp_pathplus: PathPlus, project: Project, binary: bool):
+	filename = project.export(tmp_pathplus, binary=binary)
+	eager = Project.from_file(filename)
+	lazy = Project.from_file(filename, lazy=True)
+
+	assert set(eager.load_timings) == {
+			"read",
+			"alignment",
+			"consolidated_peaks",
+			"datafile_data/repeat_0",
+			"datafile_data/repeat_1",
+			}
+
+	# Nothing is loaded until it is accessed
+	assert lazy.name == "project"
+	assert set(lazy.load_timings) == {"read"}
+	assert list(lazy.datafile_data) == ["repeat_0", "repeat_1"]
+	assert len(lazy.datafile_data) == 2
+	assert set(lazy.load_timings) == {"read"}
+
+	assert lazy.datafile_data["repeat_1"].name == "repeat_1"
+	assert set(lazy.load_timings) == {"read", "datafile_data/repeat_1"}
+
+	assert lazy.consolidated_peaks is not None
+	assert lazy.consolidated_peaks[0].hits[0].name == "Compound 0"
+	assert "consolidated_peaks" in lazy.load_timings
+	assert "alignment" not in lazy.load_timings
+
+	assert lazy.alignment.expr_code == ["repeat_0", "repeat_1"]
+	assert len(lazy.alignment) == 3
+	assert "alignment" in lazy.load_timings
+
+	assert sdjson.dumps(lazy.to_dict()) == sdjson.dumps(eager.to_dict())
+	assert sdjson.dumps(lazy.to_dict()) == sdjson.dumps(project.to_dict())
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_lazy_load_reads_sections(
+		tmp_pathplus: PathPlus,
+		project: Project,
+		binary: bool,
+		monkeypatch: pytest.MonkeyPatch,
+		):
+	filename = project.export(tmp_pathplus, binary=binary)
+
+	sections_read: List[str] = []
+	read_section = container.read_section
+
+	def spy(path: PathLike, name: str, *args: Any, **kwargs: Any) -> Any:
+		sections_read.append(name)
+		return read_section(path, name, *args, **kwargs)
+
+	monkeypatch.setattr(container, "read_section", spy)
+
+	# Only the summary is read up front.
+	lazy = Project.from_file(filename, lazy=True)
+	assert sections_read == (["root"] if binary else [])
+	assert lazy.datafile_data["repeat_1"].name == "repeat_1"
+	assert sections_read == (["root", "datafile_data/repeat_1", "spectra"] if binary else [])
+
+	# Sections which have changed in the file since it was read can't be loaded.
+	changed = Project.from_dict(project.to_dict())
+	changed.datafile_data["repeat_0"].peaks.pop()
+	assert changed.export(tmp_pathplus, binary=binary) == filename
+	with pytest.raises(ValueError, match="has changed"):
+		lazy.datafile_data["repeat_0"]
+
+	# Unchanged sections of binary containers can still be.
+	if binary:
+		assert lazy.consolidated_peaks is not None
+		assert len(lazy.consolidated_peaks) == 3
+
+	# The remaining sections are read before the file is overwritten.
+	project.export(tmp_pathplus, binary=binary)
+	lazy = Project.from_file(filename, lazy=True)
+	assert lazy.export(tmp_pathplus) == filename
+	assert sdjson.dumps(Project.from_file(filename).to_dict()) == sdjson.dumps(project.to_dict())
+
+
+def test_lazy_proxies_modify(project: Project):
+	lazy = Project.from_dict(project.to_dict(), lazy=True)
+
+	# Attributes set before loading are retained
+	lazy.alignment.similarity = 0.5
+	assert lazy.alignment.similarity == 0.5
+	assert lazy.alignment.expr_code == ["repeat_0", "repeat_1"]
+	assert lazy.alignment.similarity == 0.5
+
+	repeat = lazy.datafile_data.pop("repeat_0")
+	assert repeat.name == "repeat_0"
+	assert list(lazy.datafile_data) == ["repeat_1"]
+	lazy.datafile_data["repeat_0"] = repeat
+	assert list(lazy.datafile_data) == ["repeat_1", "repeat_0"]
+
+	assert lazy.consolidated_peaks is not None
+	assert len(lazy.consolidated_peaks[1:]) == 2
+	del lazy.consolidated_peaks[0]
+	assert len(lazy.consolidated_peaks) == 2
+	assert [cp.meta["peak_number"] for cp in lazy.consolidated_peaks] == [2, 3]
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_export_json(tmp_pathplus: PathPlus, project: Project, parallel: bool):
+	executor = ThreadPoolExecutor(2) if parallel else None
+
+	with gzip.open(project.export(tmp_pathplus, executor=executor)) as f:
+		expected = {"metadata": project._get_metadata(), **project._to_dict(deduplicate_spectra=True)}
+		assert f.read().decode("UTF-8") == sdjson.dumps(expected)
+
+	repeat = project.datafile_data["repeat_0"]
+	with gzip.open(repeat.export(tmp_pathplus, executor=executor)) as f:
+		assert f.read().decode("UTF-8") == sdjson.dumps({"metadata": repeat._get_metadata(), **repeat.to_dict()})
+
+	with gzip.open(repeat.datafile.export(tmp_pathplus, executor=executor)) as f:
+		expected = {"metadata": repeat.datafile._get_metadata(), **repeat.datafile.to_dict()}
+		assert f.read().decode("UTF-8") == sdjson.dumps(expected)
+
+
+@pytest.mark.parametrize("codec", ["gzip:1", "bz2", "lzma", "none"])
+def test_export_codec(tmp_pathplus: PathPlus, project: Project, codec: str):
+	loaded = Project.from_file(project.export(tmp_pathplus, codec=codec))
+	assert sdjson.dumps(loaded.to_dict()) == sdjson.dumps(project.to_dict())
+
+	repeat = project.datafile_data["repeat_0"]
+	loaded_repeat = Repeat.from_file(repeat.export(tmp_pathplus, codec=codec))
+	assert sdjson.dumps(loaded_repeat.to_dict()) == sdjson.dumps(repeat.to_dict())
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_spectrum_table(tmp_pathplus: PathPlus, project: Project, binary: bool):
+	as_dict = project._to_dict(deduplicate_spectra=True)
+
+	# Each peak's spectrum is written once, and referred to by key elsewhere.
+	spectra = as_dict["spectra"]
+	n_peaks = sum(len(repeat.peaks) for repeat in project.datafile_data.values())
+	assert len(spectra) == n_peaks
+	assert all(isinstance(peak["mass_spectrum"], str) for peak in as_dict["datafile_data"]["repeat_0"]["peaks"])
+
+	for cp in as_dict["consolidated_peaks"]:
+		assert all(ms is None or ms in spectra for ms in cp["ms_list"])
+
+	loaded = Project.from_file(project.export(tmp_pathplus, binary=binary))
+	assert sdjson.dumps(loaded.to_dict()) == sdjson.dumps(project.to_dict())
+
+	# The same spectrum objects are shared between sections.
+	repeat = loaded.datafile_data["repeat_0"]
+	assert repeat.qualified_peaks is not None
+	assert repeat.peaks[0]._mass_spectrum is repeat.qualified_peaks[0]._mass_spectrum
+	assert loaded.alignment.peakpos[0][0]._mass_spectrum is repeat.peaks[0]._mass_spectrum
+	assert loaded.consolidated_peaks is not None
+	assert loaded.consolidated_peaks[0].ms_list[0] is repeat.peaks[0]._mass_spectrum
+
+	# Also when loaded lazily
+	loaded = Project.from_file(tmp_pathplus / f"{project.name}.gsmp", lazy=True)
+	assert sdjson.dumps(loaded.to_dict()) == sdjson.dumps(project.to_dict())
+	repeat = loaded.datafile_data["repeat_0"]
+	assert loaded.alignment.peakpos[0][0]._mass_spectrum is repeat.peaks[0]._mass_spectrum
+
+
+def test_spectrum_table_keys():
+	table = _SpectrumTable()
+	ms_a = MassSpectrum([50, 51], [1.0, 2.0])
+	ms_b = MassSpectrum([50, 51], [3.0, 4.0])
+
+	assert table.add(ms_a, "50-51-100-1.00") == "50-51-100-1.00"
+	assert table.add(ms_a, "50-51-100-1.00") == "50-51-100-1.00"
+	assert table.add(copy.copy(ms_a), "other") == "50-51-100-1.00"
+	# Same UID, different spectrum
+	assert table.add(ms_b, "50-51-100-1.00") == "50-51-100-1.00#1"
+	assert table.add(MassSpectrum([50, 52], [1.0, 2.0])) == "spectrum"
+	assert table.add(MassSpectrum([50, 53], [1.0, 2.0])) == "spectrum#1"
+
+	assert list(table.to_dict()) == ["50-51-100-1.00", "50-51-100-1.00#1", "spectrum", "spectrum#1"]
+	assert table.to_dict()["50-51-100-1.00#1"] == {"intensity_list": [3.0, 4.0], "mass_list": [50, 51]}
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_format_version(tmp_pathplus: PathPlus, project: Project, binary: bool):
+	filename = project.export(tmp_pathplus, binary=binary)
+	as_dict = container.read_document(filename)
+	assert isinstance(as_dict, dict)
+	assert as_dict["version"] == 2
+
+	# Documents without a version give the mass spectra inline.
+	assert "version" not in project.to_dict()
+	assert sdjson.dumps(Project.from_dict(project.to_dict()).to_dict()) == sdjson.dumps(project.to_dict())
+
+	as_dict = project._to_dict(numpy_arrays=binary, deduplicate_spectra=True)
+	as_dict["version"] = 3
+	if binary:
+		container.write_container(filename, as_dict, sections=("alignment", ), expand=("datafile_data", ))
+	else:
+		gzip_util.write_gzip_json(filename, as_dict)
+
+	with pytest.raises(ValueError, match="Unsupported project format version 3"):
+		Project.from_file(filename)
+	with pytest.raises(ValueError, match="Unsupported project format version 3"):
+		Project.load_repeat(filename, "repeat_0")
+
+
+@pytest.mark.parametrize("file_format", ["json", "binary", "binary_single_section"])
+def test_load_section(tmp_pathplus: PathPlus, project: Project, file_format: str):
+	if file_format == "binary_single_section":
+		filename = tmp_pathplus / "project.gsmp"
+		container.write_container(filename, project._to_dict(numpy_arrays=True, deduplicate_spectra=True))
+	else:
+		filename = PathPlus(project.export(tmp_pathplus, binary=file_format == "binary"))
+
+	if file_format == "binary":
+		assert container.read_section(filename, "datafile_data/repeat_1") is not None
+
+	for name, repeat in project.datafile_data.items():
+		loaded_repeat = Project.load_repeat(filename, name)
+		assert sdjson.dumps(loaded_repeat.to_dict()) == sdjson.dumps(repeat.to_dict())
+
+	with pytest.raises(KeyError, match="repeat_3"):
+		Project.load_repeat(filename, "repeat_3")
+
+	alignment = Project.load_alignment(filename)
+	assert alignment.expr_code == project.alignment.expr_code
+	expected_uids = [[peak.UID for peak in row] for row in project.alignment.peakpos]
+	assert [[peak.UID for peak in row] for row in alignment.peakpos] == expected_uids
+
+	consolidated_peaks = Project.load_consolidated_peaks(filename)
+	assert consolidated_peaks is not None
+	assert project.consolidated_peaks is not None
+	expected = sdjson.dumps([cp.to_dict() for cp in project.consolidated_peaks])
+	assert sdjson.dumps([cp.to_dict() for cp in consolidated_peaks]) == expected
+
+
+@pytest.mark.parametrize("file_format", ["json", "binary", "unversioned"])
+def test_read_metadata(tmp_pathplus: PathPlus, project: Project, file_format: str):
+	repeat = project.datafile_data["repeat_0"]
+
+	if file_format == "unversioned":
+		# Files written without a summary, as by earlier versions.
+		project_filename = tmp_pathplus / f"{project.name}.gsmp"
+		gzip_util.write_gzip_json(project_filename, project.to_dict(), indent=None)
+		repeat_filename = tmp_pathplus / f"{repeat.name}.gsmr"
+		gzip_util.write_gzip_json(repeat_filename, repeat.to_dict(), indent=None)
+		datafile_filename = tmp_pathplus / f"{repeat.name}.gsmd"
+		gzip_util.write_gzip_json(datafile_filename, repeat.datafile.to_dict(), indent=None)
+		assert container.read_metadata(project_filename) is None
+	else:
+		binary = file_format == "binary"
+		project_filename = PathPlus(project.export(tmp_pathplus, binary=binary))
+		repeat_filename = PathPlus(repeat.export(tmp_pathplus, binary=binary))
+		datafile_filename = PathPlus(repeat.datafile.export(tmp_pathplus, binary=binary))
+
+	metadata = Project.read_metadata(project_filename)
+	assert metadata == project._get_metadata()
+	assert metadata["name"] == project.name
+	assert metadata["n_aligned_peaks"] == len(project.alignment)
+	assert project.consolidated_peaks is not None
+	assert metadata["n_consolidated_peaks"] == len(project.consolidated_peaks)
+	assert list(metadata["repeats"]) == list(project.datafile_data)
+
+	repeat_metadata = Repeat.read_metadata(repeat_filename)
+	assert repeat_metadata == metadata["repeats"]["repeat_0"]
+	assert repeat_metadata["user"] == repeat.user
+	assert repeat_metadata["date_created"] == repeat.date_created.isoformat()
+	assert repeat_metadata["n_peaks"] == len(repeat.peaks)
+
+	datafile_metadata = Datafile.read_metadata(datafile_filename)
+	assert datafile_metadata == repeat_metadata["datafile"]
+	assert repeat.datafile.intensity_matrix is not None
+	assert datafile_metadata["n_scans"] == len(repeat.datafile.intensity_matrix.time_list)
+	assert datafile_metadata["mass_range"] == [
+			repeat.datafile.intensity_matrix.min_mass,
+			repeat.datafile.intensity_matrix.max_mass,
+			]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_export_incremental(tmp_pathplus: PathPlus, project: Project, lazy: bool):
+	filename = project.export(tmp_pathplus, binary=True, compression=zipfile.ZIP_STORED)
+	loaded = Project.from_file(filename, lazy=lazy, mmap=True)
+
+	def members() -> List[str]:
+		with zipfile.ZipFile(filename) as zf:
+			return zf.namelist()
+
+	n_members = len(members())
+
+	# Nothing is written if nothing has changed.
+	mtime = PathPlus(filename).stat().st_mtime_ns
+	assert loaded.export(tmp_pathplus, binary=True, incremental=True, compression=zipfile.ZIP_STORED) == filename
+	assert PathPlus(filename).stat().st_mtime_ns == mtime
+
+	assert loaded.consolidated_peaks is not None
+	loaded.consolidated_peaks = loaded.consolidated_peaks[1:]
+	loaded.export(tmp_pathplus, binary=True, incremental=True, compression=zipfile.ZIP_STORED)
+
+	# The file is rewritten without superseded members, and the unaccessed repeats aren't encoded.
+	assert len(members()) == n_members
+	assert loaded.datafile_data._unloaded == {"repeat_0", "repeat_1"}  # type: ignore[attr-defined]
+	assert loaded._saved_state is not None
+	assert loaded._saved_state.is_untouched(loaded.alignment)
+
+	reloaded = Project.from_file(filename)
+	assert sdjson.dumps(reloaded.to_dict()) == sdjson.dumps(loaded.to_dict())
+	assert Project.read_metadata(filename) == loaded._get_metadata()
+	assert Project.read_metadata(filename)["n_consolidated_peaks"] == 2
+
+	# Changes made in place are written.
+	repeat = loaded.datafile_data["repeat_1"]
+	n_peaks = len(repeat.peaks)
+	repeat.peaks.pop()
+	loaded.export(tmp_pathplus, binary=True, incremental=True, compression=zipfile.ZIP_STORED)
+	assert len(Project.load_repeat(filename, "repeat_1").peaks) == n_peaks - 1
+	assert Project.read_metadata(filename)["repeats"]["repeat_1"]["n_peaks"] == n_peaks - 1
+	assert sdjson.dumps(Project.from_file(filename).to_dict()) == sdjson.dumps(loaded.to_dict())
+
+	# Replaced repeats are written, but their spectra are already in the table.
+	loaded.datafile_data["repeat_1"] = Repeat.from_dict(loaded.datafile_data["repeat_1"].to_dict())
+	loaded.export(tmp_pathplus, binary=True, incremental=True, compression=zipfile.ZIP_STORED)
+	assert len(members()) == n_members
+	assert sdjson.dumps(Project.from_file(filename).to_dict()) == sdjson.dumps(loaded.to_dict())
+
+	# A full export if the file has been changed by something else.
+	project.export(tmp_pathplus, binary=True)
+	loaded.export(tmp_pathplus, binary=True, incremental=True)
+	with zipfile.ZipFile(filename) as zf:
+		assert zf.namelist().count("index.json") == 1
+	assert sdjson.dumps(Project.from_file(filename).to_dict()) == sdjson.dumps(loaded.to_dict())
+
+	# The arrays memory-mapped from the original file remain valid throughout.
+	assert sdjson.dumps(loaded.datafile_data["repeat_0"].to_dict()) == sdjson.dumps(
+			project.datafile_data["repeat_0"].to_dict()
+			)
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_export_compact(tmp_pathplus: PathPlus, project: Project, binary: bool):
+	default_size = PathPlus(project.export(tmp_pathplus, binary=binary)).stat().st_size
+
+	# Lossless with 64-bit intensities.
+	loaded = Project.from_file(project.export(tmp_pathplus, binary=binary, compact="float64"))
+	assert sdjson.dumps(loaded.to_dict()) == sdjson.dumps(project.to_dict())
+
+	repeat = project.datafile_data["repeat_0"]
+	loaded_repeat = Repeat.from_file(repeat.export(tmp_pathplus, binary=binary, compact="float64"))
+	assert sdjson.dumps(loaded_repeat.to_dict()) == sdjson.dumps(repeat.to_dict())
+
+	filename = PathPlus(project.export(tmp_pathplus, binary=binary, compact=True))
+	assert filename.stat().st_size < default_size
+	loaded = Project.from_file(filename)
+	assert [peak.UID for peak in loaded.datafile_data["repeat_0"].peaks] == [peak.UID for peak in repeat.peaks]
+
+	assert project.consolidated_peaks is not None
+	for cp in project.consolidated_peaks:
+		loaded_cp = ConsolidatedPeak.from_dict(sdjson.loads(sdjson.dumps(cp.to_dict(compact="float64"))))
+		assert sdjson.dumps(loaded_cp.to_dict()) == sdjson.dumps(cp.to_dict())
+
+
+def test_from_file_executor(tmp_pathplus: PathPlus, project: Project):
+	filename = project.export(tmp_pathplus, binary=True)
+
+	with ThreadPoolExecutor(4) as executor:
+		loaded = Project.from_file(filename, executor=executor)
+
+	assert sdjson.dumps(loaded.to_dict()) == sdjson.dumps(project.to_dict())
@@ -0,0 +1,272 @@
+# stdlib
+import base64
+from typing import List, Literal, Optional, Sequence, Tuple
+
+# 3rd party
+import numpy
+import pytest
+from domdf_python_tools.paths import PathPlus
+from pyms.GCMS.Class import GCMS_data
+from pyms.GCMS.IO.ANDI import ANDI_reader
+from pyms.GCMS.IO.JCAMP import JCAMP_reader
+from pyms.GCMS.IO.MZML import mzML_reader
+from pyms.IntensityMatrix import IntensityMatrix, build_intensity_matrix_i
+
+# this package
+from libgunshotmatch.datafile import Datafile, get_info_from_gcms_data
+from libgunshotmatch.readers import (
+		andi_intensity_matrix,
+		jcamp_intensity_matrix,
+		jcamp_reader,
+		mzml_intensity_matrix
+		)
+
+tests_dir = PathPlus(__file__).parent
+
+
+def _check_gcms_data(gcms_data: GCMS_data, expected: GCMS_data) -> None:
+	assert gcms_data.time_list == expected.time_list
+	assert len(gcms_data.scan_list) == len(expected.scan_list)
+	for scan, expected_scan in zip(gcms_data.scan_list, expected.scan_list):
+		assert scan.mass_list == expected_scan.mass_list
+		assert scan.intensity_list == expected_scan.intensity_list
+		assert scan.min_mass == expected_scan.min_mass
+		assert scan.max_mass == expected_scan.max_mass
+
+	assert gcms_data.min_mass == expected.min_mass
+	assert gcms_data.max_mass == expected.max_mass
+	assert gcms_data.tic.intensity_array.tolist() == expected.tic.intensity_array.tolist()
+
+
+def _check_intensity_matrix(
+		intensity_matrix: IntensityMatrix,
+		gcms_data: GCMS_data,
+		crop_mass_range: Optional[Tuple[float, float]],
+		) -> None:
+	expected = build_intensity_matrix_i(gcms_data)
+	if crop_mass_range is not None:
+		min_mass, max_mass = crop_mass_range
+		assert expected.min_mass is not None and expected.max_mass is not None
+		expected.crop_mass(max(min_mass, expected.min_mass), min(max_mass, expected.max_mass))
+
+	assert intensity_matrix.time_list == expected.time_list
+	assert intensity_matrix.mass_list == expected.mass_list
+	numpy.testing.assert_array_equal(intensity_matrix.intensity_array, expected.intensity_array)
+
+
+crop_mass_ranges = pytest.mark.parametrize("crop_mass_range", [None, (50, 500), (60.5, 200.2), (10, 1000)])
+
+
+@pytest.mark.parametrize("filename", [f"ELEY_{n}_SUBTRACT.JDX" for n in range(1, 6)])
+def test_jcamp_reader(filename: str):
+	_check_gcms_data(jcamp_reader(tests_dir / filename), JCAMP_reader(tests_dir / filename))
+
+
+def test_jcamp_reader_formatting(tmp_pathplus: PathPlus):
+	# Mixed styles of times, trailing commas, several pairs per line, and masses in descending order.
+	(tmp_pathplus / "example.jdx").write_lines([
+			"##TITLE= example",
+			"##PAGE= T=1.5",
+			"##RETENTION_TIME= 1.5",
+			"##XYDATA= (XY..XY)",
+			" 50.1, 100.0, 51.2, 200.0,",
+			" 52.3, 300.0",
+			'',
+			"##RETENTION_TIME= 2.5",
+			"##XYDATA= (XY..XY)",
+			" 53.4, 400.0, ",
+			" 50.9, 500.0",
+			"##RETENTION_TIME= 3.5",
+			"##XYDATA= (XY..XY)",
+			"##END=",
+			])
+
+	gcms_data = jcamp_reader(tmp_pathplus / "example.jdx")
+	_check_gcms_data(gcms_data, JCAMP_reader(tmp_pathplus / "example.jdx"))
+	assert gcms_data.time_list == [1.5, 2.5, 3.5]
+	assert gcms_data.scan_list[1].mass_list == [50.9, 53.4]
+	assert gcms_data.scan_list[1].intensity_list == [500.0, 400.0]
+	assert len(gcms_data.scan_list[2]) == 0
+
+
+def test_jcamp_reader_errors(tmp_pathplus: PathPlus):
+	(tmp_pathplus / "odd.jdx").write_lines([
+			"##PAGE= T=1.5",
+			"##XYDATA= (XY..XY)",
+			" 50.1, 100.0, 51.2",
+			])
+
+	with pytest.raises(ValueError, match="Expected an even number of values, got 3"):
+		jcamp_reader(tmp_pathplus / "odd.jdx")
+
+	(tmp_pathplus / "times.jdx").write_lines([
+			"##PAGE= T=1.5",
+			"##PAGE= T=2.5",
+			"##XYDATA= (XY..XY)",
+			" 50.1, 100.0",
+			])
+
+	with pytest.raises(ValueError, match=r"Number of time points \(2\) does not equal the number of scans \(1\)"):
+		jcamp_reader(tmp_pathplus / "times.jdx")
+
+
+def _write_mzml(filename: PathPlus, spectra: Sequence[Tuple[float, Sequence[float], Sequence[float]]]) -> None:
+	# Uncompressed, 64-bit, unindexed mzML.
+
+	def binary_data_array(array: Sequence[float], accession: str, name: str) -> str:
+		encoded = base64.b64encode(numpy.asarray(array, dtype="<f8").tobytes()).decode("ASCII")
+		return (
+				f'<binaryDataArray encodedLength="{len(encoded)}">'
+				'<cvParam cvRef="MS" accession="MS:1000523" name="64-bit float" value=""/>'
+				'<cvParam cvRef="MS" accession="MS:1000576" name="no compression" value=""/>'
+				f'<cvParam cvRef="MS" accession="{accession}" name="{name}" value=""/>'
+				f"<binary>{encoded}</binary></binaryDataArray>"
+				)
+
+	lines: List[str] = [
+			'<?xml version="1.0" encoding="utf-8"?>',
+			'<mzML xmlns="http://psi.hupo.org/ms/mzml" version="1.1.0">',
+			'<run id="run">',
+			f'<spectrumList count="{len(spectra)}">',
+			]
+
+	for idx, (time, mass_list, intensity_list) in enumerate(spectra):
+		lines.extend([
+				f'<spectrum index="{idx}" id="scan={idx + 1}" defaultArrayLength="{len(mass_list)}">',
+				'<cvParam cvRef="MS" accession="MS:1000511" name="ms level" value="1"/>',
+				'<scanList count="1"><scan>'
+				f'<cvParam cvRef="MS" accession="MS:1000016" name="scan start time" value="{time}" '
+				'unitCuriePrefix="UO" unitAccession="UO:0000010" unitName="second"/>'
+				"</scan></scanList>",
+				'<binaryDataArrayList count="2">',
+				binary_data_array(mass_list, "MS:1000514", "m/z array"),
+				binary_data_array(intensity_list, "MS:1000515", "intensity array"),
+				"</binaryDataArrayList>",
+				"</spectrum>",
+				])
+
+	lines.extend(["</spectrumList>", "</run>", "</mzML>"])
+	filename.write_lines(lines)
+
+
+@pytest.fixture(scope="module")
+def mzml_file(tmp_path_factory: pytest.TempPathFactory) -> PathPlus:
+	gcms_data = jcamp_reader(tests_dir / "ELEY_1_SUBTRACT.JDX")
+
+	# A subset of the scans, to keep the test quick.
+	spectra = [
+			(time, scan.mass_list, scan.intensity_list)
+			for time, scan in zip(gcms_data.time_list[:300], gcms_data.scan_list[:300])
+			]
+
+	filename = PathPlus(tmp_path_factory.mktemp("mzml")) / "ELEY_1_SUBTRACT.mzML"
+	_write_mzml(filename, spectra)
+	return filename
+
+
+@crop_mass_ranges
+def test_jcamp_intensity_matrix(crop_mass_range: Optional[Tuple[float, float]]):
+	gcms_data = JCAMP_reader(tests_dir / "ELEY_1_SUBTRACT.JDX")
+	intensity_matrix, info = jcamp_intensity_matrix(tests_dir / "ELEY_1_SUBTRACT.JDX", crop_mass_range)
+	_check_intensity_matrix(intensity_matrix, gcms_data, crop_mass_range)
+	assert info == get_info_from_gcms_data(gcms_data)
+
+
+@crop_mass_ranges
+def test_mzml_intensity_matrix(mzml_file: PathPlus, crop_mass_range: Optional[Tuple[float, float]]):
+	gcms_data = mzML_reader(mzml_file)
+	intensity_matrix, info = mzml_intensity_matrix(mzml_file, crop_mass_range)
+	_check_intensity_matrix(intensity_matrix, gcms_data, crop_mass_range)
+	assert info == get_info_from_gcms_data(gcms_data)
+
+
+def test_mzml_intensity_matrix_errors(mzml_file: PathPlus):
+	with pytest.raises(ValueError, match="The minimum mass of 'crop_mass_range' must be less than the maximum mass."):
+		mzml_intensity_matrix(mzml_file, (500, 50))
+
+	with pytest.raises(ValueError, match="'crop_mass_range' does not overlap the masses in the data."):
+		mzml_intensity_matrix(mzml_file, (600, 700))
+
+
+def test_prepare_intensity_matrix(mzml_file: PathPlus):
+	datafile = Datafile.new(mzml_file.stem, mzml_file)
+
+	expected = datafile.prepare_intensity_matrix(datafile.load_gcms_data(), crop_mass_range=(50, 500))
+	intensity_matrix, info = mzml_intensity_matrix(mzml_file, crop_mass_range=(50, 500))
+	assert datafile.prepare_intensity_matrix(intensity_matrix, crop_mass_range=(50, 500)) is intensity_matrix
+
+	assert intensity_matrix.time_list == expected.time_list
+	assert intensity_matrix.mass_list == expected.mass_list
+	numpy.testing.assert_array_equal(intensity_matrix.intensity_array, expected.intensity_array)
+
+
+def test_load_gcms_data_reader():
+	datafile = Datafile.new("ELEY_1_SUBTRACT", tests_dir / "ELEY_1_SUBTRACT.JDX")
+	_check_gcms_data(datafile.load_gcms_data(), datafile.load_gcms_data(reader=JCAMP_reader))
+
+
+def _write_andi(
+		filename: PathPlus,
+		gcms_data: GCMS_data,
+		file_format: Literal["NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF4"] = "NETCDF3_CLASSIC",
+		) -> None:
+	# 3rd party
+	from netCDF4 import Dataset
+
+	point_count = [len(scan) for scan in gcms_data.scan_list]
+
+	with Dataset(filename, 'w', format=file_format) as dataset:
+		dataset.createDimension("scan_number", len(point_count))
+		dataset.createDimension("point_number", sum(point_count))
+
+		dataset.createVariable("scan_acquisition_time", "f8", ("scan_number", ))[:] = gcms_data.time_list
+		dataset.createVariable("point_count", "i4", ("scan_number", ))[:] = point_count
+		dataset.createVariable("scan_index", "i4", ("scan_number", ))[:] = numpy.cumsum([0, *point_count[:-1]])
+		dataset.createVariable("mass_values", "f4", ("point_number", ))[:] = [
+				mass for scan in gcms_data.scan_list for mass in scan.mass_list
+				]
+		dataset.createVariable("intensity_values", "f4", ("point_number", ))[:] = [
+				intensity for scan in gcms_data.scan_list for intensity in scan.intensity_list
+				]
+
+
+@pytest.fixture(scope="module")
+def andi_gcms_data() -> GCMS_data:
+	gcms_data = jcamp_reader(tests_dir / "ELEY_1_SUBTRACT.JDX")
+	return GCMS_data(gcms_data.time_list[:300], gcms_data.scan_list[:300])
+
+
+@crop_mass_ranges
+@pytest.mark.parametrize("file_format", ["NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF4"])
+@pytest.mark.parametrize("chunk_size", [1000, 2**20])
+def test_andi_intensity_matrix(
+		tmp_pathplus: PathPlus,
+		andi_gcms_data: GCMS_data,
+		crop_mass_range: Optional[Tuple[float, float]],
+		file_format: Literal["NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF4"],
+		chunk_size: int,
+		):
+	filename = tmp_pathplus / "example.cdf"
+	_write_andi(filename, andi_gcms_data, file_format)
+
+	intensity_matrix, info = andi_intensity_matrix(filename, crop_mass_range, chunk_size=chunk_size)
+
+	gcms_data = ANDI_reader(filename)
+	_check_intensity_matrix(intensity_matrix, gcms_data, crop_mass_range)
+	assert info == get_info_from_gcms_data(gcms_data)
+
+
+def test_andi_intensity_matrix_errors(tmp_pathplus: PathPlus):
+	with pytest.raises(FileNotFoundError):
+		andi_intensity_matrix(tmp_pathplus / "missing.cdf")
+
+
+def test_load_intensity_matrix(tmp_pathplus: PathPlus, andi_gcms_data: GCMS_data):
+	_write_andi(tmp_pathplus / "example.cdf", andi_gcms_data)
+
+	for filename in [tmp_pathplus / "example.cdf", tests_dir / "ELEY_1_SUBTRACT.JDX"]:
+		datafile = Datafile.new(filename.stem, filename)
+		intensity_matrix, info = datafile.load_intensity_matrix(crop_mass_range=(50, 500))
+		gcms_data = datafile.load_gcms_data()
+		_check_intensity_matrix(intensity_matrix, gcms_data, (50, 500))
+		assert info == get_info_from_gcms_data(gcms_data)
@@ -0,0 +1,122 @@
+# stdlib
+import math
+from typing import Callable
+
+# 3rd party
+import pytest
+import sdjson
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from libgunshotmatch.project import Project
+from libgunshotmatch.store import PeakMatch, ProjectStore
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_find_peaks(tmp_pathplus: PathPlus, project_factory: Callable[..., Project], binary: bool):
+	project = project_factory()
+	other = project_factory(3)
+	other.name = "other"
+
+	with ProjectStore(tmp_pathplus / "store.db") as store:
+		assert store.add_projects([project.export(tmp_pathplus, binary=binary), other]) == ["project", "other"]
+		assert store.project_names == ["other", "project"]
+		assert len(store) == 2
+		assert "project" in store
+		assert store.get_metadata("project") == project._get_metadata()
+
+		matches = store.find_peaks(name="compound 1")
+		assert [(match.project, match.peak_index) for match in matches] == [("other", 1), ("project", 1)]
+		assert matches[1] == PeakMatch(
+				project="project",
+				peak_index=1,
+				rt=80.5,
+				area=1123.4,
+				hit_index=0,
+				name="Compound 1",
+				cas="64-17-5",
+				match_factor=900.0,
+				reverse_match_factor=910.0,
+				average_hit_number=1.0,
+				n_peaks=1,
+				)
+
+		assert [match.peak_index for match in store.find_peaks(cas="64-17-5", rt=94, rt_tolerance=2)] == [2, 2]
+		assert store.find_peaks(name="Compound 1", rt=94, rt_tolerance=2) == []
+		assert len(store.find_peaks(cas="64-17-5", max_hit_index=0, projects=["other"])) == 3
+		assert store.find_projects(name="Compound 2", rt=95) == ["other", "project"]
+		assert store.find_projects(name="Compound 3") == []
+
+		# Reconstructed from the store
+		assert project.consolidated_peaks is not None
+		loaded_peak = store.load_consolidated_peak("project", 2)
+		assert sdjson.dumps(loaded_peak.to_dict()) == sdjson.dumps(project.consolidated_peaks[2].to_dict())
+		loaded_peaks = store.load_consolidated_peaks("project")
+		assert loaded_peaks is not None
+		expected = sdjson.dumps([cp.to_dict() for cp in project.consolidated_peaks])
+		assert sdjson.dumps([cp.to_dict() for cp in loaded_peaks]) == expected
+
+		with pytest.raises(KeyError):
+			store.load_consolidated_peak("project", 3)
+
+		# Loaded from the file it was added from
+		loaded = store.load_project("project")
+		assert sdjson.dumps(loaded.to_dict()) == sdjson.dumps(project.to_dict())
+
+		with pytest.raises(ValueError, match="Project 'other' was not added from a file"):
+			store.load_project("other")
+
+	# Reopened
+	with ProjectStore(tmp_pathplus / "store.db") as store:
+		assert store.find_projects(name="Compound 0") == ["other", "project"]
+
+		store.remove_project("other")
+		assert store.project_names == ["project"]
+		assert store.find_projects(name="Compound 0") == ["project"]
+
+		with pytest.raises(KeyError):
+			store.remove_project("other")
+
+
+def test_add_projects_replace(project_factory: Callable[..., Project]):
+	project = project_factory()
+
+	with ProjectStore() as store:
+		store.add_projects([project])
+
+		assert project.consolidated_peaks is not None
+		project.consolidated_peaks = project.consolidated_peaks[1:]
+		store.add_projects([project])
+
+		assert store.project_names == ["project"]
+		assert store.get_metadata("project")["n_consolidated_peaks"] == 2
+		assert store.find_peaks(name="Compound 0") == []
+		assert [match.peak_index for match in store.find_peaks(name="Compound 1")] == [0]
+
+
+def test_add_projects_transaction(tmp_pathplus: PathPlus, project: Project):
+	with ProjectStore() as store:
+		with pytest.raises(FileNotFoundError):
+			store.add_projects([project, tmp_pathplus / "missing.gsmp"])
+
+		# None of the projects are added if any fail.
+		assert len(store) == 0
+		assert store.find_peaks() == []
+
+
+def test_unconsolidated(project: Project):
+	project.consolidated_peaks = None
+
+	with ProjectStore() as store:
+		store.add_projects([project])
+		assert store.load_consolidated_peaks("project") is None
+		assert store.find_peaks() == []
+
+
+def test_nan_values(project: Project):
+	assert project.consolidated_peaks is not None
+	project.consolidated_peaks[0].hits[0].mf_list[:] = [math.nan, math.nan]  # type: ignore[list-item]
+
+	with ProjectStore() as store:
+		store.add_projects([project])
+		assert math.isnan(store.find_peaks(name="Compound 0")[0].match_factor)